@@ -4,8 +4,11 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import time
 import re
-import csv
-from io import StringIO
+
+from crawl_engine import fetch_many, mount_pool
+from html_parse import parse_html
+from crawl_frontier import CrawlFrontier
+from link_export import LinkTableWriter
 
 def analyze_step(state):
     
@@ -43,7 +46,7 @@ def analyze_step(state):
         log("フェーズ1: 記事URLの収集を開始します。")
         try:
             base_url = "https://arigataya.co.jp"
-            session = requests.Session()
+            session = mount_pool(requests.Session())
             session.headers.update({'User-Agent': 'Mozilla/5.0'})
             
             sitemap_urls = set([base_url])
@@ -55,7 +58,7 @@ def analyze_step(state):
 
             state.update({
                 'session': session, 'base_url': base_url, 'domain': urlparse(base_url).netloc,
-                'to_visit': [u for u in sitemap_urls if is_content(u)], 'visited': set(),
+                'to_visit': CrawlFrontier(u for u in sitemap_urls if is_content(u)), 'visited': set(),
                 'pages': {}, 'links': [], 'phase': 'crawling'
             })
             log(f"シードURLを{len(state['to_visit'])}件発見。クロールを開始します。")
@@ -68,17 +71,21 @@ def analyze_step(state):
         session, base_url, domain = state['session'], state['base_url'], state['domain']
         crawled_count = 0
         
-        while state['to_visit'] and crawled_count < 5:
-            url = state['to_visit'].pop(0)
+        # 1ステップ分（最大5件）のURLをまとめて並列取得
+        batch = []
+        while state['to_visit'] and len(batch) < 5:
+            url = state['to_visit'].pop()
             if url in state['visited']: continue
             state['visited'].add(url)
-            
+            batch.append(url)
+        
+        for url, res, error in fetch_many(session, batch, delay=0.5, timeout=20):
             try:
                 log(f"クロール中: {url}")
-                res = session.get(url, timeout=20)
+                if error is not None: raise error
                 if not res.ok: continue
 
-                soup = BeautifulSoup(res.text, 'html.parser')
+                soup = parse_html(res.text)
                 title = (soup.find('h1') or soup.find('title')).get_text(strip=True)
                 title = re.sub(r'\s*\|.*$', '', title).strip()
                 state['pages'][url] = {'title': title}
@@ -90,11 +97,9 @@ def analyze_step(state):
                             'source_url': url, 'source_title': title,
                             'target_url': norm_link, 'anchor_text': link['anchor_text']
                         })
-                        if norm_link not in state['visited'] and norm_link not in state['to_visit']:
-                            state['to_visit'].append(norm_link)
+                        state['to_visit'].push(norm_link)
                 
                 crawled_count += 1
-                time.sleep(0.5)
             except Exception as e:
                 log(f"クロールエラー: {url} - {e}")
         
@@ -108,9 +113,8 @@ def analyze_step(state):
 
     return state
 
-def generate_csv(state):
-    output = StringIO()
-    writer = csv.writer(output, lineterminator='\n')
+def generate_csv(state, output_format='csv'):
+    writer = LinkTableWriter(output_format, lineterminator='\n')
     writer.writerow(['番号', 'ページタイトル', 'URL', '被リンク元タイトル', '被リンク元URL', 'アンカーテキスト'])
     
     pages = state['pages']
@@ -136,4 +140,4 @@ def generate_csv(state):
         else:
             writer.writerow([page_num, title, url, '', '', ''])
             
-    return output.getvalue()
+    return writer.getvalue()
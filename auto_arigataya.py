@@ -5,8 +5,12 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import time
 import re
-import csv
-from io import StringIO
+
+from crawl_engine import fetch_many, mount_pool
+from html_parse import parse_html
+from crawl_frontier import CrawlFrontier
+from crawl_store import CrawlStore, sitemap_lastmod
+from link_export import LinkTableWriter
 
 def analyze_step(state):
     
@@ -93,6 +97,7 @@ def analyze_step(state):
             for url_tag in url_tags:
                 if loc := url_tag.find('loc'):
                     urls.add(loc.text.strip())
+                    if (lastmod := sitemap_lastmod(loc)): state.setdefault('lastmods', {})[loc.text.strip()] = lastmod
         except Exception as e:
             log(f"サイトマップ解析エラー: {sitemap_url} - {e}")
         return urls
@@ -105,19 +110,27 @@ def analyze_step(state):
         log("フェーズ1: 記事URLの収集を開始します。")
         try:
             base_url = "https://arigataya.co.jp"
-            session = requests.Session()
+            session = mount_pool(requests.Session())
             session.headers.update({'User-Agent': 'Mozilla/5.0'})
             
             sitemap_urls = extract_from_sitemap_recursively(urljoin(base_url, '/sitemap.xml'), session)
             initial_urls = list(set([base_url] + list(sitemap_urls)))
+            domain = urlparse(base_url).netloc.lower().replace('www.', '')
+            seed_urls = [u for u in initial_urls if is_content(u)]
+            
+            # 差分クロール: lastmod が進んだURLと前回未取得のURLだけを取得
+            store = CrawlStore(domain) if state.get('incremental') else None
+            if store is not None:
+                seed_urls = store.plan(seed_urls, state.get('lastmods', {}))
+                log(f"差分クロール: 再取得 {len(seed_urls)}件（前回 {len(store.pages)}ページ）")
             
             state.update({
-                'session': session, 'base_url': base_url, 'domain': urlparse(base_url).netloc.lower().replace('www.', ''),
-                'to_visit': [u for u in initial_urls if is_content(u)],
+                'session': session, 'base_url': base_url, 'domain': domain,
+                'to_visit': CrawlFrontier(seed_urls), 'store': store,
                 'visited': set(), 'pages': {}, 'links': [], 'phase': 'crawling', 'crawl_limit': 800
             })
             log(f"シードURLを{len(state['to_visit'])}件発見。クロールを開始します。")
-            if not state['to_visit']:
+            if not state['to_visit'] and store is None:
                 log("警告: クロール対象のURLが見つかりませんでした。")
                 state['phase'] = 'error'
         except Exception as e:
@@ -127,19 +140,25 @@ def analyze_step(state):
 
     if state['phase'] == 'crawling':
         session, base_url, domain = state['session'], state['base_url'], state['domain']
+        store = state.get('store')
         crawled_count = 0
         
-        while state['to_visit'] and crawled_count < 5:
-            url = state['to_visit'].pop(0)
+        # 1ステップ分（最大5件）のURLをまとめて並列取得
+        batch = []
+        while state['to_visit'] and len(batch) < 5:
+            url = state['to_visit'].pop()
             if url in state['visited']: continue
             state['visited'].add(url)
-            
+            batch.append(url)
+        
+        for url, res, error in fetch_many(session, batch, delay=0.5, timeout=20):
             try:
                 log(f"クロール中: {url}")
-                res = session.get(url, timeout=20)
+                if error is not None: raise error
+                if store is not None: store.mark_fetched(url)
                 if not res.ok: continue
 
-                soup = BeautifulSoup(res.text, 'html.parser')
+                soup = parse_html(res.text)
                 if is_noindex_page(soup): continue
 
                 title = (soup.find('h1') or soup.find('title')).get_text(strip=True)
@@ -153,11 +172,10 @@ def analyze_step(state):
                             'source_url': url, 'source_title': title,
                             'target_url': norm_link, 'anchor_text': link['anchor_text']
                         })
-                        if norm_link not in state['visited'] and norm_link not in state['to_visit']:
-                            state['to_visit'].append(norm_link)
+                        if not (store and store.seen(norm_link)):
+                            state['to_visit'].push(norm_link)
                 
                 crawled_count += 1
-                time.sleep(0.5)
             except Exception as e:
                 log(f"クロールエラー: {url} - {e}")
         
@@ -166,20 +184,23 @@ def analyze_step(state):
         state['progress_text'] = f"進捗: {len(state['visited'])} / {total_urls} ページ"
 
         if not state['to_visit']:
+            if store is not None:
+                # 今回取得しなかったページとそのリンクを前回結果から引き継ぐ
+                store.merge(state['pages'], state['links'], state.get('lastmods', {}))
+                store.save()
             log("クロール完了。")
             state['phase'] = 'completed'
         return state
 
     return state
 
-def generate_csv(state):
-    output = StringIO()
-    writer = csv.writer(output, lineterminator='\n')
+def generate_csv(state, output_format='csv'):
+    writer = LinkTableWriter(output_format, lineterminator='\n')
     writer.writerow(['番号', 'ページタイトル', 'URL', '被リンク元タイトル', '被リンク元URL', 'アンカーテキスト'])
     
     pages = state.get('pages', {})
     links = state.get('links', [])
-    if not pages: return output.getvalue()
+    if not pages: return writer.getvalue()
 
     page_inlinks = {url: [] for url in pages}
     for link in links:
@@ -200,4 +221,4 @@ def generate_csv(state):
         else:
             writer.writerow([page_num, title, url, '', '', ''])
             
-    return output.getvalue()
+    return writer.getvalue()
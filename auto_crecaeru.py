@@ -3,8 +3,13 @@ from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import time
 import re
-import csv
-from io import StringIO
+
+from crawl_engine import fetch_many, mount_pool
+from html_parse import parse_html
+from crawl_frontier import CrawlFrontier
+from link_index import LinkIndex
+from crawl_store import CrawlStore, sitemap_lastmod
+from link_export import LinkTableWriter
 
 def analyze_step(state):
     
@@ -165,6 +170,7 @@ def analyze_step(state):
                     # サイトマップファイル自体は除外
                     if not re.search(r'sitemap.*\.(xml|html)$', loc_url.lower()):
                         urls.add(normalize_url(loc_url))
+                        if (lastmod := sitemap_lastmod(loc)): state.setdefault('lastmods', {})[normalize_url(loc_url)] = lastmod
         except Exception as e:
             log(f"サイトマップ取得エラー: {e}")
         return list(urls)
@@ -204,30 +210,28 @@ def analyze_step(state):
             visited = set()
             to_visit = generate_seed_urls(base_url)
             domain = urlparse(base_url).netloc
-            processed_links_list = []  # set()の代わりにlistで管理
+            link_index = LinkIndex()  # (リンク元, リンク先) の重複判定と被リンク数を逐次管理
 
-            session = requests.Session()
+            session = mount_pool(requests.Session())
             session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'})
 
             log(f"初期シードURL数: {len(to_visit)}")
             
-            # 重複を除去
-            unique_to_visit = []
-            seen = set()
-            for url in to_visit:
-                normalized = normalize_url(url)
-                if normalized not in seen:
-                    seen.add(normalized)
-                    unique_to_visit.append(normalized)
+            # 差分クロール: lastmod が進んだURLと前回未取得のURLだけを取得
+            store = CrawlStore(domain) if state.get('incremental') else None
+            if store is not None:
+                to_visit = store.plan([normalize_url(u) for u in to_visit], state.get('lastmods', {}))
+                log(f"差分クロール: 再取得 {len(to_visit)}件（前回 {len(store.pages)}ページ）")
             
-            to_visit = unique_to_visit
+            # 重複を除去（正規化後のURLでフロンティアに投入）
+            to_visit = CrawlFrontier(to_visit, key=normalize_url)
             log(f"重複除去後のシードURL数: {len(to_visit)}")
             
             state.update({
                 'session': session, 'base_url': base_url, 'domain': domain,
                 'to_visit': to_visit, 'visited': list(visited), 'pages': pages, 
                 'links': links, 'detailed_links': detailed_links, 
-                'processed_links_list': processed_links_list,  # listとして保存
+                'link_index': link_index, 'store': store,
                 'phase': 'crawling'
             })
             
@@ -246,29 +250,32 @@ def analyze_step(state):
         pages = state['pages']
         links = state['links']
         detailed_links = state['detailed_links']
-        processed_links_list = state.get('processed_links_list', [])
-        
-        # 処理済みリンクをsetに変換（高速化のため）
-        processed_links = set()
-        for link_pair in processed_links_list:
-            if isinstance(link_pair, (list, tuple)) and len(link_pair) == 2:
-                processed_links.add(tuple(link_pair))
+        link_index = state['link_index']
+        store = state.get('store')
         
         crawled_count = 0
-        new_processed_links = []  # 新規追加分を記録
         
-        while to_visit and len(pages) < 500 and crawled_count < 10:
-            url = to_visit.pop(0)
+        # 1ステップ分（最大10件）のURLをまとめて並列取得
+        batch, batch_seen = [], set()
+        while to_visit and len(batch) < 10 and len(pages) + len(batch) < 500:
+            url = to_visit.pop()
             normalized_url = normalize_url(url)
-            if normalized_url in visited:
+            if normalized_url in visited or normalized_url in batch_seen:
                 continue
+            batch_seen.add(normalized_url)
+            batch.append(url)
 
+        for url, response, error in fetch_many(session, batch, delay=0.1, timeout=10):
+            normalized_url = normalize_url(url)
             try:
-                response = session.get(url, timeout=10)
+                if error is not None:
+                    raise error
+                if store is not None:
+                    store.mark_fetched(normalized_url)
                 if response.status_code != 200:
                     continue
                 
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = parse_html(response.text)
                 
                 # NOINDEXページを除外
                 if is_noindex_page(soup):
@@ -306,11 +313,7 @@ def analyze_step(state):
                         is_content(normalized_link)):
                         
                         # 重複チェック（同じソース→ターゲットのリンクは1回だけ）
-                        link_key = (normalized_url, normalized_link)
-                        if link_key not in processed_links:
-                            processed_links.add(link_key)
-                            new_processed_links.append(list(link_key))  # listとして保存
-                            
+                        if link_index.add(normalized_url, normalized_link):
                             links.append((normalized_url, normalized_link))
                             pages[normalized_url]['outbound_links'].append(normalized_link)
                             
@@ -323,28 +326,30 @@ def analyze_step(state):
                             })
                             link_count_for_this_page += 1
                         
-                        # 新規URLの発見
-                        if (normalized_link not in visited and 
-                            normalized_link not in to_visit):
-                            to_visit.append(normalized_link)
+                        # 新規URLの発見（訪問済み・待機中はフロンティア側で除外）
+                        if not (store and store.seen(normalized_link)):
+                            to_visit.push(normalized_link)
 
                 visited.add(normalized_url)
                 crawled_count += 1
                 log(f"{len(pages)}件目: {title[:30]}... ({link_count_for_this_page}個のリンクを抽出)")
 
-                time.sleep(0.1)
-
             except Exception as e:
                 log(f"エラー: {url} - {e}")
                 continue
 
+        if store is not None and (not to_visit or len(pages) >= 500):
+            # 今回取得しなかったページとそのリンクを前回結果から引き継ぐ
+            for link in store.merge(pages, detailed_links, state.get('lastmods', {})):
+                if link_index.add(link['source_url'], link['target_url']):
+                    links.append((link['source_url'], link['target_url']))
+                    pages[link['source_url']]['outbound_links'].append(link['target_url'])
+            store.save()
+
         # 被リンク数を計算
         for url in pages:
-            pages[url]['inbound_links'] = sum(1 for _, tgt in links if tgt == url)
+            pages[url]['inbound_links'] = link_index.inbound_count(url)
 
-        # 処理済みリンクリストを更新
-        processed_links_list.extend(new_processed_links)
-        
         # state更新
         state.update({
             'pages': pages, 
@@ -352,7 +357,6 @@ def analyze_step(state):
             'detailed_links': detailed_links,
             'to_visit': to_visit, 
             'visited': list(visited),  # setからlistに変換して保存
-            'processed_links_list': processed_links_list,  # listとして保存
             'phase': 'crawling' if to_visit else 'completed'
         })
 
@@ -368,17 +372,16 @@ def analyze_step(state):
 
     return state
 
-def generate_csv(state):
+def generate_csv(state, output_format='csv'):
     # ローカル版のCSV生成ロジックを完全コピー
-    output = StringIO()
-    writer = csv.writer(output)
+    writer = LinkTableWriter(output_format)
     writer.writerow(['A_番号', 'B_ページタイトル', 'C_URL', 'D_被リンク元ページタイトル', 'E_被リンク元ページURL', 'F_被リンク元ページアンカーテキスト'])
     
     pages = state.get('pages', {})
     detailed_links = state.get('detailed_links', [])
     
     if not pages: 
-        return output.getvalue()
+        return writer.getvalue()
 
     # ターゲットURL別にグループ化
     target_groups = {}
@@ -447,4 +450,4 @@ def generate_csv(state):
                 ''                 # F_被リンク元ページアンカーテキスト
             ])
     
-    return output.getvalue()
+    return writer.getvalue()
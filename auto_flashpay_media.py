@@ -2,17 +2,19 @@
 
 # 必要なライブラリのみをインポート
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin
-import time
 import re
-import csv
-from io import StringIO
+
+from crawl_engine import crawl, mount_pool
+from html_parse import parse_html
+from link_index import LinkIndex
+from page_cache import PageCache
+from link_export import LinkTableWriter, header_only
 
 # ★★★ このファイルが呼び出されたときに実行される本体です ★★★
-def analyze(status_callback):
+def analyze(status_callback, output_format='csv'):
     """
-    flashpay.jp/media/ の分析を実行し、結果をCSV文字列で返す関数。
+    flashpay.jp/media/ の分析を実行し、結果をCSV文字列（output_format='parquet' / 'feather' なら列指向ファイルの bytes）で返す関数。
     主のオリジナルのロジックを、一切変更せずに移植。
     """
 
@@ -85,62 +87,53 @@ def analyze(status_callback):
     try:
         base_url = "https://flashpay.jp/media/"
         domain = urlparse(base_url).netloc
-        session = requests.Session()
+        session = mount_pool(requests.Session())
         session.headers.update({'User-Agent': 'Mozilla/5.0'})
         
         # 第1段階: ページを収集
         status_callback("フェーズ1: ページ収集中...")
-        to_visit = [normalize_url(base_url)]
-        visited = set()
-        
         crawl_count = 0
-        while to_visit and crawl_count < 500: # 上限設定
-            url = to_visit.pop(0)
+
+        # フェーズ2用のリンク抽出結果（フェーズ2では再取得しない）
+        page_cache = PageCache()
+
+        def collect_page(url, response):
+            nonlocal crawl_count
             normalized_url = normalize_url(url)
-            if normalized_url in visited: continue
+            if response.status_code != 200: return None
             
-            try:
-                response = session.get(url, timeout=15)
-                if response.status_code != 200: continue
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                if is_noindex_page(soup):
-                    visited.add(normalized_url)
-                    continue
+            soup = parse_html(response.text)
+            if is_noindex_page(soup): return None
 
-                title = soup.title.string.strip() if soup.title and soup.title.string else normalized_url
-                title = re.sub(r'\s*[|\-]\s*.*(flashpay|フラッシュペイ).*$', '', title, flags=re.IGNORECASE)
-                
-                pages[normalized_url] = {'title': title, 'outbound_links': []}
+            title = soup.title.string.strip() if soup.title and soup.title.string else normalized_url
+            title = re.sub(r'\s*[|\-]\s*.*(flashpay|フラッシュペイ).*$', '', title, flags=re.IGNORECASE)
+            
+            pages[normalized_url] = {'title': title, 'outbound_links': []}
 
-                extracted_links = extract_links_for_crawling(soup, url)
-                for link in extracted_links:
-                    normalized_link = normalize_url(link)
-                    if '/site/' in normalized_link: continue
-                    if (is_internal(normalized_link, domain) and is_content(normalized_link) and normalized_link not in visited and normalized_link not in to_visit):
-                        to_visit.append(normalized_link)
+            discovered = []
+            extracted_links = extract_links_for_crawling(soup, url)
+            for link in extracted_links:
+                normalized_link = normalize_url(link)
+                if '/site/' in normalized_link: continue
+                if is_internal(normalized_link, domain) and is_content(normalized_link):
+                    discovered.append(normalized_link)
 
-                visited.add(normalized_url)
-                crawl_count += 1
-                status_callback(f"ページ収集 ({crawl_count}/500): {normalized_url[:60]}...")
-                time.sleep(0.1)
-                
-            except Exception as e:
-                status_callback(f"  - エラー: {url} - {e}")
-                continue
+            page_cache[normalized_url] = extract_links_for_analysis(soup, url)
+            crawl_count += 1
+            status_callback(f"ページ収集 ({crawl_count}/500): {normalized_url[:60]}...")
+            return discovered
+
+        crawl(session, [base_url], collect_page, normalize=normalize_url, max_pages=500, delay=0.1,
+              on_error=lambda url, e: status_callback(f"  - エラー: {url} - {e}"))
 
         # 第2段階: リンク関係を構築
         status_callback(f"フェーズ2: リンク関係構築中 ({len(pages)}ページ)...")
-        processed_links = set()
+        link_index = LinkIndex()
         
-        for i, url in enumerate(list(pages.keys())):
+        for i, url in enumerate(pages):
             try:
                 status_callback(f"リンク解析中 ({i+1}/{len(pages)}): {url[:60]}...")
-                response = session.get(url, timeout=15)
-                if response.status_code != 200: continue
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                extracted_analysis_links = extract_links_for_analysis(soup, url)
+                extracted_analysis_links = page_cache.get(url, [])
                 
                 for link_data in extracted_analysis_links:
                     normalized_link = normalize_url(link_data['url'])
@@ -148,8 +141,7 @@ def analyze(status_callback):
                     if normalized_link not in pages: continue
                     if normalized_link == url: continue
 
-                    if (url, normalized_link) not in processed_links:
-                        processed_links.add((url, normalized_link))
+                    if link_index.add(url, normalized_link):
                         links.append((url, normalized_link))
                         pages[url]['outbound_links'].append(normalized_link)
                         detailed_links.append({
@@ -161,17 +153,17 @@ def analyze(status_callback):
                 continue
 
         for url in pages:
-            pages[url]['inbound_links'] = len(set([src for src, tgt in links if tgt == url]))
+            pages[url]['inbound_links'] = link_index.inbound_count(url)
+        page_cache.close()
             
         status_callback(f"分析完了。{len(pages)}ページ、{len(links)}リンクを検出。")
 
     except Exception as e:
         status_callback(f"致命的なエラーが発生しました: {e}")
-        return "A_番号,B_ページタイトル,C_URL,D_被リンク元ページタイトル,E_被リンク元ページURL,F_被リンク元ページアンカーテキスト\n"
+        return header_only(output_format)
 
     # --- 最後にCSV文字列を生成して返します ---
-    output = StringIO()
-    writer = csv.writer(output)
+    writer = LinkTableWriter(output_format)
     writer.writerow(['A_番号', 'B_ページタイトル', 'C_URL', 'D_被リンク元ページタイトル', 'E_被リンク元ページURL', 'F_被リンク元ページアンカーテキスト'])
     
     target_groups = {}
@@ -192,4 +184,4 @@ def analyze(status_callback):
         if info.get('inbound_links', 0) == 0:
             writer.writerow(['', info['title'], url, '', '', ''])
 
-    return output.getvalue()
+    return writer.getvalue()
@@ -4,25 +4,29 @@
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import time
 import re
-import csv
-from io import StringIO
+
+from crawl_engine import crawl, mount_pool
+from html_parse import parse_html
+from link_graph import LinkGraph
+from crawl_store import CrawlStore, sitemap_lastmod
+from link_export import LinkTableWriter, header_only
 
 # ★★★ このファイルが呼び出されたときに実行される本体です ★★★
-def analyze(status_callback):
+def analyze(status_callback, incremental=False, output_format='csv'):
     """
-    friendpay.jp の分析を実行し、結果をCSV文字列で返す関数。
+    friendpay.jp の分析を実行し、結果をCSV文字列（output_format='parquet' / 'feather' なら列指向ファイルの bytes）で返す関数。
     主のオリジナルのロジックを、一切変更せずに移植。
+    incremental=True の場合は前回結果との差分クロール（lastmod が進んだURLと新規URLのみ取得）。
     """
 
     # --- 主のオリジナルのコードを、この関数の中にそのまま配置します ---
     
     # ページやリンク情報を保存する変数
     pages = {}
-    links = []
-    detailed_links = []
+    graph = LinkGraph()  # 内部リンク（URL・テキストは整数IDで保持）
     excluded_links_count = 0
+    lastmods = {}  # サイトマップの lastmod（差分クロール用）
 
     # --- 主のオリジナルの関数群（クロールロジックの心臓部） ---
     # これらは一切変更いたしません。
@@ -77,7 +81,9 @@ def analyze(status_callback):
                 for loc in locs:
                     loc_url = loc.text.strip()
                     if not re.search(r'sitemap.*\.(xml|html)$', loc_url.lower()):
-                        urls.add(normalize_url(loc_url, base_url_for_relative))
+                        normalized = normalize_url(loc_url, base_url_for_relative)
+                        urls.add(normalized)
+                        if (lastmod := sitemap_lastmod(loc)): lastmods[normalized] = lastmod
         except Exception as e:
             status_callback(f"[警告] サイトマップ取得失敗: {url} - {e}")
         return list(urls)
@@ -161,12 +167,10 @@ def analyze(status_callback):
         base_url = "https://friendpay.jp"
         domain = urlparse(base_url).netloc
         site_type = detect_site_type(base_url)
-        session = requests.Session()
+        session = mount_pool(requests.Session())
         session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'})
 
         to_visit = generate_seed_urls(base_url, session)
-        visited = set()
-        processed_links = set()
         
         unique_to_visit = []
         seen_urls = set()
@@ -178,77 +182,73 @@ def analyze(status_callback):
         to_visit = unique_to_visit
         status_callback(f"重複除去後のシードURL数: {len(to_visit)}")
 
+        # 差分クロール: lastmod が進んだURLと前回未取得のURLだけを取得
+        store = CrawlStore(domain) if incremental else None
+        if incremental:
+            to_visit = store.plan(to_visit, lastmods)
+            status_callback(f"差分クロール: 再取得 {len(to_visit)}件（前回 {len(store.pages)}ページ）")
+
         crawl_count = 0
-        while to_visit and crawl_count < 500: # 上限設定
-            url = to_visit.pop(0)
+
+        def process_page(url, response):
+            nonlocal crawl_count
             normalized_url = normalize_url(url, base_url)
-            if not normalized_url or normalized_url in visited: continue
+            if incremental: store.mark_fetched(normalized_url)
+            if response.status_code != 200: return None
+            
+            soup = parse_html(response.text)
+            
+            if is_noindex_page(soup):
+                return None
+            
+            extracted = extract_links(soup, site_type, url)
+            
+            title = soup.title.string.strip() if soup.title and soup.title.string else normalized_url
+            for name in ['friendpay', 'フレンドペイ', 'friend-pay']:
+                title = re.sub(rf'\s*[|\-]\s*.*{re.escape(name)}.*$', '', title, flags=re.IGNORECASE)
+            title = title.strip()
+            
+            pages[normalized_url] = {'title': title}
+            graph.add_page(normalized_url, title)
 
-            try:
-                response = session.get(url, timeout=15)
-                if response.status_code != 200: continue
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                if is_noindex_page(soup):
-                    visited.add(normalized_url)
-                    continue
+            discovered = []
+            for link_data in extracted:
+                normalized_link = normalize_url(link_data['url'], base_url)
+                if not normalized_link: continue
                 
-                extracted = extract_links(soup, site_type, url)
-                
-                title = soup.title.string.strip() if soup.title and soup.title.string else normalized_url
-                for name in ['friendpay', 'フレンドペイ', 'friend-pay']:
-                    title = re.sub(rf'\s*[|\-]\s*.*{re.escape(name)}.*$', '', title, flags=re.IGNORECASE)
-                title = title.strip()
-                
-                pages[normalized_url] = {'title': title, 'outbound_links': []}
+                if is_internal(normalized_link, domain, base_url) and is_content(normalized_link, base_url):
+                    graph.add_link(normalized_url, normalized_link, link_data['anchor_text'])
+                    discovered.append(normalized_link)
 
-                for link_data in extracted:
-                    normalized_link = normalize_url(link_data['url'], base_url)
-                    if not normalized_link: continue
-                    
-                    if is_internal(normalized_link, domain, base_url) and is_content(normalized_link, base_url):
-                        if (normalized_url, normalized_link) not in processed_links:
-                            processed_links.add((normalized_url, normalized_link))
-                            links.append((normalized_url, normalized_link))
-                            pages[normalized_url]['outbound_links'].append(normalized_link)
-                            detailed_links.append({
-                                'source_url': normalized_url, 'source_title': title,
-                                'target_url': normalized_link, 'anchor_text': link_data['anchor_text']
-                            })
-                        if normalized_link not in visited and normalized_link not in to_visit:
-                            to_visit.append(normalized_link)
+            crawl_count += 1
+            status_callback(f"クロール中 ({crawl_count}/500): {title[:50]}...")
+            return store.unseen(discovered) if incremental else discovered
 
-                visited.add(normalized_url)
-                crawl_count += 1
-                status_callback(f"クロール中 ({crawl_count}/500): {title[:50]}...")
-                time.sleep(0.1)
+        # 並列フェッチエンジンでクロール（ホスト毎の同時数・間隔で礼儀正しさを担保）
+        crawl(session, to_visit, process_page, normalize=lambda u: normalize_url(u, base_url), max_pages=500, delay=0.1,
+              on_error=lambda url, e: status_callback(f"  - エラー発生: {url} - {e}"))
 
-            except Exception as e:
-                status_callback(f"  - エラー発生: {url} - {e}")
-                continue
+        if incremental:
+            # 今回取得しなかったページとそのリンクを前回結果から引き継ぐ
+            for link in store.merge(pages, list(graph.links()), lastmods):
+                graph.add_link(link['source_url'], link['target_url'], link['anchor_text'], link['source_title'])
+            store.save()
 
+        inbound_counts = graph.inbound_counts()
         for url in pages:
-            pages[url]['inbound_links'] = len(set([src for src, tgt in links if tgt == url]))
+            pages[url]['inbound_links'] = inbound_counts.get(url, 0)
         
-        status_callback(f"分析完了。{len(pages)}ページ、{len(links)}リンクを検出。除外リンク: {excluded_links_count}")
+        status_callback(f"分析完了。{len(pages)}ページ、{len(graph)}リンクを検出。除外リンク: {excluded_links_count}")
 
     except Exception as e:
         status_callback(f"致命的なエラーが発生しました: {e}")
-        return "A_番号,B_ページタイトル,C_URL,D_被リンク元ページタイトル,E_被リンク元ページURL,F_被リンク元ページアンカーテキスト\n"
+        return header_only(output_format)
 
     # --- 最後にCSV文字列を生成して返します ---
-    output = StringIO()
-    writer = csv.writer(output)
+    writer = LinkTableWriter(output_format)
     writer.writerow(['A_番号', 'B_ページタイトル', 'C_URL', 'D_被リンク元ページタイトル', 'E_被リンク元ページURL', 'F_被リンク元ページアンカーテキスト'])
     
-    target_groups = {}
-    for link in detailed_links:
-        target_url = link['target_url']
-        if target_url not in target_groups: target_groups[target_url] = []
-        target_groups[target_url].append(link)
-    
-    sorted_targets = sorted(target_groups.items(), key=lambda x: len(x[1]), reverse=True)
+    sorted_targets = list(graph.links_by_target())
     
     page_numbers = {}
     current_page_number = 1
@@ -283,4 +283,4 @@ def analyze(status_callback):
             if page_number:
                 writer.writerow([page_number, info['title'], url, '', '', ''])
 
-    return output.getvalue()
+    return writer.getvalue()
@@ -2,18 +2,23 @@
 
 # 必要なライブラリのみをインポート
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from urllib.parse import urljoin, urlparse
-import time
 import re
-import csv
-from io import StringIO
-import html
+
+from crawl_engine import fetch_many, mount_pool
+from html_parse import parse_html
+from link_index import LinkIndex
+from wp_harvest import harvest
+from link_export import LinkTableWriter, header_only
+
+POST_LIST_ITEM_CLASS = re.compile(r'p-postList__item|post-item|entry-item')
+POST_LIST_ITEMS = SoupStrainer(['article', 'div'], class_=POST_LIST_ITEM_CLASS)
 
 # ★★★ このファイルが呼び出されたときに実行される本体です ★★★
-def analyze(status_callback):
+def analyze(status_callback, output_format='csv'):
     """
-    fuyohin-kaishu.co.jp の分析を実行し、結果をCSV文字列で返す関数。
+    fuyohin-kaishu.co.jp の分析を実行し、結果をCSV文字列（output_format='parquet' / 'feather' なら列指向ファイルの bytes）で返す関数。
     主のオリジナルのロジックを、一切変更せずに移植。
     """
 
@@ -33,7 +38,7 @@ def analyze(status_callback):
         {'name': '未分類', 'url': f'https://{domain}/uncategorized', 'path': '/uncategorized/', 'id': 1},
         {'name': '遺品整理・生前整理', 'url': f'https://{domain}/sorting-out-belongings', 'path': '/sorting-out-belongings/', 'id': 176}
     ]
-    session = requests.Session()
+    session = mount_pool(requests.Session())
     session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'})
 
     def log(message):
@@ -57,12 +62,15 @@ def analyze(status_callback):
             try:
                 list_url = f"{category['url']}/page/{page}" if page > 1 else category['url']
                 log(f"  ページ{page}を確認中: {list_url}")
-                response = session.get(list_url, timeout=30)
+                # 次のページの有無は前のページの結果で決まるので1件ずつ。間隔・減速はホスト毎の制御に任せる
+                [(_, response, error)] = fetch_many(session, [list_url], delay=0.8, timeout=30)
+                if error is not None: raise error
                 if response.status_code != 200: break
                 
-                soup = BeautifulSoup(response.text, 'html.parser')
+                # 一覧ページは記事カード部分だけを構築
+                soup = parse_html(response.text, parse_only=POST_LIST_ITEMS)
                 page_articles = []
-                for item in soup.find_all(['article', 'div'], class_=re.compile(r'p-postList__item|post-item|entry-item')):
+                for item in soup.find_all(['article', 'div'], class_=POST_LIST_ITEM_CLASS):
                     link = item.find('a', href=True)
                     if link and link.get('href'):
                         full_url = urljoin(list_url, link.get('href'))
@@ -76,35 +84,23 @@ def analyze(status_callback):
                     log(f"    ページ{page}: {len(page_articles)}記事発見")
                 else: break
                 page += 1
-                time.sleep(0.8)
             except Exception as e:
                 log(f"  ページ{page}エラー: {str(e)}")
                 break
         return articles
 
-    def get_articles_from_wp_api():
-        articles = []
-        try:
-            api_url = f"https://{domain}/wp-json/wp/v2/posts"
-            page, per_page = 1, 100
-            while page <= 10:
-                log(f"WordPress API ページ{page}を取得中...")
-                response = session.get(api_url, params={'page': page, 'per_page': per_page, 'status': 'publish'}, timeout=30)
-                if response.status_code != 200: break
-                posts = response.json()
-                if not posts: break
-                for post in posts:
-                    post_url = post.get('link', '')
-                    if any(cat['path'] in post_url for cat in categories):
-                        category_name = next((cat['name'] for cat in categories if cat['path'] in post_url), "その他")
-                        title = html.unescape(re.sub(r'<[^>]+>', '', post.get('title', {}).get('rendered', ''))).strip()
-                        if len(title) > 3:
-                            articles.append({'url': post_url.rstrip('/'), 'title': title[:150], 'category': category_name})
-                page += 1
-                time.sleep(0.5)
-        except Exception as e:
-            log(f"WordPress API取得エラー: {str(e)}")
-        return articles
+    def category_of(url):
+        return next((cat['name'] for cat in categories if cat['path'] in url), "その他")
+
+    def harvest_from_wp_api(link_index):
+        # 本文HTML（content.rendered）からリンクを抽出し、記事ページを個別に取得しない
+        api_pages, api_links = harvest(session, f"https://{domain}", post_types=('posts',), normalize=normalize_url_for_analysis,
+                                       is_target=is_target_article, params={'status': 'publish'}, link_index=link_index, delay=0.5, log=log)
+        for url, page in api_pages.items():
+            pages[url] = {**page, 'category': category_of(url)}
+        for link in api_links:
+            detailed_links.append({**link, 'source_category': pages[link['source_url']]['category']})
+        return api_pages
 
     def get_articles_from_sitemap():
         articles = []
@@ -188,20 +184,20 @@ def analyze(status_callback):
     def fetch_missing_page_titles(detailed_links, pages):
         missing_urls = {link['target_url'] for link in detailed_links if link['target_url'] not in pages}
         log(f"タイトル未取得のページ: {len(missing_urls)}個")
-        for i, url in enumerate(missing_urls):
+        fetched = fetch_many(session, missing_urls, delay=0.5, timeout=30)
+        for i, (url, response, error) in enumerate(fetched):
             try:
                 log(f"  タイトル取得中 {i+1}/{len(missing_urls)}: {url}")
-                response = session.get(url, timeout=30)
+                if error is not None: raise error
                 category = next((cat['name'] for cat in categories if cat['path'] in url), "その他")
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
+                    soup = parse_html(response.text)
                     page_title = extract_page_title(soup, {'url': url, 'title': '', 'category': category})
                     pages[url] = {'title': page_title, 'category': category, 'outbound_links': [], 'inbound_links': 0}
                 else:
                     slug = url.split('/')[-1]
                     generated_title = slug.replace('-', ' ').title() if slug else url
                     pages[url] = {'title': generated_title, 'category': category, 'outbound_links': [], 'inbound_links': 0}
-                time.sleep(0.5)
             except Exception:
                 slug = url.split('/')[-1]
                 fallback_title = slug.replace('-', ' ').title() if slug else url
@@ -210,40 +206,44 @@ def analyze(status_callback):
     # --- ここからが分析の実行部分です ---
     try:
         log("記事一覧を取得中...")
+        link_index = LinkIndex()
         all_articles = []
-        for category in categories:
-            log(f"=== {category['name']} カテゴリ分析開始 ===")
-            all_articles.extend(get_articles_from_category(category))
-            time.sleep(1)
-        all_articles.extend(get_articles_from_wp_api())
+        if harvest_from_wp_api(link_index):
+            log(f"WordPress API から {len(pages)} 記事を取得（カテゴリ一覧の巡回を省略）")
+        else:
+            for category in categories:
+                log(f"=== {category['name']} カテゴリ分析開始 ===")
+                all_articles.extend(get_articles_from_category(category))
         all_articles.extend(get_articles_from_sitemap())
-        articles = remove_duplicate_articles(all_articles)
+        # API で取得済みの記事は除き、サイトマップ等でだけ見つかった記事のHTMLを取得する
+        articles = [article for article in remove_duplicate_articles(all_articles) if normalize_url_for_analysis(article['url']) not in pages]
         
-        if not articles: raise Exception("記事が見つかりませんでした")
-        log(f"合計 {len(articles)} 記事を発見")
+        if not pages and not articles: raise Exception("記事が見つかりませんでした")
+        log(f"合計 {len(pages) + len(articles)} 記事を発見")
         
-        processed_links = set()
+        log(f"記事ページを並列取得中 ({len(articles)}件、API本文から {len(pages)}件)...")
+        fetched = {article['url']: result for article, result in
+                   zip(articles, fetch_many(session, [article['url'] for article in articles], delay=0.3, timeout=30))}
         for i, article in enumerate(articles):
             try:
                 log(f"記事分析中 {i+1}/{len(articles)}: {article['title'][:30]}...")
-                response = session.get(article['url'], timeout=30)
+                _, response, error = fetched[article['url']]
+                if error is not None: raise error
                 if response.status_code != 200:
                     pages[article['url']] = {'title': article['title'], 'category': article.get('category', '不明'), 'outbound_links': [], 'inbound_links': 0}
                     continue
                 
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = parse_html(response.text)
                 page_title = extract_page_title(soup, article)
                 pages[article['url']] = {'title': page_title, 'category': article.get('category', '不明'), 'outbound_links': [], 'inbound_links': 0}
-                
                 content = extract_main_content(soup)
+                
                 if content:
                     for link_data in extract_links_from_content(content):
                         target_url = normalize_url_for_analysis(link_data['url'])
-                        if is_target_article(target_url) and (article['url'], target_url) not in processed_links:
-                            processed_links.add((article['url'], target_url))
+                        if is_target_article(target_url) and link_index.add(article['url'], target_url):
                             pages[article['url']]['outbound_links'].append(target_url)
                             detailed_links.append({'source_url': article['url'], 'source_title': page_title, 'source_category': article.get('category', '不明'), 'target_url': target_url, 'anchor_text': link_data['anchor_text']})
-                time.sleep(0.3)
             except Exception as e:
                 log(f"記事分析エラー {article['url']}: {str(e)}")
                 if article['url'] not in pages:
@@ -252,19 +252,17 @@ def analyze(status_callback):
         
         fetch_missing_page_titles(detailed_links, pages)
         
-        for link in detailed_links:
-            if link['target_url'] in pages:
-                pages[link['target_url']]['inbound_links'] = pages[link['target_url']].get('inbound_links', 0) + 1
+        for url in pages:
+            pages[url]['inbound_links'] = link_index.inbound_count(url)
         
         log(f"最終結果: {len(pages)}ページ, {len(detailed_links)}内部リンク")
 
     except Exception as e:
         log(f"致命的なエラーが発生しました: {e}")
-        return "A_番号,B_ページタイトル,C_URL,D_被リンク元ページタイトル,E_被リンク元ページURL,F_被リンク元ページアンカーテキスト\n"
+        return header_only(output_format)
 
     # --- 最後にCSV文字列を生成して返します ---
-    output = StringIO()
-    writer = csv.writer(output)
+    writer = LinkTableWriter(output_format)
     writer.writerow(['A_番号', 'B_ページタイトル', 'C_URL', 'D_被リンク元ページタイトル', 'E_被リンク元ページURL', 'F_被リンク元ページアンカーテキスト'])
     
     target_groups = {}
@@ -287,4 +285,4 @@ def analyze(status_callback):
     for url, info in isolated_pages:
         writer.writerow(['', info.get('title', 'タイトル不明'), url, '（被リンクなし）', '', ''])
 
-    return output.getvalue()
+    return writer.getvalue()
@@ -4,15 +4,17 @@
 import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import time
 import re
-import csv
-from io import StringIO
+
+from crawl_engine import crawl, mount_pool
+from html_parse import parse_html
+from link_index import LinkIndex
+from link_export import LinkTableWriter, header_only
 
 # ★★★ このファイルが呼び出されたときに実行される本体です ★★★
-def analyze(status_callback):
+def analyze(status_callback, output_format='csv'):
     """
-    more-pay.jp の分析を実行し、結果をCSV文字列で返す関数。
+    more-pay.jp の分析を実行し、結果をCSV文字列（output_format='parquet' / 'feather' なら列指向ファイルの bytes）で返す関数。
     主のオリジナルのロジックを、一切変更せずに移植。
     """
 
@@ -159,7 +161,7 @@ def analyze(status_callback):
     try:
         base_url = "https://more-pay.jp"
         domain = urlparse(base_url).netloc
-        session = requests.Session()
+        session = mount_pool(requests.Session())
         session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -167,69 +169,61 @@ def analyze(status_callback):
         })
         
         to_visit = generate_seed_urls(base_url, session)
-        visited = set()
-        processed_links = set()
+        link_index = LinkIndex()
         
         status_callback(f"=== more-pay.jp 分析開始 ===")
         
         crawl_count = 0
-        while to_visit and crawl_count < 1000: # 上限設定
-            url = to_visit.pop(0)
-            normalized_url = normalize_url(url)
-            if normalized_url in visited: continue
 
-            try:
-                response = session.get(url, timeout=15)
-                if response.status_code != 200: continue
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                if is_noindex_page(soup):
-                    visited.add(normalized_url)
-                    continue
+        def process_page(url, response):
+            nonlocal crawl_count
+            normalized_url = normalize_url(url)
+            if response.status_code != 200: return None
+            
+            soup = parse_html(response.text)
+            if is_noindex_page(soup):
+                return None
+            
+            extracted = extract_links(soup)
+            title = extract_title(soup, normalized_url)
+            pages[normalized_url] = {'title': title, 'outbound_links': []}
+
+            discovered = []
+            for link_data in extracted:
+                try:
+                    absolute_url = urljoin(normalized_url, link_data['url'])
+                    normalized_link = normalize_url(absolute_url)
+                except: continue
                 
-                extracted = extract_links(soup)
-                title = extract_title(soup, normalized_url)
-                pages[normalized_url] = {'title': title, 'outbound_links': []}
-
-                for link_data in extracted:
-                    try:
-                        absolute_url = urljoin(normalized_url, link_data['url'])
-                        normalized_link = normalize_url(absolute_url)
-                    except: continue
-                    
-                    if is_internal(normalized_link, domain) and is_content(normalized_link):
-                        if (normalized_url, normalized_link) not in processed_links:
-                            processed_links.add((normalized_url, normalized_link))
-                            links.append((normalized_url, normalized_link))
-                            pages[normalized_url]['outbound_links'].append(normalized_link)
-                            detailed_links.append({
-                                'source_url': normalized_url, 'source_title': title,
-                                'target_url': normalized_link, 'anchor_text': link_data['anchor_text']
-                            })
-                        if normalized_link not in visited and normalized_link not in to_visit:
-                            to_visit.append(normalized_link)
-
-                visited.add(normalized_url)
-                crawl_count += 1
-                status_callback(f"クロール中 ({crawl_count}/1000): {title[:50]}...")
-                time.sleep(0.2)
-
-            except Exception as e:
-                status_callback(f"  - エラー発生: {url} - {e}")
-                continue
+                if is_internal(normalized_link, domain) and is_content(normalized_link):
+                    if link_index.add(normalized_url, normalized_link):
+                        links.append((normalized_url, normalized_link))
+                        pages[normalized_url]['outbound_links'].append(normalized_link)
+                        detailed_links.append({
+                            'source_url': normalized_url, 'source_title': title,
+                            'target_url': normalized_link, 'anchor_text': link_data['anchor_text']
+                        })
+                    discovered.append(normalized_link)
+
+            crawl_count += 1
+            status_callback(f"クロール中 ({crawl_count}/1000): {title[:50]}...")
+            return discovered
+
+        # 並列フェッチエンジンでクロール（ホスト毎の同時数・間隔で礼儀正しさを担保）
+        crawl(session, to_visit, process_page, normalize=normalize_url, max_pages=1000, delay=0.2,
+              on_error=lambda url, e: status_callback(f"  - エラー発生: {url} - {e}"))
 
         for url in pages:
-            pages[url]['inbound_links'] = sum(1 for _, tgt in links if tgt == url)
+            pages[url]['inbound_links'] = link_index.inbound_count(url)
         
         status_callback(f"分析完了。{len(pages)}ページ、{len(links)}リンクを検出。")
 
     except Exception as e:
         status_callback(f"致命的なエラーが発生しました: {e}")
-        return "A_番号,B_ページタイトル,C_URL,D_被リンク元ページタイトル,E_被リンク元ページURL,F_被リンク元ページアンカーテキスト\n"
+        return header_only(output_format)
 
     # --- 最後にCSV文字列を生成して返します ---
-    output = StringIO()
-    writer = csv.writer(output)
+    writer = LinkTableWriter(output_format)
     writer.writerow(['A_番号', 'B_ページタイトル', 'C_URL', 'D_被リンク元ページタイトル', 'E_被リンク元ページURL', 'F_被リンク元ページアンカーテキスト'])
     
     target_groups = {}
@@ -249,4 +243,4 @@ def analyze(status_callback):
         if info.get('inbound_links', 0) == 0:
             writer.writerow(['', info['title'], url, '', '', ''])
 
-    return output.getvalue()
+    return writer.getvalue()
@@ -2,17 +2,19 @@
 
 # 必要なライブラリのみをインポート
 import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import time
 import re
-import csv
-from io import StringIO
+
+from crawl_engine import crawl, mount_pool
+from html_parse import parse_html
+from link_index import LinkIndex
+from page_cache import PageCache
+from link_export import LinkTableWriter, header_only
 
 # ★★★ このファイルが呼び出されたときに実行される本体です ★★★
-def analyze(status_callback):
+def analyze(status_callback, output_format='csv'):
     """
-    pay-ful.jp の分析を実行し、結果をCSV文字列で返す関数。
+    pay-ful.jp の分析を実行し、結果をCSV文字列（output_format='parquet' / 'feather' なら列指向ファイルの bytes）で返す関数。
     主のオリジナルのロジックを、一切変更せずに移植。
     """
 
@@ -70,75 +72,58 @@ def analyze(status_callback):
     # --- ここからが分析の実行部分です ---
     try:
         pages, links, detailed_links = {}, [], []
-        visited, to_visit = set(), [normalize_url("https://pay-ful.jp/media/")]
+        to_visit = [normalize_url("https://pay-ful.jp/media/")]
         
         for i in range(2, 5): to_visit.append(f"https://pay-ful.jp/media/page/{i}/")
 
-        session = requests.Session()
+        session = mount_pool(requests.Session())
         session.headers.update({'User-Agent': 'Mozilla/5.0'})
         
         status_callback("=== pay-ful.jp 分析開始 ===")
         status_callback("フェーズ1: ページ収集中...")
         
-        crawl_count = 0
-        while to_visit and crawl_count < 500: # 上限設定
-            url = to_visit.pop(0)
-            if url in visited: continue
+        # フェーズ2用のリンク抽出結果（フェーズ2では再取得しない）
+        page_cache = PageCache()
+
+        def collect_page(url, response):
+            if response.status_code != 200: return None
             
-            try:
-                response = session.get(url, timeout=15)
-                if response.status_code != 200: continue
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                robots = soup.find('meta', attrs={'name': 'robots'})
-                if robots and 'noindex' in robots.get('content', '').lower(): continue
-                
-                if '/page/' in url or url.endswith('/media'):
-                    page_links = extract_links_for_crawling(soup, url)
-                    new_links = [l for l in page_links if l not in visited and l not in to_visit]
-                    to_visit.extend(new_links)
-                    visited.add(url)
-                    continue
-                
-                if is_valid_page(url):
-                    title = (soup.find('h1') or soup.find('title')).get_text(strip=True) if (soup.find('h1') or soup.find('title')) else url
-                    title = re.sub(r'\s*[|\-]\s*.*(pay-ful|ペイフル).*$', '', title, flags=re.IGNORECASE).strip()
-                    pages[url] = {'title': title, 'outbound_links': []}
-                    
-                    page_links = extract_links_for_crawling(soup, url)
-                    new_links = [l for l in page_links if l not in visited and l not in to_visit]
-                    to_visit.extend(new_links)
-                
-                visited.add(url)
-                crawl_count = len(pages)
-                status_callback(f"収集中: {crawl_count}記事")
-                time.sleep(0.1)
-                
-            except Exception as e:
-                status_callback(f"  - エラー: {url} - {e}")
-                continue
+            soup = parse_html(response.text)
+            
+            robots = soup.find('meta', attrs={'name': 'robots'})
+            if robots and 'noindex' in robots.get('content', '').lower(): return None
+            
+            # 一覧ページはリンクを辿るのみで記事数には数えない
+            if '/page/' in url or url.endswith('/media'):
+                return extract_links_for_crawling(soup, url)
+            
+            page_links = []
+            if is_valid_page(url):
+                title = (soup.find('h1') or soup.find('title')).get_text(strip=True) if (soup.find('h1') or soup.find('title')) else url
+                title = re.sub(r'\s*[|\-]\s*.*(pay-ful|ペイフル).*$', '', title, flags=re.IGNORECASE).strip()
+                pages[url] = {'title': title, 'outbound_links': []}
+                page_links = extract_links_for_crawling(soup, url)
+                page_cache[url] = extract_content_links(soup, url)
+            
+            status_callback(f"収集中: {len(pages)}記事")
+            return page_links
+
+        crawl(session, to_visit, collect_page, max_pages=500, delay=0.1, count=lambda: len(pages),
+              on_error=lambda url, e: status_callback(f"  - エラー: {url} - {e}"))
 
         status_callback(f"=== フェーズ1完了: {len(pages)}記事 ===")
         status_callback("=== フェーズ2: リンク関係構築 ===")
         
-        processed = set()
-        for i, url in enumerate(list(pages.keys())):
-            if not is_valid_page(url): continue
-            
+        link_index = LinkIndex()
+        for i, url in enumerate(pages):
             try:
                 status_callback(f"リンク解析中: {i+1}/{len(pages)}")
-                response = session.get(url, timeout=15)
-                if response.status_code != 200: continue
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                content_links = extract_content_links(soup, url)
+                content_links = page_cache.get(url, [])
                 
                 for link_data in content_links:
                     target = link_data['url']
                     if target in pages and target != url:
-                        if (url, target) not in processed:
-                            processed.add((url, target))
+                        if link_index.add(url, target):
                             links.append((url, target))
                             pages[url]['outbound_links'].append(target)
                             detailed_links.append({
@@ -150,17 +135,17 @@ def analyze(status_callback):
                 continue
 
         for url in pages:
-            pages[url]['inbound_links'] = sum(1 for s, t in links if t == url)
+            pages[url]['inbound_links'] = link_index.inbound_count(url)
+        page_cache.close()
 
         status_callback(f"=== 分析完了: {len(pages)}記事, {len(links)}リンク ===")
 
     except Exception as e:
         status_callback(f"致命的なエラーが発生しました: {e}")
-        return "A_番号,B_ページタイトル,C_URL,D_被リンク元ページタイトル,E_被リンク元ページURL,F_被リンク元ページアンカーテキスト\n"
+        return header_only(output_format)
 
     # --- 最後にCSV文字列を生成して返します ---
-    output = StringIO()
-    writer = csv.writer(output)
+    writer = LinkTableWriter(output_format)
     writer.writerow(['A_番号', 'B_ページタイトル', 'C_URL', 'D_被リンク元ページタイトル', 'E_被リンク元ページURL', 'F_被リンク元ページアンカーテキスト'])
     
     targets = {}
@@ -177,4 +162,4 @@ def analyze(status_callback):
         if info.get('inbound_links', 0) == 0:
             writer.writerow(['', info['title'], url, '', '', ''])
 
-    return output.getvalue()
+    return writer.getvalue()
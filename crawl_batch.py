@@ -0,0 +1,157 @@
+# crawl_batch.py
+"""
+auto_* クローラーのコマンドライン一括実行（ブラウザ不要、夜間の定期実行用）
+- サイト毎にプロセスプールの別プロセスで実行し、サイト間を並列化（サイト内の並列フェッチは crawl_engine のまま）。
+  HTML解析などのCPU処理もサイト毎に別コアで動く
+- analyze(status_callback) 型と analyze_step(state) / generate_csv(state) 型のどちらのクローラーにも対応
+- 出力先に <サイト名>.csv（--format で .parquet / .feather）とログ <サイト名>.log、実行結果の一覧 summary.json を書き出す。
+  失敗（エラー、または列名だけでデータ行の無い結果）したサイトがあれば終了コード 1
+
+使い方:
+    python crawl_batch.py --list                                   # サイト一覧
+    python crawl_batch.py                                          # 全サイト
+    python crawl_batch.py friendpay kau_ru -f feather -j 2 --incremental -o results/nightly
+"""
+
+import argparse
+import glob
+import importlib
+import inspect
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from link_export import AVAILABLE_FORMATS, FILE_EXTENSIONS
+
+SITE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT_DIR = 'crawl_results'
+FINISHED_PHASES = ('completed', 'error')  # analyze_step 型の終了フェーズ
+# analyze 型のクローラーは致命的なエラーを自身で捕捉して列名だけの結果を返すため、データ行が無い 'empty' も失敗とする
+FAILED_STATUSES = ('error', 'empty')
+
+
+def available_sites():
+    """auto_<サイト名>.py のサイト名の一覧"""
+    return sorted(os.path.basename(path)[len('auto_'):-len('.py')] for path in glob.glob(os.path.join(SITE_DIR, 'auto_*.py')))
+
+
+def output_name(site):
+    """出力ファイル名の基本部分（main.py のサイト名推測に合わせて kau_ru → kau-ru）"""
+    return site.replace('_', '-')
+
+
+def count_rows(content, file_format):
+    """書き出した結果のデータ行数"""
+    from csv_ingest import read_links
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    return len(read_links(data, 'result' + FILE_EXTENSIONS[file_format]))
+
+
+def crawl_site(module, log, output_format='csv', incremental=False):
+    """クローラーモジュールを実行して結果（CSV文字列または bytes）を返す。analyze_step 型がエラーで終了した場合は RuntimeError"""
+    if hasattr(module, 'analyze'):
+        options = {'output_format': output_format}
+        if 'incremental' in inspect.signature(module.analyze).parameters:
+            options['incremental'] = incremental
+        return module.analyze(log, **options)
+
+    state = {'phase': 'initializing', 'incremental': incremental}
+    while state['phase'] not in FINISHED_PHASES:
+        state = module.analyze_step(state)
+        for message in state.pop('log', []):
+            log(message)
+    if state['phase'] == 'error':
+        raise RuntimeError("クロールがエラーで終了しました（ログを参照）")
+    return module.generate_csv(state, output_format)
+
+
+def run_site(site, output_dir, output_format='csv', incremental=False):
+    """1サイトをクロールして結果とログを書き出し、サマリー（dict）を返す（プロセスプールのワーカーで実行）"""
+    started = time.time()
+    base = os.path.join(output_dir, output_name(site))
+    summary = {'site': site, 'status': 'error', 'output': None, 'rows': 0, 'bytes': 0, 'log': base + '.log'}
+    with open(base + '.log', 'w', encoding='utf-8') as log_file:
+        def log(message):
+            log_file.write(f"[{time.strftime('%H:%M:%S')}] {message}\n")
+            log_file.flush()
+
+        try:
+            content = crawl_site(importlib.import_module(f'auto_{site}'), log, output_format, incremental)
+            path = base + FILE_EXTENSIONS[output_format]
+            data = content.encode('utf-8') if isinstance(content, str) else content
+            # 書き終えてから置き換え、途中で止まっても前回の結果を壊さない
+            with open(path + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(path + '.tmp', path)
+            rows = count_rows(content, output_format)
+            summary.update({'status': 'ok' if rows else 'empty', 'output': path, 'rows': rows, 'bytes': len(data)})
+        except Exception as e:
+            log(f"致命的なエラーが発生しました: {e!r}")
+            summary['error'] = repr(e)
+    summary['seconds'] = round(time.time() - started, 1)
+    return summary
+
+
+def run_batch(sites, output_dir, output_format='csv', incremental=False, jobs=None):
+    """サイトをプロセスプールで並列に実行し、summary.json を書き出してサマリーを返す"""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = jobs or min(len(sites), os.cpu_count() or 1)
+    started = time.time()
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_site, site, output_dir, output_format, incremental): site for site in sites}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:  # ワーカープロセスの異常終了など
+                result = {'site': futures[future], 'status': 'error', 'output': None, 'rows': 0, 'bytes': 0, 'error': repr(e)}
+            results.append(result)
+            print(f"[{time.strftime('%H:%M:%S')}] {result['site']:<18} {result['status']:<6} "
+                  f"{result['rows']:>9,}行  {result.get('seconds', 0):>8.1f} s", flush=True)
+
+    results.sort(key=lambda result: sites.index(result['site']))
+    summary = {
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+        'seconds': round(time.time() - started, 1),
+        'format': output_format, 'incremental': incremental, 'jobs': jobs,
+        'failed': [result['site'] for result in results if result['status'] in FAILED_STATUSES],
+        'sites': results,
+    }
+    with open(os.path.join(output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def main(argv=None):
+    sites = available_sites()
+    parser = argparse.ArgumentParser(description="auto_* クローラーをブラウザなしで一括実行（サイト毎に並列）")
+    parser.add_argument('sites', nargs='*', metavar='site', help="実行するサイト（省略時は全サイト）: " + ", ".join(sites))
+    parser.add_argument('-f', '--format', choices=AVAILABLE_FORMATS, default='csv',
+                        help="出力形式（既定: csv。parquet / feather は pyarrow が必要）")
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help=f"出力先（既定: {DEFAULT_OUTPUT_DIR}/<実行日時>）")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="同時に実行するサイト数（既定: CPUコア数）")
+    parser.add_argument('--incremental', action='store_true', help="対応するクローラーは差分クロール")
+    parser.add_argument('--list', action='store_true', help="サイト一覧を表示して終了")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(sites))
+        return 0
+    unknown = [site for site in args.sites if site not in sites]
+    if unknown:
+        parser.error(f"不明なサイト: {', '.join(unknown)}（--list で一覧）")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs は1以上を指定してください")
+
+    selected = list(dict.fromkeys(args.sites)) or sites
+    output_dir = args.output_dir or os.path.join(DEFAULT_OUTPUT_DIR, time.strftime('%Y%m%d-%H%M%S'))
+    summary = run_batch(selected, output_dir, args.format, args.incremental, args.jobs)
+    print(f"完了: {len(selected) - len(summary['failed'])}/{len(selected)}サイト {summary['seconds']:.1f} s → {output_dir}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
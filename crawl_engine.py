@@ -0,0 +1,366 @@
+# crawl_engine.py
+"""
+auto_* クローラー共通の並列フェッチエンジン
+- asyncio でリクエストを管理し、requests.Session の GET はスレッドプールで並列実行
+- ホスト単位のトークンバケットで同時リクエスト数と毎秒リクエスト数・バーストを制限
+- robots.txt の Crawl-delay と Retry-After を守り、429/503 では速度を半減して再試行
+- ホスト毎の状態（速度・停止期限・Crawl-delay）は Session 毎に保持し、fetch_many 等を繰り返し呼んでも引き継ぐ
+- 各クローラーは normalize_url / ページ処理（is_content・extract_links を含む）をコールバックで差し込む
+"""
+
+import asyncio
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import partial
+from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+
+from requests.adapters import HTTPAdapter
+
+from crawl_frontier import CrawlFrontier
+from http_cache import DEFAULT_CACHE_DIR, CachingAdapter
+
+# 既定の礼儀正しさ設定
+DEFAULT_PER_HOST = 4        # ホスト毎の同時リクエスト数
+DEFAULT_DELAY = 0.1         # 同一ホストへの平均リクエスト間隔（秒）= 1 / 毎秒リクエスト数
+DEFAULT_BURST = 1           # 間隔を空けずに連続で開始できるリクエスト数
+DEFAULT_MAX_IN_FLIGHT = 16  # 全体の同時リクエスト数
+DEFAULT_RETRIES = 2         # 429/503 の再試行回数
+
+# 429/503 を受けたときの減速
+RETRY_STATUSES = (429, 503)
+MIN_RATE = 0.2              # 減速時の下限（毎秒リクエスト数）
+BACKOFF_RATE = 4.0          # 無制限設定のホストが初めて減速するときの基準
+DEFAULT_BACKOFF = 5.0       # Retry-After がないときの待機秒数
+MAX_RETRY_AFTER = 120.0     # Retry-After の上限（秒）
+
+
+def mount_pool(session, pool_size=DEFAULT_MAX_IN_FLIGHT, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    並列リクエスト数に合わせてコネクションプールを拡張。
+    cache_dir を指定するとディスクHTTPキャッシュ（条件付き再検証）を有効にする。
+    """
+    if cache_dir:
+        adapter = CachingAdapter(cache_dir, pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def retry_after_seconds(value):
+    """Retry-After ヘッダー（秒数またはHTTP日付）を待機秒数に変換"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class _Bucket:
+    """
+    1ホスト分のトークンバケット。
+    速度・トークン・停止期限は呼び出しをまたいで保持し、イベントループに属するセマフォ・ロックはループ毎に作り直す
+    """
+
+    def __init__(self, per_host, rate, burst):
+        self.loop = None
+        self.semaphore = None
+        self.lock = None
+        self.robots_rate = float('inf')  # robots.txt の Crawl-delay による上限
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = float(burst)
+        self.updated = None
+        self.paused_until = 0.0  # time.monotonic() 基準
+        self.ready = None  # robots.txt の読み込み
+        self.configure(per_host, rate, burst)
+
+    def configure(self, per_host, rate, burst):
+        """呼び出し毎の設定を反映（減速中なら減速後の速度を保つ）"""
+        backed_off = self.rate < self.max_rate
+        self.per_host = per_host
+        self.burst = burst
+        self.tokens = min(self.tokens, float(burst))
+        self.max_rate = min(rate, self.robots_rate)
+        self.rate = min(self.rate, self.max_rate) if backed_off else self.max_rate
+
+    def bind(self, loop):
+        if self.loop is not loop:
+            self.loop = loop
+            self.semaphore = asyncio.Semaphore(self.per_host)
+            self.lock = asyncio.Lock()
+            if self.ready is not None and not self.ready.done():
+                self.ready = None  # 前回の呼び出しで読み込みが終わらなかった場合は読み直す
+
+    def limit(self, rate):
+        self.robots_rate = min(self.robots_rate, rate)
+        self.max_rate = min(self.max_rate, rate)
+        self.rate = min(self.rate, rate)
+
+    def refill(self, now):
+        if self.rate == float('inf'):
+            self.tokens = float(self.burst)
+        elif self.updated is not None:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class HostLimiter:
+    """
+    ホスト単位のトークンバケット。
+    毎秒 1/delay 件・最大 burst 件まで連続で開始でき、同時実行数は per_host まで。
+    429/503 を受けると Retry-After（なければ既定秒数）だけ停止して速度を半減し、成功が続くと元の速度まで戻す。
+    robots（オリジン→Crawl-delay秒 を返すコルーチン関数）を渡すと、その間隔より速くは送らない。
+    同じインスタンスを複数回のイベントループで使い回せる（同時に複数のループからは使わない）。
+    """
+
+    def __init__(self, per_host=DEFAULT_PER_HOST, delay=DEFAULT_DELAY, burst=DEFAULT_BURST, robots=None):
+        self.robots = robots
+        self._buckets = {}
+        self.configure(per_host, delay, burst)
+
+    def configure(self, per_host=DEFAULT_PER_HOST, delay=DEFAULT_DELAY, burst=DEFAULT_BURST):
+        """設定を変更。既存ホストの減速・停止・Crawl-delay はそのまま"""
+        self.per_host = max(1, per_host)
+        self.rate = 1.0 / delay if delay > 0 else float('inf')
+        self.burst = max(1, burst)
+        for bucket in self._buckets.values():
+            bucket.configure(self.per_host, self.rate, self.burst)
+
+    def _host(self, url):
+        host = urlparse(url).netloc.lower()
+        return host[len('www.'):] if host.startswith('www.') else host
+
+    async def _load_robots(self, bucket, url):
+        parsed = urlparse(url)
+        crawl_delay = await self.robots(f"{parsed.scheme}://{parsed.netloc}")
+        if crawl_delay:
+            bucket.limit(1.0 / crawl_delay)
+
+    async def _bucket(self, url):
+        host = self._host(url)
+        if host not in self._buckets:
+            self._buckets[host] = _Bucket(self.per_host, self.rate, self.burst)
+        bucket = self._buckets[host]
+        bucket.bind(asyncio.get_running_loop())
+        if self.robots and bucket.ready is None:
+            bucket.ready = asyncio.ensure_future(self._load_robots(bucket, url))
+        if bucket.ready:
+            await bucket.ready
+        return host, bucket
+
+    async def acquire(self, url):
+        host, bucket = await self._bucket(url)
+        await bucket.semaphore.acquire()
+
+        # トークンが溜まるまで（停止中なら停止明けまで）待つ。待機はロック内で行い先着順を保つ
+        async with bucket.lock:
+            while True:
+                now = time.monotonic()
+                bucket.refill(now)
+                wait = bucket.paused_until - now
+                if wait <= 0 and bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    break
+                await asyncio.sleep(max(wait, (1 - bucket.tokens) / bucket.rate))
+        return host
+
+    def release(self, host, response=None):
+        bucket = self._buckets[host]
+        bucket.semaphore.release()
+        if response is None:
+            return
+        if response.status_code in RETRY_STATUSES:
+            # 乗法的減速 + 一時停止
+            wait = retry_after_seconds(response.headers.get('Retry-After'))
+            now = time.monotonic()
+            bucket.paused_until = max(bucket.paused_until, now + (DEFAULT_BACKOFF if wait is None else wait))
+            bucket.rate = max(MIN_RATE, min(bucket.rate, BACKOFF_RATE) / 2)
+            bucket.tokens = 0.0
+        elif bucket.rate < bucket.max_rate:
+            # 加算的回復
+            bucket.rate = min(bucket.max_rate, bucket.rate + min(bucket.max_rate, BACKOFF_RATE) / 20)
+
+
+def _run(coro):
+    """イベントループの有無に関わらずコルーチンを同期実行"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # 既にループが動いている環境（Jupyter等）では別スレッドで実行
+    with ThreadPoolExecutor(max_workers=1) as runner:
+        return runner.submit(asyncio.run, coro).result()
+
+
+def _robots_crawl_delay(session, origin, timeout):
+    """robots.txt の Crawl-delay（自分の User-Agent 向け、なければ * 向け）"""
+    try:
+        res = session.get(f"{origin}/robots.txt", timeout=timeout)
+        if res.status_code != 200:
+            return None
+        parser = RobotFileParser()
+        parser.parse(res.text.splitlines())
+        return parser.crawl_delay(session.headers.get('User-Agent', '*'))
+    except Exception:
+        return None
+
+
+# Session 毎の HostLimiter（Session が破棄されると消える）
+_LIMITERS = weakref.WeakKeyDictionary()
+
+
+def _limiter(session, executor, per_host, delay, burst, timeout, respect_robots):
+    """Session の HostLimiter を今回の設定で取得（なければ作成）"""
+    robots = None
+    if respect_robots:
+        async def robots(origin):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, _robots_crawl_delay, session, origin, timeout)
+    limiter = _LIMITERS.get(session)
+    if limiter is None:
+        limiter = _LIMITERS[session] = HostLimiter(per_host, delay, burst)
+    else:
+        limiter.configure(per_host, delay, burst)
+    limiter.robots = robots
+    return limiter
+
+
+async def _fetch(session, url, limiter, executor, timeout, retries=DEFAULT_RETRIES, method='GET', **kwargs):
+    loop = asyncio.get_running_loop()
+    send = partial(session.request, method, url, timeout=timeout, **kwargs)
+    for attempt in range(retries + 1):
+        host = await limiter.acquire(url)
+        response = None
+        try:
+            response = await loop.run_in_executor(executor, send)
+        except Exception as e:
+            return url, None, e
+        finally:
+            limiter.release(host, response)
+        # 429/503 は Retry-After 明けに再試行（上限到達時はその応答を返す）
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return url, response, None
+
+
+async def _fetch_many(session, urls, per_host, delay, burst, timeout, max_in_flight, respect_robots):
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        limiter = _limiter(session, executor, per_host, delay, burst, timeout, respect_robots)
+        return await asyncio.gather(*[_fetch(session, url, limiter, executor, timeout) for url in urls])
+
+
+def fetch_many(session, urls, per_host=DEFAULT_PER_HOST, delay=DEFAULT_DELAY, timeout=15, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+               burst=DEFAULT_BURST, respect_robots=True):
+    """
+    URL群を並列取得し、入力順に (url, response, error) のリストを返す。
+    取得に失敗したURLは response=None, error=例外 となる。
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    return _run(_fetch_many(session, urls, per_host, delay, burst, timeout, max_in_flight, respect_robots))
+
+
+async def _probe(session, url, limiter, executor, timeout):
+    # HEAD で応答とリダイレクト先だけを確認（HEAD 非対応なら本文を読まない GET）
+    url, response, error = await _fetch(session, url, limiter, executor, timeout, method='HEAD', allow_redirects=False)
+    if response is not None and response.status_code in (405, 501):
+        url, response, error = await _fetch(session, url, limiter, executor, timeout, allow_redirects=False, stream=True)
+        if response is not None:
+            response.close()
+    if error is not None or response is None:
+        return url, None, None
+    if response.is_redirect:
+        return url, response.status_code, urljoin(url, response.headers['Location'])
+    return url, response.status_code, url if response.status_code == 200 else None
+
+
+async def _probe_many(session, urls, per_host, delay, burst, timeout, max_in_flight, respect_robots, on_result):
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        limiter = _limiter(session, executor, per_host, delay, burst, timeout, respect_robots)
+        tasks = [asyncio.ensure_future(_probe(session, url, limiter, executor, timeout)) for url in urls]
+        if on_result:
+            for task in tasks:
+                task.add_done_callback(lambda task: on_result(*task.result()))
+        return await asyncio.gather(*tasks)
+
+
+def probe_many(session, urls, per_host=DEFAULT_PER_HOST, delay=DEFAULT_DELAY, timeout=15, max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+               burst=DEFAULT_BURST, respect_robots=True, on_result=None):
+    """
+    本文を取得せずにURL群の生死とリダイレクト先を並列確認し、入力順に (url, status, location) のリストを返す。
+    location は 3xx ならリダイレクト先の絶対URL、200 ならそのURL、それ以外・通信エラーは None。
+    on_result(url, status, location) を渡すと完了した順に呼ぶ（進捗表示用）。
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    return _run(_probe_many(session, urls, per_host, delay, burst, timeout, max_in_flight, respect_robots, on_result))
+
+
+async def _crawl(session, seeds, process, normalize, max_pages, per_host, delay, burst, timeout, max_in_flight,
+                 on_error, count, priority, respect_robots):
+    frontier = CrawlFrontier(seeds, key=normalize, priority=priority)
+
+    counted = 0
+    pending = set()
+
+    def processed():
+        return count() if count else counted
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        limiter = _limiter(session, executor, per_host, delay, burst, timeout, respect_robots)
+        while frontier or pending:
+            # 上限に達するまで、空きスロット分だけ新規リクエストを投入
+            while frontier and len(pending) < max_in_flight and processed() + len(pending) < max_pages:
+                url = frontier.pop()
+                pending.add(asyncio.ensure_future(_fetch(session, url, limiter, executor, timeout)))
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url, response, error = task.result()
+                if error is None:
+                    try:
+                        found = process(url, response)
+                    except Exception as e:
+                        error = e
+                if error is not None:
+                    if on_error:
+                        on_error(url, error)
+                    continue
+                if found is None:
+                    continue
+                counted += 1
+                frontier.extend(found)
+    return processed()
+
+
+def crawl(session, seeds, process, normalize=None, max_pages=1000, per_host=DEFAULT_PER_HOST,
+          delay=DEFAULT_DELAY, timeout=15, max_in_flight=DEFAULT_MAX_IN_FLIGHT, on_error=None, count=None, priority=None,
+          burst=DEFAULT_BURST, respect_robots=True):
+    """
+    seeds から幅優先でクロールし、処理したページ数を返す。
+
+    process(url, response) はページを処理して次に辿るURLのリストを返す。
+    None を返したページ（200以外・noindex等）は max_pages に数えない。
+    count（引数なしで処理済み件数を返す関数）を渡すと、その値で max_pages を判定する。
+    normalize が与えられた場合、正規化後のURLで重複を判定し、そのURLを取得する。
+    priority（URL→数値、小さいほど先）を渡すと幅優先の代わりに優先度順でクロールする。
+    delay はホスト毎の平均リクエスト間隔、burst は連続で開始できる件数（HostLimiter 参照）。
+    respect_robots=True なら robots.txt の Crawl-delay より速くは送らない。
+    process はイベントループのスレッドで順に呼ばれるため、共有データの更新にロックは不要。
+    """
+    return _run(_crawl(session, seeds, process, normalize, max_pages, per_host, delay, burst, timeout, max_in_flight,
+                       on_error, count, priority, respect_robots))
@@ -0,0 +1,103 @@
+# crawl_frontier.py
+"""
+クロール待ちURLの管理（フロンティア）
+- deque + 既出URLの集合で push / pop / 重複判定をすべて O(1) に
+- priority を渡すと heapq による優先度順（同順位は投入順）
+- 一度でも投入したURLは再投入しない（訪問済み・待機中の両方を兼ねる）
+
+python crawl_frontier.py でリスト実装との比較ベンチマークを実行
+"""
+
+import heapq
+from collections import deque
+from itertools import count
+
+
+class CrawlFrontier:
+    """クロール待ちURLのキュー"""
+
+    def __init__(self, urls=(), key=None, priority=None):
+        self.key = key
+        self.priority = priority
+        self._seen = set()
+        self._queue = [] if priority else deque()
+        self._order = count()
+        self.extend(urls)
+
+    def _key(self, url):
+        return self.key(url) if self.key else url
+
+    def push(self, url):
+        """未出のURLなら投入して True を返す（key 指定時は正規化後のURLを投入）"""
+        url = self._key(url)
+        if not url or url in self._seen:
+            return False
+        self._seen.add(url)
+        if self.priority:
+            heapq.heappush(self._queue, (self.priority(url), next(self._order), url))
+        else:
+            self._queue.append(url)
+        return True
+
+    def extend(self, urls):
+        """複数URLを投入し、新規に追加された件数を返す"""
+        return sum(1 for url in urls if self.push(url))
+
+    def pop(self):
+        """次にクロールするURLを取り出す"""
+        if self.priority:
+            return heapq.heappop(self._queue)[2]
+        return self._queue.popleft()
+
+    def seen(self, url):
+        """投入済み（待機中・取り出し済み）かどうか"""
+        return self._key(url) in self._seen
+
+    def __contains__(self, url):
+        return self.seen(url)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def __bool__(self):
+        return bool(self._queue)
+
+
+def _benchmark():
+    """フロンティア操作の1件あたりのコストを、従来のリスト実装と比較"""
+    import time
+
+    def links_for(i, size):
+        # 1ページあたり20リンク、半分は既出URL
+        return [f"https://example.com/p/{(i * 7919 + j * 104729) % (size * 2)}" for j in range(20)]
+
+    def run_list(size):
+        to_visit, visited = [f"https://example.com/p/{i}" for i in range(size)], set()
+        start, ops = time.perf_counter(), 0
+        for i in range(200):
+            url = to_visit.pop(0)
+            visited.add(url)
+            for link in links_for(i, size):
+                if link not in visited and link not in to_visit:
+                    to_visit.append(link)
+                ops += 1
+        return (time.perf_counter() - start) / ops
+
+    def run_frontier(size):
+        frontier = CrawlFrontier(f"https://example.com/p/{i}" for i in range(size))
+        start, ops = time.perf_counter(), 0
+        for i in range(200):
+            frontier.pop()
+            for link in links_for(i, size):
+                frontier.push(link)
+                ops += 1
+        return (time.perf_counter() - start) / ops
+
+    print(f"{'frontier size':>14} {'list (us/op)':>14} {'CrawlFrontier (us/op)':>22}")
+    for size in [1_000, 10_000, 30_000, 100_000, 300_000]:
+        list_cost = f"{run_list(size) * 1e6:.2f}" if size <= 30_000 else "-"
+        print(f"{size:>14,} {list_cost:>14} {run_frontier(size) * 1e6:>22.3f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,108 @@
+# crawl_store.py
+"""
+サイトマップ lastmod による差分クロール用の前回結果ストア
+- サイト毎に前回のページ・詳細リンク・lastmod・取得済みURLを JSON で保存
+- plan() で lastmod が進んだURLと未取得のURLだけをシードに絞り込む
+- merge() で今回取得しなかったページとそのリンクを前回結果から引き継ぐ
+- ?p=ID をプローブするクローラーは、見つかった最大の記事IDを max_post_id に保存し、次回は新しいIDだけをプローブする
+"""
+
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+# 保存先（環境変数 CRAWL_STORE_DIR で変更）
+DEFAULT_STORE_DIR = os.environ.get(
+    'CRAWL_STORE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'link_crawler', 'graphs'))
+
+
+def parse_lastmod(value):
+    """W3C Datetime 形式の lastmod を比較可能な datetime に変換（解釈できなければ None）"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    # 日付のみ・タイムゾーンなしは UTC とみなす
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def sitemap_lastmod(loc):
+    """サイトマップの <loc> 要素と同じ <url> 内にある <lastmod> の文字列"""
+    lastmod = loc.parent.find('lastmod') if loc.parent else None
+    return lastmod.text.strip() if lastmod else None
+
+
+class CrawlStore:
+    """サイト毎の前回クロール結果"""
+
+    def __init__(self, site, store_dir=DEFAULT_STORE_DIR):
+        self.path = os.path.join(store_dir, f"{site}.json")
+        self.pages = {}     # URL → {'title': ...}
+        self.links = []     # {'source_url', 'source_title', 'target_url', 'anchor_text'}
+        self.lastmod = {}   # URL → lastmod 文字列
+        self.fetched = set()  # 応答を得たURL（200以外・除外ページも含む）
+        self.max_post_id = 0  # ?p=ID プローブで見つかった最大の記事ID
+        self._refetched = set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.pages = data.get('pages', {})
+            self.links = data.get('links', [])
+            self.lastmod = data.get('lastmod', {})
+            self.fetched = set(data.get('fetched', []))
+            self.max_post_id = data.get('max_post_id', 0)
+
+    def is_stale(self, url, lastmod):
+        """前回以降に lastmod が進んだか"""
+        new, old = parse_lastmod(lastmod), parse_lastmod(self.lastmod.get(url))
+        return new is not None and (old is None or new > old)
+
+    def plan(self, urls, lastmods):
+        """再取得が必要なURL（未取得・lastmod更新）だけを返す"""
+        return [url for url in urls if url not in self.fetched or self.is_stale(url, lastmods.get(url))]
+
+    def seen(self, url):
+        """前回までに取得したことがあるか"""
+        return url in self.fetched
+
+    def unseen(self, urls):
+        """ページ内で見つかったURLのうち、まだ取得したことのないもの"""
+        return [url for url in urls if not self.seen(url)]
+
+    def mark_fetched(self, url):
+        """応答を得たURLを記録（通信エラーのURLは記録せず次回も取得対象にする）"""
+        self.fetched.add(url)
+        self._refetched.add(url)
+
+    def merge(self, pages, detailed_links, lastmods):
+        """
+        今回取得しなかったページとそのリンクを pages / detailed_links に追加し、
+        追加したリンクのリストを返す。あわせてストアを今回の結果に更新する。
+        """
+        # 今回応答を得たページは、200以外・除外になっていても前回結果を引き継がない
+        refetched = self._refetched | set(pages)
+        carried = [link for link in self.links if link['source_url'] not in refetched]
+        for url, info in self.pages.items():
+            if url not in refetched:
+                pages[url] = {'title': info['title'], 'outbound_links': []}
+        detailed_links.extend(carried)
+
+        self.pages = {url: {'title': info['title']} for url, info in pages.items()}
+        self.links = list(detailed_links)
+        # 再取得できなかったURLは lastmod を据え置き、次回も再取得対象にする
+        for url, lastmod in lastmods.items():
+            if url in refetched or not self.is_stale(url, lastmod):
+                self.lastmod[url] = lastmod
+        return carried
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {'pages': self.pages, 'links': self.links, 'lastmod': self.lastmod, 'fetched': sorted(self.fetched),
+                'max_post_id': self.max_post_id}
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
@@ -0,0 +1,267 @@
+# csv_ingest.py
+"""
+内部リンクCSVの読み込み
+- pyarrow がインストールされていれば pyarrow エンジン（マルチスレッド）で全列を string[pyarrow] として読む
+- 同じ値が繰り返し現れるURL・タイトル・アンカー列はカテゴリ型に変換してメモリを削減
+- 「リンク元あり」などの判定マスクは link_masks で一度だけ計算し、各タブで使い回す
+- メモリに載らない大容量CSVは iter_link_chunks で分割して読み、LinkStats に集計を加算（分割読み込みモード）。
+  保持するのはユニークページ・URL・アンカー毎の値だけで、行数には比例しない
+- クローラーが書き出した Parquet / Feather（Arrow IPC）は read_links / iter_link_chunks で拡張子から判別して読む。
+  辞書エンコード列はそのままカテゴリ型になり、Feather はパスならメモリマップ、bytes ならバッファをコピーせずに参照
+
+python csv_ingest.py で従来の読み込み（object 列）・分割読み込みとの処理時間・メモリの比較を実行
+"""
+
+import os
+from collections import Counter
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+# PyArrow（オプション）
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+CHUNK_ROWS = 200_000  # 分割読み込みの1チャンクの行数
+TABLE_FORMATS = {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}  # 拡張子→列指向の形式
+
+# 同じ値が繰り返し現れる列（カテゴリ型で保持）
+CATEGORY_COLUMNS = [
+    'B_ページタイトル', 'C_URL',
+    'D_被リンク元ページタイトル', 'E_被リンク元ページURL', 'F_被リンク元ページアンカーテキスト'
+]
+
+
+def read_link_csv(data):
+    """CSV（bytes）を全列文字列・欠損なしの DataFrame として読み込む"""
+    if HAS_PYARROW:
+        df = pd.read_csv(BytesIO(data), engine="pyarrow", dtype="string[pyarrow]")
+    else:
+        df = pd.read_csv(BytesIO(data), encoding="utf-8-sig", dtype=str)
+    return df.fillna("")
+
+
+def link_file_format(filename):
+    """ファイル名の拡張子から形式（'csv' / 'parquet' / 'feather'）を判別"""
+    return TABLE_FORMATS.get(os.path.splitext(str(filename).lower())[1], 'csv')
+
+
+def _arrow_source(source):
+    """パスはメモリマップ、bytes・BytesIO はバッファとして、いずれもコピーせずに pyarrow へ渡す"""
+    if not HAS_PYARROW:
+        raise ImportError("Parquet/Feather の読み込みには pyarrow が必要です（pip install pyarrow）")
+    if isinstance(source, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(source))
+    if isinstance(source, BytesIO):
+        source = source.getbuffer()
+    return pa.BufferReader(pa.py_buffer(source))
+
+
+def _table_frame(table, categorical=True):
+    """
+    pyarrow の表を欠損なしの DataFrame に変換（文字列の欠損は ""、番号などの数値列はそのまま）。
+    辞書エンコード列は categorical=True ならカテゴリ型、False なら文字列（チャンク毎に辞書が異なるため）。
+    """
+    df = table.to_pandas()
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            if not categorical:
+                df[col] = series.astype(object).fillna("")
+            elif series.isna().any():
+                if "" not in series.cat.categories:
+                    series = series.cat.add_categories("")
+                df[col] = series.fillna("")
+        elif not pd.api.types.is_numeric_dtype(series):
+            df[col] = series.astype("string[pyarrow]").fillna("")
+    return df
+
+
+def read_link_table(source, file_format):
+    """Parquet / Feather（パス・bytes・BytesIO）を DataFrame として読み込む（辞書エンコード列はカテゴリ型）"""
+    if file_format == 'parquet':
+        table = pq.read_table(_arrow_source(source))
+    else:
+        table = pa.ipc.open_file(_arrow_source(source)).read_all()
+    return _table_frame(table)
+
+
+def read_links(data, filename):
+    """CSV / Parquet / Feather（bytes）を拡張子で判別して読み込む"""
+    file_format = link_file_format(filename)
+    return read_link_csv(data) if file_format == 'csv' else read_link_table(data, file_format)
+
+
+def compact_columns(df, columns=CATEGORY_COLUMNS):
+    """繰り返しの多い文字列列をカテゴリ型に変換（df を直接変更）"""
+    for col in columns:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def link_masks(df):
+    """行の種類の判定マスク（各タブで使い回す）"""
+    has_title = df['D_被リンク元ページタイトル'] != ""
+    has_source_url = df['E_被リンク元ページURL'] != ""
+    has_page = df['C_URL'] != ""
+    return {
+        'has_page': has_page,                       # リンク先URLあり
+        'has_source': has_title & has_source_url,   # リンク元タイトル・URLあり
+        'has_link': has_source_url & has_page,      # リンク元URL・リンク先URLあり
+        'has_anchor': df['F_被リンク元ページアンカーテキスト'] != "",
+    }
+
+
+def anchor_counter(anchors):
+    """アンカーテキスト→出現数（Counter、初出順）"""
+    codes, uniques = pd.factorize(anchors)
+    return Counter(dict(zip(uniques, np.bincount(codes[codes >= 0], minlength=len(uniques)).tolist())))
+
+
+def iter_link_chunks(source, chunksize=CHUNK_ROWS, file_format='csv'):
+    """CSV / Parquet / Feather（パスまたはファイルオブジェクト）を chunksize 行ずつ、欠損なしの DataFrame で返す"""
+    if file_format == 'parquet':
+        for batch in pq.ParquetFile(_arrow_source(source)).iter_batches(batch_size=chunksize):
+            yield _table_frame(pa.Table.from_batches([batch]), categorical=False)
+        return
+    if file_format == 'feather':
+        reader = pa.ipc.open_file(_arrow_source(source))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for offset in range(0, batch.num_rows, chunksize):
+                yield _table_frame(pa.Table.from_batches([batch.slice(offset, chunksize)]), categorical=False)
+        return
+    # pyarrow エンジンは chunksize に対応していないため C エンジンで読む
+    with pd.read_csv(source, encoding="utf-8-sig", dtype=str, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield chunk.fillna("")
+
+
+class LinkStats:
+    """
+    列名マッピング・URL正規化済みのチャンクを add で加算し、全体を一度に読んだ場合と同じ集計を得る。
+    被リンク数は LinkGraph.from_frame と同じく、リンク元タイトル・URL・リンク先URLが揃った行を数える。
+    """
+
+    def __init__(self, columns=()):
+        self.row_count = 0
+        self.source_count = 0         # リンク元タイトル・URLありの行数
+        self.link_count = 0           # リンク元URL・リンク先URLありの行数
+        self.pages = {}               # (タイトル, URL) → None（初出順）
+        self.inbound = Counter()      # URL → 被リンク数
+        self.anchor_counts = Counter()
+        self.columns = list(columns)  # 空かどうかを調べる列
+        self.filled = set()           # 空でない値が現れた列
+
+    def add(self, df):
+        masks = link_masks(df)
+        self.row_count += len(df)
+        self.source_count += int(masks['has_source'].sum())
+        self.link_count += int(masks['has_link'].sum())
+        pairs = df[['B_ページタイトル', 'C_URL']].drop_duplicates()
+        self.pages.update(dict.fromkeys(zip(pairs['B_ページタイトル'], pairs['C_URL'])))
+        self.inbound.update(df.loc[masks['has_source'] & masks['has_page'], 'C_URL'].value_counts().to_dict())
+        self.anchor_counts.update(anchor_counter(df.loc[masks['has_anchor'], 'F_被リンク元ページアンカーテキスト']))
+        self.filled.update(col for col in self.columns if col not in self.filled and not df[col].str.strip().eq("").all())
+
+    def missing_columns(self):
+        """最後まで空だった列"""
+        return [col for col in self.columns if col not in self.filled]
+
+    def inbound_counts(self):
+        """URL→被リンク数（被リンクのあるページのみ）"""
+        return pd.Series(self.inbound, dtype='int64')
+
+    def pages_frame(self):
+        """ユニークページの DataFrame（被リンク数の多い順）"""
+        pages_df = pd.DataFrame(list(self.pages), columns=['B_ページタイトル', 'C_URL'], dtype=object)
+        pages_df['被リンク数'] = pages_df['C_URL'].map(self.inbound).fillna(0).astype(int)
+        return pages_df.sort_values(['被リンク数', 'B_ページタイトル'], ascending=[False, True])
+
+
+def _benchmark(rows=2_000_000):
+    """エクスポート相当の合成CSVで、従来の読み込み（object 列）と読み込み時間・メモリを比較し、分割読み込みの集計結果を確認"""
+    import time
+    import tracemalloc
+
+    from link_graph import LinkGraph
+
+    rng = np.random.default_rng(0)
+    n_pages = rows // 20
+    target, source = rng.integers(0, n_pages, rows), rng.integers(0, n_pages, rows)
+    urls = np.array([f"https://example.com/category/article-{i}/" for i in range(n_pages)], dtype=object)
+    titles = np.array([f"記事タイトル {i} | サンプルサイト" for i in range(n_pages)], dtype=object)
+    anchors = np.array([f"関連記事 {i % 5000}" for i in range(n_pages)], dtype=object)
+    no_source = rng.random(rows) < 0.05  # リンク元の無い行
+    buffer = BytesIO()
+    pd.DataFrame({
+        'A_番号': target + 1, 'B_ページタイトル': titles[target], 'C_URL': urls[target],
+        'D_被リンク元ページタイトル': np.where(no_source, "", titles[source]),
+        'E_被リンク元ページURL': np.where(no_source, "", urls[source]),
+        'F_被リンク元ページアンカーテキスト': np.where(no_source, "", anchors[source]),
+    }).to_csv(buffer, index=False, encoding='utf-8-sig')
+    data = buffer.getvalue()
+    print(f"{rows:,}行 / {len(data) / 2**20:.0f} MiB, pyarrow: {'あり' if HAS_PYARROW else 'なし'}")
+
+    def legacy(data):
+        # pandas 2 系の既定（文字列は object 列）を再現
+        return pd.read_csv(BytesIO(data), encoding="utf-8-sig", dtype=object).fillna("")
+
+    def current(data):
+        return compact_columns(read_link_csv(data))
+
+    for name, load in (('従来 (object)', legacy), ('pyarrow+category', current)):
+        start = time.perf_counter()
+        df = load(data)
+        elapsed = time.perf_counter() - start
+        memory = df.memory_usage(deep=True).sum() / 2**20
+        start = time.perf_counter()
+        if name.startswith('従来'):
+            has_source = (df['D_被リンク元ページタイトル'].astype(str) != "") & (df['E_被リンク元ページURL'].astype(str) != "")
+        else:
+            has_source = link_masks(df)['has_source']
+        mask_ms = (time.perf_counter() - start) * 1000
+        print(f"{name:>18}: 読み込み {elapsed:6.2f} s  メモリ {memory:8.1f} MiB  リンク元判定 {mask_ms:7.1f} ms ({int(has_source.sum()):,})")
+        del df
+
+    # 分割読み込み：全体を読み込んで集計した場合とのピークメモリ・結果の比較
+    def full_stats(data):
+        df = legacy(data)
+        graph = LinkGraph.from_frame(df)
+        inbound = pd.Series(graph.in_degree(), index=graph.urls.values)
+        pages_df = df[['B_ページタイトル', 'C_URL']].drop_duplicates()
+        pages_df['被リンク数'] = pages_df['C_URL'].map(inbound).fillna(0).astype(int)
+        pages_df = pages_df.sort_values(['被リンク数', 'B_ページタイトル'], ascending=[False, True])
+        anchor_counts = Counter(df.loc[df['F_被リンク元ページアンカーテキスト'] != "", 'F_被リンク元ページアンカーテキスト'])
+        return pages_df.reset_index(drop=True), anchor_counts
+
+    def chunked_stats(data):
+        stats = LinkStats()
+        for chunk in iter_link_chunks(BytesIO(data)):
+            stats.add(chunk)
+        return stats.pages_frame().reset_index(drop=True), stats.anchor_counts
+
+    results = []
+    for name, analyze in (('全体読み込み', full_stats), ('分割読み込み', chunked_stats)):
+        start = time.perf_counter()
+        results.append(analyze(data))
+        elapsed = time.perf_counter() - start
+        # tracemalloc は処理を遅くするため、ピークメモリは別に計測
+        tracemalloc.start()
+        analyze(data)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        print(f"{name:>18}: 集計 {elapsed:6.2f} s  ピークメモリ {peak:8.1f} MiB")
+    (expected_pages, expected_anchors), (pages, anchors) = results
+    same = expected_pages.equals(pages) and list(expected_anchors.items()) == list(anchors.items())
+    print(f"集計結果の一致（ページ・被リンク数・アンカー）: {'OK' if same else 'NG'}")
+
+
+if __name__ == "__main__":
+    _benchmark()
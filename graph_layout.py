@@ -0,0 +1,122 @@
+# graph_layout.py
+"""
+ネットワーク図用の力学モデル配置（Fruchterman–Reingold）
+- ノード間の斥力はグリッド近似：ノードを格子セルに分け、他セルからの斥力はセル重心（質量=ノード数）同士で、
+  自セル内の斥力は自身を除いた重心から計算。1反復 O(セル数² + ノード数)。
+  格子の一辺は MAX_GRID_SIDE で頭打ちにし、ノード数が増えてもセル間の配列は一定の大きさ（数十MB）に収める
+- 引力はリンク配列上で np.bincount により集計
+- 乱数シード固定で同じ入力なら同じ配置になる（キャッシュ向き）
+
+python graph_layout.py で厳密な全ノード対計算との処理時間・配置品質の比較を実行
+"""
+
+import numpy as np
+
+DEFAULT_ITERATIONS = 100
+CELL_NODES = 16  # 1セルあたりの平均ノード数の目安
+MAX_GRID_SIDE = 32  # 格子の一辺の上限（セル数 ≤ 1024、セル間の配列は 1024² 要素まで）
+
+
+def _repulsion_exact(pos, k):
+    """全ノード対の斥力（比較用）"""
+    delta = pos[:, None, :] - pos[None, :, :]
+    dist2 = np.maximum((delta ** 2).sum(axis=2), 1e-9)
+    np.fill_diagonal(dist2, np.inf)
+    return (delta * (k * k / dist2)[:, :, None]).sum(axis=1)
+
+
+def _repulsion_grid(pos, k):
+    """セル重心による斥力の近似（他セルからはセル重心同士、自セルからは自身を除いた重心で計算）"""
+    n = len(pos)
+    side = min(MAX_GRID_SIDE, max(1, int(np.sqrt(n / CELL_NODES))))
+    low, high = pos.min(axis=0), pos.max(axis=0)
+    cell_xy = np.minimum(((pos - low) / np.maximum(high - low, 1e-9) * side).astype(np.int64), side - 1)
+    occupied, cell = np.unique(cell_xy[:, 0] * side + cell_xy[:, 1], return_inverse=True)
+    mass = np.bincount(cell).astype(np.float64)
+    centroid = np.stack([np.bincount(cell, weights=pos[:, d]) for d in (0, 1)], axis=1) / mass[:, None]
+
+    # 他セルからの斥力（同じセルのノードは共通）
+    delta = centroid[:, None, :] - centroid[None, :, :]
+    dist2 = np.maximum((delta ** 2).sum(axis=2), 1e-9)
+    np.fill_diagonal(dist2, np.inf)
+    force = (delta * (k * k * mass / dist2)[:, :, None]).sum(axis=1)[cell]
+
+    # 自セル内の他ノードからの斥力
+    others = mass[cell] - 1
+    has_others = others > 0
+    own_centroid = (centroid[cell] * mass[cell][:, None] - pos)[has_others] / others[has_others][:, None]
+    own_delta = pos[has_others] - own_centroid
+    own_dist2 = np.maximum((own_delta ** 2).sum(axis=1), 1e-9)
+    force[has_others] += own_delta * (k * k * others[has_others] / own_dist2)[:, None]
+    return force
+
+
+def force_layout(src, dst, n, iterations=DEFAULT_ITERATIONS, seed=0, exact=False):
+    """
+    ノード数 n、リンク (src[i] → dst[i]) のグラフを単位正方形付近に配置し、(n, 2) の座標配列を返す。
+    リンクの向きは考慮しない。exact=True で斥力を全ノード対で厳密に計算。
+    """
+    if n == 0:
+        return np.zeros((0, 2))
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2))
+    if n == 1:
+        return pos
+    src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+    link = src != dst
+    src, dst = src[link], dst[link]
+    k = np.sqrt(1.0 / n)
+    repulsion = _repulsion_exact if exact else _repulsion_grid
+    temperature = 0.1
+
+    for _ in range(iterations):
+        disp = repulsion(pos, k)
+        delta = pos[src] - pos[dst]
+        dist = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-9)
+        pull = delta * (dist / k)[:, None]
+        for d in (0, 1):
+            disp[:, d] += np.bincount(dst, weights=pull[:, d], minlength=n) - np.bincount(src, weights=pull[:, d], minlength=n)
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-9)
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= 0.1 / iterations
+    return pos
+
+
+def _benchmark(nodes=3000, links=9000, large_nodes=100_000):
+    """ハブ型の合成グラフで、グリッド近似と厳密計算の処理時間・リンク長の比較と、大規模グラフのピークメモリ"""
+    import time
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    hubs = max(1, nodes // 50)
+    src = rng.integers(0, nodes, links)
+    dst = np.where(rng.random(links) < 0.7, rng.integers(0, hubs, links), rng.integers(0, nodes, links))
+
+    def quality(pos):
+        # 平均リンク長 / 平均ノード間距離（小さいほどリンクで結ばれたノードが近くに集まっている）
+        sample = rng.integers(0, nodes, (5000, 2))
+        link_len = np.linalg.norm(pos[src] - pos[dst], axis=1).mean()
+        pair_len = np.linalg.norm(pos[sample[:, 0]] - pos[sample[:, 1]], axis=1).mean()
+        return link_len / pair_len
+
+    print(f"{nodes:,}ノード / {links:,}リンク, {DEFAULT_ITERATIONS}反復")
+    print(f"{'ランダム配置':>12}: {'':>10} リンク長比 {quality(np.random.default_rng(0).random((nodes, 2))):.3f}")
+    for name, exact in (('グリッド近似', False), ('厳密計算', True)):
+        start = time.perf_counter()
+        pos = force_layout(src, dst, nodes, exact=exact)
+        print(f"{name:>12}: {time.perf_counter() - start:8.2f} s リンク長比 {quality(pos):.3f}")
+
+    # 大規模グラフ：格子の一辺の上限によりピークメモリはノード・リンク数に比例
+    src = rng.integers(0, large_nodes, large_nodes * 3)
+    dst = rng.integers(0, large_nodes // 50, large_nodes * 3)
+    tracemalloc.start()
+    start = time.perf_counter()
+    force_layout(src, dst, large_nodes, iterations=10)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    print(f"{large_nodes:,}ノード / {len(src):,}リンク, 10反復: {elapsed:.2f} s ピークメモリ {peak:.0f} MiB")
+
+
+if __name__ == "__main__":
+    _benchmark()
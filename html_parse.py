@@ -0,0 +1,77 @@
+# html_parse.py
+"""
+クローラー共通のHTML解析
+- lxml がインストールされていれば lxml バックエンド、なければ html.parser で BeautifulSoup を構築
+- 返り値は従来と同じ BeautifulSoup なので、各クローラーの select / find_all / decompose はそのまま使える
+
+python html_parse.py で html.parser との解析時間の比較を実行
+（抽出結果が変わらないことは tests/test_html_parse.py で実際のクローラーの抽出処理により確認）
+"""
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+
+def parse_html(markup, parse_only=None):
+    """ページ本文を BeautifulSoup に変換（parse_only に SoupStrainer を渡すと対象タグのみ構築）"""
+    return BeautifulSoup(markup, HTML_PARSER, parse_only=parse_only)
+
+
+def _benchmark():
+    """記事ページ相当のHTMLで、パーサー毎の1ページあたり解析時間を比較"""
+    import re
+    import time
+
+    def sample_page(i):
+        nav = ''.join(f'<li><a href="/category/c{j}/">カテゴリ{j}</a></li>' for j in range(40))
+        body = ''.join(
+            f'<h2>見出し{j}</h2><p>本文テキスト{j}。<a href="/article-{(i + j) % 500}/">関連記事{j}</a>'
+            f'<img src="/wp-content/uploads/{j}.jpg"><br>続きの説明文です。</p>'
+            f'<div class="balloon"><span onclick="window.location.href=\'/go-{j}/\'">詳細{j}</span></div>'
+            for j in range(60))
+        sidebar = ''.join(f'<li><a href="/popular-{j}/">人気記事{j}</a></li>' for j in range(30))
+        return (
+            '<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8">'
+            f'<title>記事{i} | サンプル</title><meta name="robots" content="index,follow">'
+            '<script>var x = "<a href=/dummy>";</script></head><body>'
+            f'<header><nav><ul>{nav}</ul></nav></header><main><article>'
+            f'<h1 class="entry-title">記事{i}</h1><div class="entry-content">{body}'
+            '<div class="share"><a href="https://twitter.com/share">共有</a></div></div>'
+            f'</article><aside class="sidebar"><ul>{sidebar}</ul></aside></main>'
+            '<footer><a href="/privacy/">プライバシー</a></footer></body></html>')
+
+    def extract_links(soup):
+        # 本文リンク抽出の典型的な手順（本文エリア選択→除外要素削除→a/onclick収集）の処理時間用
+        content_area = soup.select_one('.entry-content') or soup.body
+        for exclude in content_area.select('header, footer, nav, aside, .sidebar, .widget, .share'):
+            exclude.decompose()
+        links = [(a['href'], a.get_text(strip=True)) for a in content_area.find_all('a', href=True)]
+        for element in content_area.find_all(attrs={'onclick': True}):
+            match = re.search(r"window\.location\.href\s*=\s*['\"]([^'\"]+)['\"]", element.get('onclick', ''))
+            if match:
+                links.append((match.group(1), element.get_text(strip=True)))
+        return links
+
+    pages = [sample_page(i) for i in range(50)]
+    parsers = ['html.parser'] + (['lxml'] if HTML_PARSER == 'lxml' else [])
+    print(f"{'parser':>12} {'parse (ms/page)':>16} {'parse+extract (ms/page)':>24}")
+    for parser in parsers:
+        start = time.perf_counter()
+        for page in pages:
+            BeautifulSoup(page, parser)
+        parse_ms = (time.perf_counter() - start) / len(pages) * 1000
+
+        start = time.perf_counter()
+        for page in pages:
+            extract_links(BeautifulSoup(page, parser))
+        total_ms = (time.perf_counter() - start) / len(pages) * 1000
+        print(f"{parser:>12} {parse_ms:>16.2f} {total_ms:>24.2f}")
+
+
+if __name__ == "__main__":
+    _benchmark()
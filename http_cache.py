@@ -0,0 +1,159 @@
+# http_cache.py
+"""
+クローラー用のディスクHTTPキャッシュ
+- GET の 200 応答を本文・ヘッダーごと保存（ETag / Last-Modified を持つもののみ）
+- 次回以降は If-None-Match / If-Modified-Since で再検証し、304 なら保存済みの本文を返す
+- requests のトランスポートアダプターとして Session に mount して使う
+- 合計サイズ（CRAWL_CACHE_MAX_MB、既定 1024MB）と保存期間（CRAWL_CACHE_MAX_DAYS、既定 30日）に上限を設け、
+  期限切れのものと、超過時は上限の9割まで最終利用が古いものから削除（起動時と、書き込みで上限を超えたとき）
+"""
+
+import hashlib
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+# 保存先（環境変数 CRAWL_CACHE_DIR で変更、空文字でキャッシュ無効）
+DEFAULT_CACHE_DIR = os.environ.get(
+    'CRAWL_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'link_crawler'))
+DEFAULT_MAX_BYTES = int(float(os.environ.get('CRAWL_CACHE_MAX_MB', 1024)) * 2**20)
+DEFAULT_MAX_AGE = float(os.environ.get('CRAWL_CACHE_MAX_DAYS', 30)) * 86400  # 秒
+
+# キャッシュのファイル名（URL の SHA-1）。同じディレクトリ配下の他のデータ（graphs/ 等）は削除対象にしない
+ENTRY_NAME = re.compile(r'[0-9a-f]{40}')
+# 上限を超えたらこの割合まで削除（書き込みのたびにディレクトリ全体を走査しない）
+PRUNE_TO = 0.9
+
+
+class CachingAdapter(HTTPAdapter):
+    """条件付きリクエストで再検証するディスクキャッシュ付きアダプター"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        os.makedirs(cache_dir, exist_ok=True)
+        self.stats = Counter()  # miss / revalidated / stored / evicted
+        self._lock = threading.Lock()
+        self._size = 0
+        self.prune()
+
+    def prune(self):
+        """期限切れのエントリと、合計サイズの上限を超えた分を最終利用の古い順に削除"""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if ENTRY_NAME.fullmatch(entry.name) and entry.is_file(follow_symlinks=False):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+            expires = time.time() - self.max_age
+            total = sum(size for _, size, _ in entries)
+            limit = self.max_bytes * PRUNE_TO if total > self.max_bytes else self.max_bytes
+            for mtime, size, path in entries:
+                if mtime >= expires and total <= limit:
+                    break
+                try:
+                    os.remove(path)
+                    self.stats['evicted'] += 1
+                except OSError:
+                    pass
+                total -= size
+            self._size = total
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _load(self, url):
+        path = self._path(url)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            with open(path, 'rb') as f:
+                return pickle.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, zlib.error):
+            return None
+
+    def _store(self, url, response):
+        entry = {
+            'headers': dict(response.headers),
+            'encoding': response.encoding,
+            'content': response.content,
+        }
+        # 並列スレッドから書き込まれるため、一時ファイル経由で置き換える
+        blob = zlib.compress(pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL))
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(blob)
+        path = self._path(url)
+        with self._lock:
+            # 上書きするエントリの分を差し引いてから置き換える
+            try:
+                self._size -= os.stat(path).st_size
+            except OSError:
+                pass
+            os.replace(tmp, path)
+            self._size += len(blob)
+            self.stats['stored'] += 1
+            over = self._size > self.max_bytes
+        if over:
+            self.prune()
+
+    def _cached_response(self, request, entry):
+        response = Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = entry['encoding']
+        response._content = entry['content']
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.from_cache = True
+        return response
+
+    def send(self, request, stream=False, **kwargs):
+        if request.method != 'GET' or stream:
+            return super().send(request, stream=stream, **kwargs)
+
+        entry = self._load(request.url)
+        if entry:
+            headers = CaseInsensitiveDict(entry['headers'])
+            if 'ETag' in headers:
+                request.headers['If-None-Match'] = headers['ETag']
+            if 'Last-Modified' in headers:
+                request.headers['If-Modified-Since'] = headers['Last-Modified']
+
+        response = super().send(request, stream=stream, **kwargs)
+        if response.status_code == 304 and entry:
+            response.close()
+            self._count('revalidated')
+            # 最終利用日時として更新（容量超過時は使われていないものから削除）
+            try:
+                os.utime(self._path(request.url))
+            except OSError:
+                pass
+            return self._cached_response(request, entry)
+
+        self._count('miss')
+        cacheable = 'no-store' not in response.headers.get('Cache-Control', '').lower()
+        if response.status_code == 200 and cacheable and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+            self._store(request.url, response)
+        return response
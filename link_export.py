@@ -0,0 +1,132 @@
+# link_export.py
+"""
+クローラーの結果（内部リンク表）の書き出し
+- 既定は従来どおりCSV文字列。output_format='parquet' / 'feather' で列指向ファイルの bytes を返す
+- 文字列列（URL・タイトル・アンカー）は辞書エンコード：同じ文字列は1回だけ保持し、各行は整数インデックス。
+  main.py はCSVの解析・型推論なしで、カテゴリ型の DataFrame として読み込める
+- Feather（Arrow IPC）は非圧縮で書き出すため、main.py はファイルをメモリマップしてコピーせずに読める
+
+python link_export.py でCSVとの受け渡し（書き出し＋読み込み）の処理時間・サイズの比較を実行
+"""
+
+import csv
+from io import StringIO
+
+# PyArrow（オプション、Parquet/Feather の書き出しに使用）
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'feather')
+AVAILABLE_FORMATS = OUTPUT_FORMATS if HAS_PYARROW else ('csv',)  # この環境で書き出せる形式
+FILE_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+
+LINK_COLUMNS = [
+    'A_番号', 'B_ページタイトル', 'C_URL',
+    'D_被リンク元ページタイトル', 'E_被リンク元ページURL', 'F_被リンク元ページアンカーテキスト'
+]
+
+
+class LinkTableWriter:
+    """
+    csv.writer と同じく writerow で1行ずつ受け取り（最初の行は列名）、getvalue で書き出した内容を返す。
+    CSV は str、Parquet/Feather は bytes。csv_options は csv.writer にそのまま渡す（CSVのみ）。
+    """
+
+    def __init__(self, output_format='csv', **csv_options):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"未対応の出力形式です: {output_format}（{' / '.join(OUTPUT_FORMATS)}）")
+        if output_format != 'csv' and not HAS_PYARROW:
+            raise ImportError("Parquet/Feather の書き出しには pyarrow が必要です（pip install pyarrow）")
+        self.output_format = output_format
+        self.header = None
+        self.columns = []
+        if output_format == 'csv':
+            self._output = StringIO()
+            self._writer = csv.writer(self._output, **csv_options)
+
+    def writerow(self, row):
+        if self.output_format == 'csv':
+            self._writer.writerow(row)
+        elif self.header is None:
+            self.header = [str(name) for name in row]
+            self.columns = [[] for _ in row]
+        else:
+            for values, value in zip(self.columns, row):
+                values.append(value)
+
+    def table(self):
+        """列指向の pyarrow.Table（整数だけの列は int64、それ以外は辞書エンコードした文字列）"""
+        arrays = []
+        for values in self.columns:
+            if values and all(type(value) is int for value in values):
+                arrays.append(pa.array(values, pa.int64()))
+            else:
+                arrays.append(pa.array(["" if value is None else str(value) for value in values], pa.string()).dictionary_encode())
+        return pa.table(arrays, names=self.header or [])
+
+    def getvalue(self):
+        if self.output_format == 'csv':
+            return self._output.getvalue()
+        sink = pa.BufferOutputStream()
+        if self.output_format == 'parquet':
+            pq.write_table(self.table(), sink)
+        else:
+            feather.write_feather(self.table(), sink, compression='uncompressed')
+        return sink.getvalue().to_pybytes()
+
+
+def header_only(output_format='csv'):
+    """列名だけの結果（クロールが失敗したとき用）"""
+    writer = LinkTableWriter(output_format, lineterminator='\n')
+    writer.writerow(LINK_COLUMNS)
+    return writer.getvalue()
+
+
+def _benchmark(rows=1_000_000):
+    """クローラーの writerow 相当の行で、CSV と Parquet/Feather の書き出し・main.py での読み込み時間とサイズを比較"""
+    import time
+
+    import numpy as np
+
+    from csv_ingest import compact_columns, link_file_format, read_links
+
+    rng = np.random.default_rng(0)
+    n_pages = rows // 20
+    target, source = rng.integers(0, n_pages, rows), rng.integers(0, n_pages, rows)
+    url = "https://example.com/category/article-{}/".format
+    title = "記事タイトル {} | サンプルサイト".format
+    records = [[int(t) + 1, title(t), url(t), title(s), url(s), f"関連記事 {s % 5000}"] for t, s in zip(target, source)]
+    print(f"{rows:,}行, pyarrow: {'あり' if HAS_PYARROW else 'なし'}")
+
+    frames = {}
+    for output_format in AVAILABLE_FORMATS:
+        start = time.perf_counter()
+        writer = LinkTableWriter(output_format)
+        writer.writerow(LINK_COLUMNS)
+        for record in records:
+            writer.writerow(record)
+        content = writer.getvalue()
+        write_s = time.perf_counter() - start
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        filename = "links" + FILE_EXTENSIONS[output_format]
+        start = time.perf_counter()
+        df = read_links(data, filename)
+        if link_file_format(filename) == 'csv':
+            compact_columns(df)
+        read_s = time.perf_counter() - start
+        frames[output_format] = df
+        print(f"{output_format:>8}: 書き出し {write_s:6.2f} s  読み込み {read_s:6.2f} s  サイズ {len(data) / 2**20:7.1f} MiB")
+
+    expected = frames.pop('csv').astype(str)
+    for output_format, df in frames.items():
+        same = expected.equals(df.astype(str))
+        print(f"{output_format:>8}: CSVと同じ内容 {'OK' if same else 'NG'}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,280 @@
+# link_graph.py
+"""
+整数IDによるコンパクトな内部リンクグラフ
+- URL・タイトル/アンカー文字列を StringTable で整数IDに置き換え、同じ文字列はリンク毎に複製しない
+- リンクは (リンク元ID, リンク先ID, アンカーID) を int32 配列で保持し、csr() で NumPy の CSR 形式に変換
+- 被リンク数・発リンク数は np.bincount だけで計算、PageRank もリンク配列上のべき乗法で計算
+- クローラーは add_page / add_link で逐次構築、main.py は from_frame で分析用CSVから構築
+"""
+
+from array import array
+
+import numpy as np
+import pandas as pd
+
+
+class StringTable:
+    """文字列⇔整数ID の対応表（IDは登録順の連番）"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.ids = {value: i for i, value in enumerate(self.values)}
+
+    def intern(self, value):
+        """IDを返す（未登録なら登録）"""
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+    def get(self, value, default=None):
+        return self.ids.get(value, default)
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def __contains__(self, value):
+        return value in self.ids
+
+    def __len__(self):
+        return len(self.values)
+
+
+class LinkGraph:
+    """ページ（URL ID）とリンク（ID配列）からなる有向グラフ"""
+
+    def __init__(self, dedupe=True):
+        self.urls = StringTable()
+        self.texts = StringTable()   # ページタイトルとアンカーテキスト
+        self.titles = array('i')     # URL ID → タイトルのテキストID（未設定は -1）
+        self._src = array('i')
+        self._dst = array('i')
+        self._anchor = array('i')
+        self._pairs = set() if dedupe else None  # (リンク元ID << 32 | リンク先ID)
+
+    def add_page(self, url, title=None):
+        """ページを登録してURL IDを返す（title を渡すとタイトルを更新）"""
+        i = self.urls.intern(url)
+        if i == len(self.titles):
+            self.titles.append(-1)
+        if title is not None:
+            self.titles[i] = self.texts.intern(title)
+        return i
+
+    def add_link(self, source, target, anchor_text='', source_title=None):
+        """新規リンクなら登録して True、既出なら False を返す"""
+        s, t = self.add_page(source), self.add_page(target)
+        if source_title is not None and self.titles[s] < 0:
+            self.titles[s] = self.texts.intern(source_title)
+        if self._pairs is not None:
+            key = s << 32 | t
+            if key in self._pairs:
+                return False
+            self._pairs.add(key)
+        self._src.append(s)
+        self._dst.append(t)
+        self._anchor.append(self.texts.intern(anchor_text))
+        return True
+
+    def title(self, url_id):
+        """URL ID のタイトル（未設定ならURL）"""
+        text_id = self.titles[url_id]
+        return self.texts[text_id] if text_id >= 0 else self.urls[url_id]
+
+    @property
+    def num_pages(self):
+        return len(self.urls)
+
+    def __len__(self):
+        return len(self._src)
+
+    def edges(self):
+        """(リンク元ID, リンク先ID, アンカーID) の int32 配列"""
+        # frombuffer のビューは一時的に使うだけにし、以降の append を妨げない
+        return tuple(np.frombuffer(a, dtype=np.intc).astype(np.int32) for a in (self._src, self._dst, self._anchor))
+
+    def csr(self):
+        """リンク元毎の CSR 形式 (indptr, リンク先ID, アンカーID)。リンク元 i のリンクは indptr[i]:indptr[i+1]"""
+        src, dst, anchor = self.edges()
+        order = np.argsort(src, kind='stable')
+        indptr = np.zeros(self.num_pages + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=self.num_pages), out=indptr[1:])
+        return indptr, dst[order], anchor[order]
+
+    def in_degree(self):
+        """URL ID 毎の被リンク数"""
+        return np.bincount(self.edges()[1], minlength=self.num_pages)
+
+    def out_degree(self):
+        """URL ID 毎の発リンク数"""
+        return np.bincount(self.edges()[0], minlength=self.num_pages)
+
+    def pagerank(self, damping=0.85, tol=1e-6, max_iter=100):
+        """
+        URL ID 毎の PageRank（べき乗法、合計1）。
+        各反復はリンク配列上の疎行列×ベクトル積（np.bincount）で、発リンクの無いページの値は全ページに均等配分。
+        """
+        n = self.num_pages
+        if n == 0:
+            return np.zeros(0)
+        src, dst, _ = self.edges()
+        out_degree = np.bincount(src, minlength=n)
+        dangling = out_degree == 0
+        weight = 1.0 / out_degree[src]
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            new = np.bincount(dst, weights=rank[src] * weight, minlength=n)
+            new = damping * (new + rank[dangling].sum() / n) + (1.0 - damping) / n
+            delta = np.abs(new - rank).sum()
+            rank = new
+            if delta < tol:
+                break
+        return rank
+
+    def click_depth(self, root):
+        """
+        URL ID root からのクリック数（幅優先探索、到達できないページは -1）。
+        各段ではフロンティアの CSR 区間をまとめて展開するため、全体でリンク数に比例した処理量。
+        """
+        indptr, indices, _ = self.csr()
+        depth = np.full(self.num_pages, -1, dtype=np.int32)
+        depth[root] = 0
+        frontier = np.array([root], dtype=np.int64)
+        level = 0
+        while len(frontier):
+            level += 1
+            starts, counts = indptr[frontier], indptr[frontier + 1] - indptr[frontier]
+            total = int(counts.sum())
+            if not total:
+                break
+            # フロンティア k のリンクは indices[starts[k]:starts[k] + counts[k]]
+            offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+            neighbors = indices[offsets]
+            frontier = np.unique(neighbors[depth[neighbors] < 0])
+            depth[frontier] = level
+        return depth
+
+    def inbound_counts(self):
+        """{URL: 被リンク数} の辞書（被リンクのあるページのみ）"""
+        degree = self.in_degree()
+        return {self.urls[i]: int(degree[i]) for i in np.flatnonzero(degree)}
+
+    def _link(self, source, target, anchor):
+        return {
+            'source_url': self.urls[source], 'source_title': self.title(source),
+            'target_url': self.urls[target], 'anchor_text': self.texts[anchor]
+        }
+
+    def links(self):
+        """登録順に {'source_url', 'source_title', 'target_url', 'anchor_text'} を返す"""
+        for s, t, a in zip(self._src, self._dst, self._anchor):
+            yield self._link(s, t, a)
+
+    def links_by_target(self):
+        """
+        リンク先毎に (リンク先URL, リンクのリスト) を被リンク数の多い順に返す。
+        同数なら初出順、リンクは登録順（クローラーのCSV出力順）。
+        """
+        src, dst, anchor = self.edges()
+        if not len(dst):
+            return
+        order = np.argsort(dst, kind='stable')
+        targets, first, counts = np.unique(dst, return_index=True, return_counts=True)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        for g in np.lexsort((first, -counts)):
+            rows = order[starts[g]:starts[g] + counts[g]]
+            yield self.urls[targets[g]], [self._link(src[i], dst[i], anchor[i]) for i in rows]
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        分析用CSVの DataFrame（A_〜F_ 列）から構築。
+        リンク元タイトル・URL・リンク先URLが揃った行を1リンクとし、重複行もそのまま数える。
+        各列は欠損なしの文字列（カテゴリ型も可）であること。
+        """
+        target_url, source_url = df['C_URL'], df['E_被リンク元ページURL']
+        source_title = df['D_被リンク元ページタイトル']
+        has_page = (target_url != "").to_numpy()
+        has_link = ((source_title != "") & (source_url != "")).to_numpy() & has_page
+        n_pages, n_links = int(has_page.sum()), int(has_link.sum())
+
+        url_codes, url_values = pd.factorize(pd.concat([target_url[has_page], source_url[has_link]], ignore_index=True))
+        text_codes, text_values = pd.factorize(pd.concat([
+            df['B_ページタイトル'][has_page], source_title[has_link],
+            df['F_被リンク元ページアンカーテキスト'][has_link]], ignore_index=True))
+
+        graph = cls(dedupe=False)
+        graph.urls = StringTable(url_values)
+        graph.texts = StringTable(text_values)
+        page_ids, source_ids = url_codes[:n_pages], url_codes[n_pages:]
+        titles = np.full(len(url_values), -1, dtype=np.intc)
+        titles[source_ids] = text_codes[n_pages:n_pages + n_links]
+        titles[page_ids] = text_codes[:n_pages]  # リンク先としてのタイトルを優先
+        graph.titles = array('i', titles.tobytes())
+        graph._src = array('i', source_ids.astype(np.intc).tobytes())
+        graph._dst = array('i', page_ids[has_link[has_page]].astype(np.intc).tobytes())
+        graph._anchor = array('i', text_codes[n_pages + n_links:].astype(np.intc).tobytes())
+        return graph
+
+
+def _benchmark(pages=20_000, links_per_page=50):
+    """クローラーの detailed_links（dictのリスト）と LinkGraph の保持メモリ・被リンク数計算時間を比較し、PageRank の計算時間を計測"""
+    import time
+    import tracemalloc
+
+    rng = np.random.default_rng(0)
+    url = "https://example.com/category/article-{}/".format
+    targets = rng.integers(0, pages, (pages, links_per_page))
+
+    def build_dicts():
+        detailed_links = []
+        for s in range(pages):
+            source = url(s)
+            for t in targets[s]:
+                detailed_links.append({
+                    'source_url': source, 'source_title': f"記事タイトル {s} | サンプルサイト",
+                    'target_url': url(t), 'anchor_text': f"関連記事 {t}"
+                })
+        return detailed_links
+
+    def build_graph():
+        graph = LinkGraph(dedupe=False)
+        for s in range(pages):
+            source = url(s)
+            graph.add_page(source, f"記事タイトル {s} | サンプルサイト")
+            for t in targets[s]:
+                graph.add_link(source, url(t), f"関連記事 {t}")
+        return graph
+
+    for name, build in (('detailed_links', build_dicts), ('LinkGraph', build_graph)):
+        tracemalloc.start()
+        data = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        start = time.perf_counter()
+        if name == 'LinkGraph':
+            degree = data.in_degree()
+        else:
+            counts = {}
+            for link in data:
+                counts[link['target_url']] = counts.get(link['target_url'], 0) + 1
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{name:>15}: {size / 2**20:8.1f} MiB  被リンク数計算 {elapsed:8.1f} ms")
+        del data
+    print(f"{pages * links_per_page:,}リンク（被リンク数の最大 {degree.max()}）")
+
+    # PageRank: 10万ページ / 200万リンク（リンク先は被リンクの偏りを再現するため Zipf 分布）
+    n, m = 100_000, 2_000_000
+    graph = LinkGraph(dedupe=False)
+    graph.urls = StringTable(url(i) for i in range(n))
+    graph._src = array('i', rng.integers(0, n, m).astype(np.intc).tobytes())
+    graph._dst = array('i', (rng.zipf(1.5, m) % n).astype(np.intc).tobytes())
+    graph._anchor = array('i', bytes(4 * m))
+    start = time.perf_counter()
+    rank = graph.pagerank()
+    print(f"PageRank {n:,}ページ / {m:,}リンク: {(time.perf_counter() - start) * 1000:.0f} ms（合計 {rank.sum():.6f}）")
+
+
+if __name__ == "__main__":
+    _benchmark()
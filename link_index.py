@@ -0,0 +1,49 @@
+# link_index.py
+"""
+内部リンクの入出力インデックス
+- リンク発見時に add() するだけで、被リンク元・リンク先の集合を逐次更新
+- (リンク元, リンク先) の重複判定と被リンク数の集計を O(1) で提供
+- クロール後の被リンク数計算を O(ページ数 × リンク数) から O(リンク数) に
+"""
+
+from collections import defaultdict
+
+
+class LinkIndex:
+    """リンク先→リンク元集合 / リンク元→リンク先集合 の索引"""
+
+    def __init__(self, links=()):
+        self.inbound = defaultdict(set)
+        self.outbound = defaultdict(set)
+        self._count = 0
+        for source, target in links:
+            self.add(source, target)
+
+    def add(self, source, target):
+        """新規リンクなら登録して True、既出なら False を返す"""
+        targets = self.outbound[source]
+        if target in targets:
+            return False
+        targets.add(target)
+        self.inbound[target].add(source)
+        self._count += 1
+        return True
+
+    def inbound_count(self, url):
+        """被リンク数（ユニークなリンク元ページ数）"""
+        return len(self.inbound.get(url, ()))
+
+    def outbound_count(self, url):
+        """発リンク数（ユニークなリンク先ページ数）"""
+        return len(self.outbound.get(url, ()))
+
+    def inbound_counts(self):
+        """{URL: 被リンク数} の辞書"""
+        return {url: len(sources) for url, sources in self.inbound.items()}
+
+    def __contains__(self, link):
+        source, target = link
+        return target in self.outbound.get(source, ())
+
+    def __len__(self):
+        return self._count
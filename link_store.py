@@ -0,0 +1,329 @@
+# link_store.py
+"""
+内部リンク分析用の組み込みデータベース（サーバー不要）
+- duckdb がインストールされていれば DuckDB（列指向・並列集計）、なければ標準ライブラリの SQLite を使用
+- CSV（クローラーの出力を含む）は append でチャンク毎に一度だけ読み込み、finalize でインデックスを作成
+- URL・アンカーテキストは整数IDに置き換え、links テーブルは (リンク元ID, リンク先ID, アンカーID, リンク元タイトル有無) のみ保持
+- ピラーページ・アンカー・孤立記事・ネットワーク図の集計は SQL で実行し、PageRank 等は graph() の LinkGraph で計算
+- データベースはファイルに保存されるため、アプリを再起動しても CSV を読み直さずにクエリだけで集計できる
+
+python link_store.py で pandas の集計との処理時間・結果の比較を実行
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from link_graph import LinkGraph, StringTable
+from url_normalize import same_site
+
+# DuckDB（オプション）
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+BACKEND = 'duckdb' if HAS_DUCKDB else 'sqlite'
+
+# 保存先（環境変数 LINK_STORE_DIR で変更）
+DEFAULT_STORE_DIR = os.environ.get(
+    'LINK_STORE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'link_crawler', 'analysis'))
+
+# ID列の -1 は空文字（リンク元・リンク先・アンカーなし）
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS links (source_id INTEGER, target_id INTEGER, anchor_id INTEGER, has_title BOOLEAN)",
+    "CREATE TABLE IF NOT EXISTS urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT, in_site BOOLEAN)",
+    "CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY, title TEXT, url TEXT, url_id INTEGER)",
+    "CREATE TABLE IF NOT EXISTS anchors (id INTEGER PRIMARY KEY, text TEXT)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+]
+# 被リンク数・ネットワーク図の集計がインデックスだけで済むよう、リンク先IDの索引にリンク元ID・タイトル有無も含める
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS links_target ON links (target_id, source_id, has_title)",
+    "CREATE INDEX IF NOT EXISTS links_anchor ON links (anchor_id)",
+    "CREATE INDEX IF NOT EXISTS pages_url ON pages (url_id)",
+]
+
+# 被リンク数（LinkGraph.from_frame と同じく、リンク元タイトル・URL・リンク先URLが揃った行を数える）
+INBOUND_SQL = """
+    SELECT target_id, COUNT(*) AS n FROM links
+    WHERE has_title AND source_id >= 0 AND target_id >= 0 GROUP BY target_id"""
+
+# サイト内のリンクによるサイト内ページ毎の被リンク数（ネットワーク図用）
+SITE_COUNTS_SQL = """
+    SELECT c.target_id, c.n FROM (
+        SELECT l.target_id, COUNT(*) AS n FROM links l JOIN urls s ON s.id = l.source_id
+        WHERE l.target_id >= 0 AND s.in_site GROUP BY l.target_id
+    ) c JOIN urls t ON t.id = c.target_id WHERE t.in_site"""
+
+
+def store_path(key, store_dir=DEFAULT_STORE_DIR, backend=BACKEND):
+    """キー（ファイル内容のハッシュなど）に対応するデータベースファイルのパス"""
+    name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    return os.path.join(store_dir, f"{name}.{backend}")
+
+
+class LinkStore:
+    """内部リンクのテーブル群（読み込みは append → finalize、以降はクエリのみ）"""
+
+    def __init__(self, path=":memory:", backend=BACKEND, read_only=False):
+        """read_only=True で作成済みのデータベースをクエリ専用で開く（他のプロセスと同時に開ける）"""
+        self.backend = backend
+        if path != ":memory:" and not read_only:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if backend == 'duckdb':
+            self.conn = duckdb.connect(path, read_only=read_only)
+        else:
+            # Streamlit のセッション（スレッド）間で共有するため、排他はロックで行う
+            target = f"file:{path}?mode=ro" if read_only else path
+            self.conn = sqlite3.connect(target, uri=read_only, check_same_thread=False)
+        self._lock = threading.Lock()
+        if not read_only:
+            for sql in SCHEMA:
+                self.conn.execute(sql)
+        # 読み込み中だけ使う文字列⇔ID表・URLのタイトル
+        self.urls = StringTable()
+        self.anchors = StringTable()
+        self.pages = StringTable()   # (タイトル, URL) の組（初出順）
+        self._target_titles = {}     # URL ID → リンク先としてのタイトル（最後の値）
+        self._source_titles = {}     # URL ID → リンク元としてのタイトル（最初の値）
+
+    # --- 読み込み ---
+
+    def _insert(self, table, columns):
+        """列名→値の列 を一括追加"""
+        if self.backend == 'duckdb':
+            frame = pd.DataFrame(columns)
+            self.conn.register('_frame', frame)
+            self.conn.execute(f"INSERT INTO {table} SELECT * FROM _frame")
+            self.conn.unregister('_frame')
+        else:
+            values = [c.tolist() if isinstance(c, np.ndarray) else list(c) for c in columns.values()]
+            self.conn.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(values))})", zip(*values))
+
+    @staticmethod
+    def _ids(table, series):
+        """列の値をIDの配列に変換（空文字は -1）"""
+        codes, uniques = pd.factorize(series)
+        ids = np.array([table.intern(value) if value != "" else -1 for value in uniques] + [-1], dtype=np.int32)
+        return ids[codes]  # 欠損値のコード -1 は末尾の -1 を指す
+
+    def append(self, df):
+        """列名マッピング・URL正規化済みの DataFrame（A_〜F_ 列）の全行を追加"""
+        target = self._ids(self.urls, df['C_URL'])
+        source = self._ids(self.urls, df['E_被リンク元ページURL'])
+        anchor = self._ids(self.anchors, df['F_被リンク元ページアンカーテキスト'])
+        has_title = (df['D_被リンク元ページタイトル'] != "").to_numpy()
+        self._insert('links', {'source_id': source, 'target_id': target, 'anchor_id': anchor, 'has_title': has_title})
+
+        pairs = df[['B_ページタイトル', 'C_URL']].drop_duplicates()
+        for pair in zip(pairs['B_ページタイトル'], pairs['C_URL']):
+            self.pages.intern(pair)
+        # URLのタイトル（リンク先としてのタイトルを優先し、なければ最初に現れたリンク元としてのタイトル）
+        titles = pd.Series(df['B_ページタイトル'].to_numpy(), index=target)[target >= 0]
+        titles = titles[~titles.index.duplicated(keep='last')]
+        self._target_titles.update(zip(titles.index.tolist(), titles.tolist()))
+        titles = pd.Series(df['D_被リンク元ページタイトル'].to_numpy(), index=source)[source >= 0]
+        titles = titles[~titles.index.duplicated(keep='first')]
+        for url_id, title in zip(titles.index.tolist(), titles.tolist()):
+            self._source_titles.setdefault(url_id, title)
+
+    def finalize(self, site_domain=None, meta=None):
+        """URL・ページ・アンカーの表とインデックスを作成（site_domain はネットワーク図のサイト内判定に使用）"""
+        url_ids = range(len(self.urls))
+        self._insert('urls', {
+            'id': list(url_ids), 'url': self.urls.values,
+            'title': [self._target_titles.get(i, self._source_titles.get(i)) for i in url_ids],
+            'in_site': [same_site(url, site_domain) for url in self.urls.values],
+        })
+        self._insert('pages', {
+            'id': list(range(len(self.pages))),
+            'title': [title for title, _ in self.pages.values],
+            'url': [url for _, url in self.pages.values],
+            'url_id': [self.urls.get(url, -1) for _, url in self.pages.values],
+        })
+        self._insert('anchors', {'id': list(range(len(self.anchors))), 'text': self.anchors.values})
+        meta = meta or {}
+        self._insert('meta', {'key': list(meta), 'value': [json.dumps(v, ensure_ascii=False) for v in meta.values()]})
+        for sql in INDEXES:
+            self.conn.execute(sql)
+        self.conn.commit()
+        self.urls, self.anchors, self.pages = StringTable(), StringTable(), StringTable()
+        self._target_titles, self._source_titles = {}, {}
+
+    def close(self):
+        self.conn.close()
+
+    # --- クエリ ---
+
+    def _frame(self, sql, params=()):
+        with self._lock:
+            if self.backend == 'duckdb':
+                return self.conn.execute(sql, list(params)).df()
+            return pd.read_sql_query(sql, self.conn, params=list(params))
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, list(params)).fetchall()
+
+    def meta(self):
+        """finalize で保存したメタデータ"""
+        return {key: json.loads(value) for key, value in self._rows("SELECT key, value FROM meta")}
+
+    def summary(self):
+        """総レコード数・内部リンク数・リンク元あり行数・ユニークページ数・ユニークアンカー数"""
+        rows, links, sources = self._rows("""
+            SELECT COUNT(*),
+                   SUM(CASE WHEN source_id >= 0 AND target_id >= 0 THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN has_title AND source_id >= 0 THEN 1 ELSE 0 END)
+            FROM links""")[0]
+        return {
+            'row_count': int(rows), 'link_count': int(links or 0), 'source_count': int(sources or 0),
+            'unique_page_count': int(self._rows("SELECT COUNT(*) FROM pages")[0][0]),
+            'unique_anchor_count': int(self._rows("SELECT COUNT(*) FROM anchors")[0][0]),
+        }
+
+    def pages_frame(self):
+        """ユニークページ（タイトル・URLの組）と被リンク数の DataFrame（被リンク数の多い順、同数ならタイトル順・初出順）"""
+        pages_df = self._frame(f"""
+            SELECT p.title AS title, p.url AS url, COALESCE(i.n, 0) AS n
+            FROM pages p LEFT JOIN ({INBOUND_SQL}) i ON i.target_id = p.url_id
+            ORDER BY n DESC, p.title, p.id""")
+        return pd.DataFrame({
+            'B_ページタイトル': pages_df['title'].to_numpy(dtype=object),
+            'C_URL': pages_df['url'].to_numpy(dtype=object),
+            '被リンク数': pages_df['n'].to_numpy(dtype=np.int64),
+        }).astype({'B_ページタイトル': object, 'C_URL': object})
+
+    def inbound_counts(self):
+        """URL→被リンク数（被リンクのあるページのみ）"""
+        counts = self._frame(f"SELECT u.url AS url, i.n AS n FROM ({INBOUND_SQL}) i JOIN urls u ON u.id = i.target_id")
+        return pd.Series(counts['n'].to_numpy(dtype=np.int64), index=counts['url'].to_numpy(dtype=object))
+
+    def anchor_counts(self):
+        """アンカーテキスト→出現数（Counter、初出順）"""
+        return Counter(dict(self._rows("""
+            SELECT a.text, c.n FROM (SELECT anchor_id, COUNT(*) AS n FROM links WHERE anchor_id >= 0 GROUP BY anchor_id) c
+            JOIN anchors a ON a.id = c.anchor_id ORDER BY a.id""")))
+
+    def url_titles(self):
+        """URL→タイトル（リンク先としてのタイトルを優先し、なければ最初に現れたリンク元としてのタイトル）"""
+        return dict(self._rows("SELECT url, title FROM urls WHERE title IS NOT NULL"))
+
+    def network_edges(self, top_n):
+        """
+        被リンク数上位 top_n ページへのサイト内リンク。
+        返り値は (リンク元URL・リンク先URL・weight の DataFrame, URL→サイト内被リンク数 の Series（多い順）)。
+        """
+        edges = self._frame(f"""
+            WITH top AS (SELECT target_id FROM ({SITE_COUNTS_SQL}) c ORDER BY n DESC, target_id LIMIT ?)
+            SELECT s.url AS source, t.url AS target, COUNT(*) AS weight
+            FROM links l JOIN top ON top.target_id = l.target_id
+            JOIN urls s ON s.id = l.source_id JOIN urls t ON t.id = l.target_id
+            WHERE s.in_site GROUP BY s.url, t.url ORDER BY s.url, t.url""", [int(top_n)])
+        counts = self._frame(f"""
+            SELECT u.url AS url, c.n AS n FROM ({SITE_COUNTS_SQL}) c JOIN urls u ON u.id = c.target_id
+            ORDER BY c.n DESC, c.target_id""")
+        agg = pd.DataFrame({
+            'E_被リンク元ページURL': edges['source'].to_numpy(dtype=object),
+            'C_URL': edges['target'].to_numpy(dtype=object),
+            'weight': edges['weight'].to_numpy(dtype=np.int64),
+        })
+        return agg, pd.Series(counts['n'].to_numpy(dtype=np.int64), index=counts['url'].to_numpy(dtype=object))
+
+    def graph(self):
+        """PageRank・クリック深度・ネットワーク図用の LinkGraph（ID列からそのまま構築し、文字列の再集計はしない）"""
+        urls = self._rows("SELECT url, title FROM urls ORDER BY id")
+        links = self._frame("""
+            SELECT source_id, target_id, anchor_id FROM links
+            WHERE has_title AND source_id >= 0 AND target_id >= 0""")
+        graph = LinkGraph(dedupe=False)
+        graph.urls = StringTable(url for url, _ in urls)
+        graph.texts = StringTable(text for (text,) in self._rows("SELECT text FROM anchors ORDER BY id"))
+        graph.titles = array('i', (graph.texts.intern(title) if title is not None else -1 for _, title in urls))
+        anchor = links['anchor_id'].to_numpy(dtype=np.intc)
+        anchor = np.where(anchor < 0, graph.texts.intern(""), anchor).astype(np.intc)
+        graph._src = array('i', links['source_id'].to_numpy(dtype=np.intc).tobytes())
+        graph._dst = array('i', links['target_id'].to_numpy(dtype=np.intc).tobytes())
+        graph._anchor = array('i', anchor.tobytes())
+        return graph
+
+
+def _benchmark(rows=1_000_000, chunk_rows=200_000):
+    """合成した内部リンクCSVで、pandas による読み込み・集計とデータベースの作成・再オープン後のクエリを比較"""
+    import tempfile
+    import time
+    from io import BytesIO
+
+    from csv_ingest import iter_link_chunks, read_link_csv
+
+    rng = np.random.default_rng(0)
+    n_pages = rows // 20
+    target, source = rng.integers(0, n_pages, rows), rng.integers(0, n_pages, rows)
+    urls = np.array([f"https://example.com/category/article-{i}/" for i in range(n_pages)], dtype=object)
+    titles = np.array([f"記事タイトル {i} | サンプルサイト" for i in range(n_pages)], dtype=object)
+    anchors = np.array([f"関連記事 {i % 5000}" for i in range(n_pages)], dtype=object)
+    no_source = rng.random(rows) < 0.05
+    buffer = BytesIO()
+    pd.DataFrame({
+        'A_番号': target + 1, 'B_ページタイトル': titles[target], 'C_URL': urls[target],
+        'D_被リンク元ページタイトル': np.where(no_source, "", titles[source]),
+        'E_被リンク元ページURL': np.where(no_source, "", urls[source]),
+        'F_被リンク元ページアンカーテキスト': np.where(no_source, "", anchors[source]),
+    }).to_csv(buffer, index=False, encoding='utf-8-sig')
+    data = buffer.getvalue()
+    print(f"{rows:,}行 / {len(data) / 2**20:.0f} MiB")
+
+    # pandas：毎回CSVを読み込んで集計
+    start = time.perf_counter()
+    df = read_link_csv(data)
+    graph = LinkGraph.from_frame(df)
+    inbound = pd.Series(graph.in_degree(), index=graph.urls.values)
+    pages_df = df[['B_ページタイトル', 'C_URL']].drop_duplicates().astype(object)
+    pages_df['被リンク数'] = pages_df['C_URL'].map(inbound).fillna(0).astype(int)
+    pages_df = pages_df.sort_values(['被リンク数', 'B_ページタイトル'], ascending=[False, True]).reset_index(drop=True)
+    expected_anchors = Counter(df.loc[df['F_被リンク元ページアンカーテキスト'] != "", 'F_被リンク元ページアンカーテキスト'])
+    print(f"{'pandas':>8}: 読み込み・集計 {time.perf_counter() - start:6.2f} s")
+    expected_rank = pd.Series(graph.pagerank(), index=graph.urls.values)
+    del df
+
+    for backend in ['sqlite'] + (['duckdb'] if HAS_DUCKDB else []):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, f"links.{backend}")
+            start = time.perf_counter()
+            store = LinkStore(path, backend=backend)
+            for chunk in iter_link_chunks(BytesIO(data), chunk_rows):
+                store.append(chunk)
+            store.finalize('example.com')
+            store.close()
+            build_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            store = LinkStore(path, backend=backend, read_only=True)
+            summary, pages, anchor_counts = store.summary(), store.pages_frame(), store.anchor_counts()
+            agg, _ = store.network_edges(40)
+            query_s = time.perf_counter() - start
+            start = time.perf_counter()
+            stored_graph = store.graph()
+            graph_s = time.perf_counter() - start
+            rank = pd.Series(stored_graph.pagerank(), index=stored_graph.urls.values)
+            store.close()
+
+            same = (pages.equals(pages_df.astype({'被リンク数': np.int64}))
+                    and list(anchor_counts.items()) == list(expected_anchors.items())
+                    and np.allclose(rank.reindex(expected_rank.index).to_numpy(), expected_rank.to_numpy(), atol=1e-9))
+            print(f"{backend:>8}: 作成 {build_s:6.2f} s  再オープン＋集計クエリ {query_s:6.2f} s  "
+                  f"LinkGraph {graph_s:5.2f} s  ファイル {os.path.getsize(path) / 2**20:6.1f} MiB  "
+                  f"（{summary['link_count']:,}リンク / 上位40件 {len(agg):,}エッジ）結果の一致: {'OK' if same else 'NG'}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -24,11 +24,19 @@ from pathlib import Path
 from collections import Counter
 from datetime import datetime
 from urllib.parse import urlparse
-import base64
+import hashlib
+import itertools
 from io import BytesIO
 import zipfile
 import re
 
+from csv_ingest import HAS_PYARROW, LinkStats, anchor_counter, compact_columns, iter_link_chunks, link_file_format, link_masks, read_links
+from url_normalize import normalize_url, normalize_url_series, same_site
+from link_graph import LinkGraph
+from link_store import BACKEND, LinkStore, store_path
+from graph_layout import force_layout
+from report_tables import html_file, isolated_rows, iter_html_table, pillar_rows, url_titles, write_chunks
+
 # PyVis（オプション）
 try:
     from pyvis.network import Network
@@ -36,6 +44,16 @@ try:
 except ImportError:
     HAS_PYVIS = False
 
+# 点・線分の数がこれを超えるプロットは WebGL（Scattergl）で描画
+WEBGL_THRESHOLD = 2000
+# ネットワーク図（中重量）で配置を計算するリンク先ページ数の上限（「全ページを表示」でもこれ以上は描画しない）
+MAX_NETWORK_PAGES = 5000
+
+CHUNKED_MODE_NOTE = "分割読み込みモードではリンク構造を保持しないため表示できません。通常モードで読み込んでください。"
+
+# サーバー上のファイルを読み込めるディレクトリ（未設定ならパス入力欄を表示しない）
+SERVER_DATA_DIR = os.environ.get('LINK_DATA_DIR', '')
+
 # ページ設定
 st.set_page_config(
     page_title="🔗 内部リンク構造分析ツール",
@@ -175,37 +193,6 @@ def apply_column_mapping(df, mapping):
     return df_mapped[standard_columns]
 
 # ユーティリティ関数
-@st.cache_data
-def safe_str(s):
-    return s if isinstance(s, str) else ""
-
-@st.cache_data
-def normalize_url(u, default_scheme="https", base_domain=None):
-    """URL正規化"""
-    if not isinstance(u, str) or not u.strip():
-        return ""
-    u = u.strip()
-    
-    try:
-        from urllib.parse import urlparse, urlunparse
-        p = urlparse(u)
-
-        if not p.netloc and base_domain:
-            path = u if u.startswith("/") else f"/{u}"
-            u = f"{default_scheme}://{base_domain}{path}"
-            p = urlparse(u)
-        elif not p.netloc:
-            return u
-
-        scheme = p.scheme or default_scheme
-        netloc = p.netloc.lower()
-        if netloc.startswith("www."):
-            netloc = netloc[4:]
-        path = p.path or "/"
-        return urlunparse((scheme, netloc, path, p.params, p.query, ""))
-    except Exception:
-        return u
-
 def detect_site_info(filename, df):
     """ファイル名とURLからサイト情報を推測"""
     filename = filename.lower()
@@ -241,56 +228,214 @@ def detect_site_info(filename, df):
     
     return site_name, site_domain
 
-def create_download_link(content, filename, link_text="ダウンロード"):
-    """ダウンロードリンクを作成"""
-    if isinstance(content, str):
-        content = content.encode('utf-8')
-    
-    b64 = base64.b64encode(content).decode()
-    href = f'<a href="data:text/html;base64,{b64}" download="{filename}" style="text-decoration: none; background-color: #1f77b4; color: white; padding: 0.5rem 1rem; border-radius: 0.25rem; display: inline-block;">{link_text}</a>'
-    return href
+# 読み込み〜集計（ファイル内容のハッシュでキャッシュ）
+ESSENTIAL_COLUMNS = ['B_ページタイトル', 'C_URL']
 
-def generate_html_table(title, columns, rows):
-    """HTML表を生成"""
-    def esc(x):
-        return str(x).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-    
-    html_parts = [
-        "<!doctype html>",
-        "<meta charset='utf-8'>",
-        f"<title>{esc(title)}</title>",
-        """<style>
-            body { font-family: Arial, 'Yu Gothic', Meiryo, sans-serif; padding: 16px; }
-            table { border-collapse: collapse; width: 100%; }
-            th, td { border: 1px solid #ddd; padding: 8px; font-size: 14px; }
-            th { position: sticky; top: 0; background: #f7f7f7; font-weight: bold; }
-            tr:nth-child(even) { background: #fafafa; }
-            a { color: #1565c0; text-decoration: none; }
-            a:hover { text-decoration: underline; }
-            .header { text-align: center; margin-bottom: 2rem; }
-        </style>""",
-        f"<div class='header'><h1>{esc(title)}</h1></div>",
-        "<table><thead><tr>"
+def server_data_path(name):
+    """SERVER_DATA_DIR 内のファイルの絶対パス（ディレクトリ外・存在しない場合は None）"""
+    root = Path(SERVER_DATA_DIR).expanduser().resolve()
+    # シンボリックリンクや .. を解決してから判定（絶対パスを入力してもディレクトリ外は拒否）
+    path = (root / name).resolve()
+    try:
+        path.relative_to(root)  # Path.is_relative_to は Python 3.9 以降のため
+    except ValueError:
+        return None
+    return path if path.is_file() else None
+
+def file_digest(uploaded_file):
+    """
+    アップロードファイルの内容ハッシュ（キャッシュキー）。
+    ウィジェット操作の再実行のたびに全体を読まないよう、同じアップロード（file_id・サイズ）の間はセッションに保持
+    """
+    key = (uploaded_file.file_id, uploaded_file.size)
+    cached = st.session_state.get('file_digest')
+    if cached is None or cached[0] != key:
+        cached = st.session_state['file_digest'] = (key, hashlib.sha256(uploaded_file.getvalue()).hexdigest())
+    return cached[1]
+
+@st.cache_resource(show_spinner="📊 データを集計中...", max_entries=4)
+def load_analysis(digest, filename, _data):
+    """
+    CSV/Parquet/Feather 読み込み・列名マッピング・URL正規化・被リンク/アンカー集計をまとめて実行。
+    digest と filename が同じなら再計算せず前回の結果を返す（ウィジェット操作時の再実行対策）。
+    返り値の DataFrame は共有されるため、呼び出し側では変更しないこと。
+    """
+    df_raw = read_links(_data, filename)
+    result = {'raw_columns': list(df_raw.columns), 'column_mapping': detect_column_mapping(df_raw.columns)}
+    if not result['column_mapping']:
+        return result
+
+    df = apply_column_mapping(df_raw, result['column_mapping'])
+    result['missing_essential'] = [
+        col for col in ESSENTIAL_COLUMNS
+        if col not in df.columns or df[col].str.strip().eq("").all()
     ]
-    
-    for col in columns:
-        html_parts.append(f"<th>{esc(col)}</th>")
-    
-    html_parts.append("</tr></thead><tbody>")
-    
-    for row in rows:
-        html_parts.append("<tr>")
-        for i, cell in enumerate(row):
-            val = esc(cell)
-            header = columns[i]
-            if "URL" in header.upper() or header.endswith("URL"):
-                if val and (val.startswith("http://") or val.startswith("https://")):
-                    val = f"<a href='{val}' target='_blank' rel='noopener'>{val}</a>"
-            html_parts.append(f"<td>{val}</td>")
-        html_parts.append("</tr>")
-    
-    html_parts.append("</tbody></table>")
-    return "".join(html_parts)
+    if result['missing_essential']:
+        return result
+
+    site_name, site_domain = detect_site_info(filename, df)
+
+    # URL正規化（ユニーク値のみ正規化して展開）
+    df['C_URL'] = normalize_url_series(df['C_URL'], base_domain=site_domain)
+    df['E_被リンク元ページURL'] = normalize_url_series(df['E_被リンク元ページURL'], base_domain=site_domain)
+
+    # 共通データ準備（繰り返しの多い列はカテゴリ型、判定マスクは一度だけ計算）
+    compact_columns(df)
+    masks = link_masks(df)
+    pages_df = df[['B_ページタイトル', 'C_URL']].drop_duplicates().astype(object)
+
+    # 被リンク数計算（整数IDのリンクグラフ上で集計）
+    graph = LinkGraph.from_frame(df)
+    inbound_counts = pd.Series(graph.in_degree(), index=graph.urls.values)
+    inbound_counts = inbound_counts[inbound_counts > 0]
+
+    pages_df['被リンク数'] = pages_df['C_URL'].map(inbound_counts).fillna(0).astype(int)
+    pages_df = pages_df.sort_values(['被リンク数', 'B_ページタイトル'], ascending=[False, True])
+
+    # アンカーテキスト集計
+    anchor_counts = anchor_counter(df.loc[masks['has_anchor'], 'F_被リンク元ページアンカーテキスト'])
+
+    result.update({
+        'df': df, 'site_name': site_name, 'site_domain': site_domain,
+        'pages_df': pages_df, 'masks': masks, 'source_count': int(masks['has_source'].sum()), 'inbound_counts': inbound_counts, 'graph': graph,
+        'anchor_counts': anchor_counts,
+        'row_count': len(df), 'unique_page_count': len(pages_df),
+        'link_count': int(masks['has_link'].sum()),
+        'unique_anchor_count': len(anchor_counts),
+    })
+    return result
+
+def mapped_chunks(filename, source):
+    """
+    CSV/Parquet/Feather（パスまたはファイルオブジェクト）をチャンク毎に読み、
+    (読み込み情報, 列名マッピング・URL正規化済みチャンクのイテレータ) を返す。
+    列名マッピングとドメイン推測は最初のチャンクで行い、マッピングできなければイテレータは None。
+    イテレータは一度しか使えないためキャッシュせず、呼び出し毎にファイルを読み直す
+    （集計結果は呼び出し側の load_analysis_chunked / load_analysis_store でキャッシュ）。
+    """
+    chunks = iter_link_chunks(source, file_format=link_file_format(filename))
+    first = next(chunks, None)
+    if first is None:
+        return {'raw_columns': [], 'column_mapping': {}}, None
+    result = {'raw_columns': list(first.columns), 'column_mapping': detect_column_mapping(first.columns)}
+    if not result['column_mapping']:
+        return result, None
+    site_name, site_domain = detect_site_info(filename, apply_column_mapping(first, result['column_mapping']))
+    result.update({'site_name': site_name, 'site_domain': site_domain})
+
+    def normalized():
+        for chunk in itertools.chain([first], chunks):
+            df = apply_column_mapping(chunk, result['column_mapping'])
+            df['C_URL'] = normalize_url_series(df['C_URL'], base_domain=site_domain)
+            df['E_被リンク元ページURL'] = normalize_url_series(df['E_被リンク元ページURL'], base_domain=site_domain)
+            yield df
+    return result, normalized()
+
+@st.cache_resource(show_spinner="📊 CSVを分割して集計中...", max_entries=4)
+def load_analysis_chunked(digest, filename, _source):
+    """
+    分割読み込みモード：CSV（パスまたはファイルオブジェクト）をチャンク毎に読んで LinkStats に集計を加算し、
+    DataFrame 全体もリンクグラフも保持しない。
+    返り値は load_analysis と同じ形式（df・masks・graph は None）。
+    """
+    result, chunks = mapped_chunks(filename, _source)
+    if chunks is None:
+        return result
+
+    stats = LinkStats(ESSENTIAL_COLUMNS)
+    for df in chunks:
+        stats.add(df)
+
+    result['missing_essential'] = stats.missing_columns()
+    if result['missing_essential']:
+        return result
+
+    result.update({
+        'df': None, 'pages_df': stats.pages_frame(), 'masks': None, 'source_count': stats.source_count,
+        'inbound_counts': stats.inbound_counts(), 'graph': None, 'anchor_counts': stats.anchor_counts,
+        'row_count': stats.row_count, 'unique_page_count': len(stats.pages),
+        'link_count': stats.link_count, 'unique_anchor_count': len(stats.anchor_counts),
+    })
+    return result
+
+@st.cache_resource(show_spinner="🗄️ 分析用データベースを準備中...", max_entries=4)
+def load_analysis_store(digest, filename, _source):
+    """
+    組み込みDBモード：初回は CSV をチャンク毎に LinkStore（DuckDB/SQLite のファイル）へ読み込み、
+    以降はアプリを再起動しても保存済みのデータベースを開き、CSVを読み直さずにクエリで集計する。
+    返り値は load_analysis と同じ形式（df・masks は None、store を追加）。
+    """
+    path = store_path(digest)
+    if not os.path.exists(path):
+        result, chunks = mapped_chunks(filename, _source)
+        if chunks is None:
+            return result
+
+        # 作成途中のファイルを開かないよう、一時ファイルに作成してから置き換える
+        building = path + ".tmp"
+        for stale in (building, building + ".wal"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        store = LinkStore(building)
+        filled = set()
+        for df in chunks:
+            filled.update(col for col in ESSENTIAL_COLUMNS if not df[col].str.strip().eq("").all())
+            store.append(df)
+        result['missing_essential'] = [col for col in ESSENTIAL_COLUMNS if col not in filled]
+        if result['missing_essential']:
+            store.close()
+            os.remove(building)
+            return result
+        store.finalize(result['site_domain'], meta=result)
+        store.close()
+        os.replace(building, path)
+
+    store = LinkStore(path, read_only=True)
+    result = store.meta()
+    result.update(store.summary())
+    anchor_counts = store.anchor_counts()
+    result.update({
+        'df': None, 'masks': None, 'store': store, 'pages_df': store.pages_frame(),
+        'inbound_counts': store.inbound_counts(), 'graph': store.graph(), 'anchor_counts': anchor_counts,
+    })
+    return result
+
+@st.cache_data(show_spinner="📐 PageRankを計算中...", max_entries=16)
+def compute_pagerank(digest, damping, tol, _graph):
+    """URL→PageRank（ファイル内容・減衰率・収束判定値毎にキャッシュ）"""
+    return pd.Series(_graph.pagerank(damping=damping, tol=tol), index=_graph.urls.values)
+
+@st.cache_data(show_spinner="🪜 クリック深度を計算中...", max_entries=16)
+def compute_click_depth(digest, root_url, _graph):
+    """URL→起点URLからのクリック数（到達できるページのみ、ファイル内容・起点URL毎にキャッシュ）"""
+    root = _graph.urls.get(root_url)
+    if root is None:
+        return pd.Series(dtype='int64')
+    depth = _graph.click_depth(root)
+    reachable = np.flatnonzero(depth >= 0)
+    return pd.Series(depth[reachable], index=np.asarray(_graph.urls.values, dtype=object)[reachable])
+
+@st.cache_data(show_spinner="🧲 ネットワークの配置を計算中...", max_entries=16)
+def compute_network_layout(digest, top_n, _graph, _top_urls):
+    """
+    上位ページへのリンクからなる部分グラフと力学モデルによる配置（ファイル内容・表示件数毎にキャッシュ）。
+    返り値は (ノードのURL ID, リンク元ノード番号, リンク先ノード番号, 座標)。
+    """
+    top_ids = [i for i in (_graph.urls.get(url) for url in _top_urls) if i is not None]
+    src, dst, _ = _graph.edges()
+    mask = np.isin(dst, top_ids)
+    src, dst = src[mask], dst[mask]
+    nodes, local = np.unique(np.concatenate([src, dst]), return_inverse=True)
+    edge_src, edge_dst = local[:len(src)], local[len(src):]
+    return nodes, edge_src, edge_dst, force_layout(edge_src, edge_dst, len(nodes))
+
+@st.cache_data(show_spinner="🧲 ネットワークの配置を計算中...", max_entries=16)
+def compute_pyvis_layout(edge_src, edge_dst, n):
+    """pyvis 用のノード座標（ピクセル単位、原点中心）。リンク構成が同じなら再計算しない"""
+    pos = force_layout(edge_src, edge_dst, n)
+    pos -= pos.mean(axis=0)
+    # ノード数に応じて広げ、ラベルが重なりにくい大きさにする
+    return pos * (60 * np.sqrt(n) / max(np.abs(pos).max(), 1e-9))
 
 # メイン関数
 def main():
@@ -304,13 +449,36 @@ def main():
         # CSVアップロード
         uploaded_file = st.file_uploader(
             "CSVファイルをアップロード",
-            type=['csv'],
-            help="内部リンクデータのCSVファイルを選択してください"
+            # Parquet / Feather は pyarrow がある環境のみ
+            type=['csv', 'parquet', 'feather', 'arrow'] if HAS_PYARROW else ['csv'],
+            help="内部リンクデータのCSVファイル（クローラーが書き出した Parquet / Feather も可）を選択してください"
+                 if HAS_PYARROW else "内部リンクデータのCSVファイルを選択してください"
         )
         
         if uploaded_file is not None:
             st.success("✅ ファイルがアップロードされました")
         
+        use_store = st.checkbox(
+            f"組み込みDBで分析（{'DuckDB' if BACKEND == 'duckdb' else 'SQLite'}）",
+            value=False,
+            help="初回にCSVをデータベースファイルへ読み込み、以降はアプリを再起動してもCSVを読み直さずにクエリで集計します"
+        )
+        
+        chunked_mode = st.checkbox(
+            "大容量CSV：分割読み込みモード",
+            value=False,
+            help="CSVを分割して読み込み、被リンク数・アンカー・孤立記事だけを集計してメモリ使用量を抑えます"
+                 "（PageRank・クリック深度・ネットワーク図は計算しません）"
+        )
+        csv_path = ""
+        if SERVER_DATA_DIR and (chunked_mode or use_store):
+            csv_path = st.text_input(
+                "サーバー上のCSVファイル名（任意）",
+                value="",
+                help="アップロードできない大きさのCSVは、サーバーのデータディレクトリ（LINK_DATA_DIR）内の"
+                     "ファイル名を指定して読み込めます（Parquet / Feather も可。Feather はメモリマップで読み込みます）"
+            ).strip()
+        
         st.header("🛠️ 分析設定")
         
         # ネットワーク図設定
@@ -329,6 +497,31 @@ def main():
             help="ネットワーク図に孤立ページも含める"
         )
         
+        network_all_pages = st.checkbox(
+            "ネットワーク図：全ページを表示",
+            value=False,
+            help="散布図・ネットワーク図（中重量）で上位N件ではなく全ページを描画（大規模データはWebGLで描画。"
+                 f"ネットワーク図は被リンク数の上位{MAX_NETWORK_PAGES:,}ページまで）"
+        )
+        
+        # PageRank設定
+        pagerank_damping = st.slider(
+            "PageRank：減衰率",
+            min_value=0.50,
+            max_value=0.95,
+            value=0.85,
+            step=0.05,
+            help="リンクをたどり続ける確率（一般的な値は0.85）"
+        )
+        
+        pagerank_tol = st.select_slider(
+            "PageRank：収束判定値",
+            options=[1e-4, 1e-5, 1e-6, 1e-7, 1e-8],
+            value=1e-6,
+            format_func=lambda v: f"{v:.0e}",
+            help="反復間の変化量（L1）がこの値を下回ったら計算終了"
+        )
+        
         # レポート設定
         st.header("📊 レポート設定")
         auto_download = st.checkbox(
@@ -338,7 +531,7 @@ def main():
         )
 
     # メインエリア
-    if uploaded_file is None:
+    if uploaded_file is None and not csv_path:
         st.info("👆 サイドバーからCSVファイルをアップロードしてください")
         
         # 対応可能なCSVフォーマットを表示
@@ -382,21 +575,44 @@ def main():
     
     # データ読み込み
     try:
-        # CSVを読み込み
-        df_raw = pd.read_csv(uploaded_file, encoding="utf-8-sig").fillna("")
+        # CSVを読み込み・集計（同じファイルならキャッシュを再利用）
+        if csv_path:
+            path = server_data_path(csv_path)
+            if path is None:
+                st.error(f"❌ データディレクトリ内にファイルが見つかりません: {csv_path}")
+                return
+            if link_file_format(path) != 'csv' and not HAS_PYARROW:
+                st.error("❌ Parquet / Feather の読み込みには pyarrow が必要です（pip install pyarrow）")
+                return
+            # パス・サイズ・更新日時が同じなら同じ内容とみなす（大容量ファイルはハッシュを計算しない）
+            stat = path.stat()
+            source_name, source = path.name, str(path)
+            digest = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+        else:
+            source_name, source = uploaded_file.name, None
+            digest = file_digest(uploaded_file)
+        
+        if use_store:
+            analysis = load_analysis_store(digest, source_name, source or BytesIO(uploaded_file.getvalue()))
+            # リンクグラフのID順が通常モードと異なるため、PageRank 等のキャッシュを分ける
+            digest = f"{digest}:store"
+        elif chunked_mode:
+            analysis = load_analysis_chunked(digest, source_name, source or BytesIO(uploaded_file.getvalue()))
+        else:
+            analysis = load_analysis(digest, source_name, uploaded_file.getvalue())
         
         st.subheader("📊 データ読み込み結果")
         
         # 元の列名を表示
         st.write("**元のCSVの列名:**")
-        st.write(list(df_raw.columns))
+        st.write(analysis['raw_columns'])
         
         # 列名マッピングを自動検出
-        column_mapping = detect_column_mapping(df_raw.columns)
+        column_mapping = analysis['column_mapping']
         
         if not column_mapping:
             st.error("❌ 適切な列名が見つかりませんでした。CSVファイルの列名を確認してください。")
-            st.write("**検出された列名:**", list(df_raw.columns))
+            st.write("**検出された列名:**", analysis['raw_columns'])
             st.write("**期待される列の種類:**")
             expected_types = [
                 "番号・ID系", "ページタイトル系", "URL系", 
@@ -415,119 +631,113 @@ def main():
         st.dataframe(mapping_df, use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
-        # マッピングを適用
-        df = apply_column_mapping(df_raw, column_mapping)
-        
         # 必須列の確認
-        essential_columns = ['B_ページタイトル', 'C_URL']
-        missing_essential = []
-        
-        for col in essential_columns:
-            if col not in df.columns or df[col].fillna("").astype(str).str.strip().eq("").all():
-                missing_essential.append(col)
+        missing_essential = analysis['missing_essential']
         
         if missing_essential:
             st.error(f"❌ 必須データが不足しています: {missing_essential}")
             st.write("少なくとも「ページタイトル」と「URL」の情報が必要です。")
             return
         
-        # サイト情報検出
-        site_name, site_domain = detect_site_info(uploaded_file.name, df)
-        
-        # URL正規化
-        def norm_url(u):
-            return normalize_url(u, base_domain=site_domain)
-        
-        df['C_URL'] = df['C_URL'].apply(norm_url)
-        df['E_被リンク元ページURL'] = df['E_被リンク元ページURL'].apply(norm_url)
+        # 集計結果（キャッシュ共有のため変更しない）
+        df, graph = analysis['df'], analysis['graph']
+        site_name, site_domain = analysis['site_name'], analysis['site_domain']
+        pages_df = analysis['pages_df'].copy()
+        if graph is not None:
+            pagerank = compute_pagerank(digest, pagerank_damping, pagerank_tol, graph)
+            pages_df['PageRank'] = pages_df['C_URL'].map(pagerank).fillna(0.0)
+            
+            # クリック深度（起点の既定はトップページ）
+            root_input = st.sidebar.text_input(
+                "クリック深度：起点URL",
+                value=f"https://{site_domain}/" if site_domain else "",
+                help="ここから内部リンクを何回たどれば到達できるかを計算します"
+            )
+            root_url = normalize_url(root_input, base_domain=site_domain)
+            click_depth = compute_click_depth(digest, root_url, graph)
+            pages_df['クリック深度'] = pages_df['C_URL'].map(click_depth).astype('Int64')
+        else:
+            root_url = None
+        # リンクグラフから計算する列（分割読み込みモードでは無し）
+        rank_columns = [col for col in ('PageRank', 'クリック深度') if col in pages_df.columns]
+        depth_columns = [col for col in ('クリック深度',) if col in pages_df.columns]
+        source_count = analysis['source_count']
+        inbound_counts = analysis['inbound_counts']
+        anchor_counts = analysis['anchor_counts']
         
         # データ概要表示
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("📊 総レコード数", len(df))
+            st.metric("📊 総レコード数", analysis['row_count'])
         
         with col2:
-            unique_pages = df[['B_ページタイトル', 'C_URL']].drop_duplicates()
-            st.metric("📄 ユニークページ数", len(unique_pages))
+            st.metric("📄 ユニークページ数", analysis['unique_page_count'])
         
         with col3:
-            has_link = (df['E_被リンク元ページURL'].astype(str) != "") & (df['C_URL'].astype(str) != "")
-            st.metric("🔗 内部リンク数", has_link.sum())
+            st.metric("🔗 内部リンク数", analysis['link_count'])
         
         with col4:
-            unique_anchors = df[df['F_被リンク元ページアンカーテキスト'].astype(str) != '']['F_被リンク元ページアンカーテキスト'].nunique()
+            unique_anchors = analysis['unique_anchor_count']
             st.metric("🏷️ ユニークアンカー数", unique_anchors)
         
         st.markdown(f"""
         <div class="success-box">
-            <strong>📁 読み込み完了:</strong> {uploaded_file.name}<br>
+            <strong>📁 読み込み完了:</strong> {source_name}{'（分割読み込みモード）' if graph is None else ''}<br>
             <strong>🌐 サイト:</strong> {site_name}<br>
             <strong>🔗 ドメイン:</strong> {site_domain or '不明'}
         </div>
         """, unsafe_allow_html=True)
         
         # タブで機能を分割
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "🏛️ ピラーページ", "🧩 クラスター分析", "🧭 孤立記事", 
+        tab1, tab2, tab3, tab_depth, tab4, tab5 = st.tabs([
+            "🏛️ ピラーページ", "🧩 クラスター分析", "🧭 孤立記事", "🪜 クリック深度",
             "📈 ネットワーク図", "📊 総合レポート"
         ])
         
-        # 共通データ準備
-        pages_df = df[['B_ページタイトル', 'C_URL']].drop_duplicates().copy()
-        
-        # 被リンク数計算
-        has_source = (df['D_被リンク元ページタイトル'].astype(str) != "") & (df['E_被リンク元ページURL'].astype(str) != "")
-        inbound_df = df[has_source & (df['C_URL'].astype(str) != "")]
-        inbound_counts = inbound_df.groupby('C_URL').size()
-        
-        pages_df['被リンク数'] = pages_df['C_URL'].map(inbound_counts).fillna(0).astype(int)
-        pages_df = pages_df.sort_values(['被リンク数', 'B_ページタイトル'], ascending=[False, True])
-        
         # Tab 1: ピラーページ分析
         with tab1:
             st.header("🏛️ ピラーページ分析")
-            st.write("被リンク数の多いページを特定します。")
+            st.write("被リンク数の多いページ、リンク元の重要度も考慮した PageRank の高いページを特定します。")
             
-            # 上位表示件数設定
+            # 上位表示件数・並び順設定
             top_n_pillar = st.slider("表示件数", 5, 50, 20, key="pillar_top_n")
+            pillar_sort = st.radio("並び順", ["被リンク数", "PageRank"] if graph is not None else ["被リンク数"], horizontal=True, key="pillar_sort")
             
             # 上位ページ表示
-            top_pages = pages_df.head(top_n_pillar)
+            pillar_df = pages_df if pillar_sort == "被リンク数" else pages_df.sort_values(
+                ['PageRank', '被リンク数', 'B_ページタイトル'], ascending=[False, False, True])
+            top_pages = pillar_df.head(top_n_pillar)
             
             if not top_pages.empty:
                 # グラフ表示
                 fig = px.bar(
                     top_pages.head(15), 
-                    x='被リンク数', 
+                    x=pillar_sort, 
                     y='B_ページタイトル',
                     orientation='h',
-                    title="被リンク数 TOP15",
-                    labels={'被リンク数': '被リンク数', 'B_ページタイトル': 'ページタイトル'}
+                    title=f"{pillar_sort} TOP15",
+                    labels={pillar_sort: pillar_sort, 'B_ページタイトル': 'ページタイトル'}
                 )
                 fig.update_layout(yaxis={'categoryorder':'total ascending'}, height=600)
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # データテーブル表示
                 st.subheader("📋 ピラーページ一覧")
-                display_df = top_pages[['B_ページタイトル', 'C_URL', '被リンク数']].copy()
+                display_df = top_pages[['B_ページタイトル', 'C_URL', '被リンク数', *rank_columns]].copy()
                 display_df.index = range(1, len(display_df) + 1)
                 st.dataframe(display_df, use_container_width=True)
                 
                 # HTMLレポート生成
-                if auto_download and st.button("📥 ピラーページレポートをダウンロード", key="download_pillar"):
-                    rows = [[i, safe_str(row['B_ページタイトル']), safe_str(row['C_URL']), int(row['被リンク数'])]
-                            for i, (_, row) in enumerate(pages_df.iterrows(), 1)]
-                    
-                    html_content = generate_html_table(
+                if auto_download and st.button("📥 ピラーページレポートを作成", key="download_pillar"):
+                    report = html_file(iter_html_table(
                         f"{site_name} ピラーページ分析レポート",
-                        ["#", "ページタイトル", "URL", "被リンク数"],
-                        rows
-                    )
+                        ["#", "ページタイトル", "URL", "被リンク数", *rank_columns],
+                        pillar_rows(pillar_df)
+                    ))
                     
                     filename = f"pillar_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-                    download_link = create_download_link(html_content, filename)
-                    st.markdown(download_link, unsafe_allow_html=True)
+                    st.download_button("💾 ピラーページレポートを保存", report, file_name=filename, mime="text/html", key="save_pillar")
             else:
                 st.warning("⚠️ 分析対象のページデータが見つかりません。")
         
@@ -537,9 +747,6 @@ def main():
             st.write("アンカーテキストの頻度と多様性を分析します。")
             
             # アンカーテキスト分析
-            anchor_df = df[df['F_被リンク元ページアンカーテキスト'].astype(str) != '']
-            anchor_counts = Counter(anchor_df['F_被リンク元ページアンカーテキスト'])
-            
             if anchor_counts:
                 total_anchors = sum(anchor_counts.values())
                 unique_anchors = len(anchor_counts)
@@ -577,18 +784,17 @@ def main():
                 st.dataframe(display_anchors, use_container_width=True)
                 
                 # HTMLレポート生成
-                if auto_download and st.button("📥 アンカーレポートをダウンロード", key="download_anchor"):
-                    rows = [[i, anchor, count] for i, (anchor, count) in enumerate(anchor_counts.most_common(), 1)]
+                if auto_download and st.button("📥 アンカーレポートを作成", key="download_anchor"):
+                    rows = ([i, anchor, count] for i, (anchor, count) in enumerate(anchor_counts.most_common(), 1))
                     
-                    html_content = generate_html_table(
+                    report = html_file(iter_html_table(
                         f"{site_name} アンカーテキスト分析レポート",
                         ["#", "アンカーテキスト", "頻度"],
                         rows
-                    )
+                    ))
                     
                     filename = f"anchor_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-                    download_link = create_download_link(html_content, filename)
-                    st.markdown(download_link, unsafe_allow_html=True)
+                    st.download_button("💾 アンカーレポートを保存", report, file_name=filename, mime="text/html", key="save_anchor")
             else:
                 st.warning("⚠️ アンカーテキストデータが見つかりません。")
         
@@ -605,27 +811,71 @@ def main():
                 
                 # データテーブル表示
                 st.subheader("📋 孤立記事一覧")
-                display_isolated = isolated_pages[['B_ページタイトル', 'C_URL']].copy()
+                display_isolated = isolated_pages[['B_ページタイトル', 'C_URL', *depth_columns]].copy()
                 display_isolated.index = range(1, len(display_isolated) + 1)
                 st.dataframe(display_isolated, use_container_width=True)
                 
                 # HTMLレポート生成
-                if auto_download and st.button("📥 孤立記事レポートをダウンロード", key="download_isolated"):
-                    rows = [[i, safe_str(row['B_ページタイトル']), safe_str(row['C_URL'])]
-                            for i, (_, row) in enumerate(isolated_pages.iterrows(), 1)]
-                    
-                    html_content = generate_html_table(
+                if auto_download and st.button("📥 孤立記事レポートを作成", key="download_isolated"):
+                    report = html_file(iter_html_table(
                         f"{site_name} 孤立記事分析レポート",
-                        ["#", "ページタイトル", "URL"],
-                        rows
-                    )
+                        ["#", "ページタイトル", "URL", *depth_columns],
+                        isolated_rows(isolated_pages)
+                    ))
                     
                     filename = f"isolated_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-                    download_link = create_download_link(html_content, filename)
-                    st.markdown(download_link, unsafe_allow_html=True)
+                    st.download_button("💾 孤立記事レポートを保存", report, file_name=filename, mime="text/html", key="save_isolated")
             else:
                 st.success("🎉 孤立記事は見つかりませんでした！")
         
+        # Tab: クリック深度
+        with tab_depth:
+            st.header("🪜 クリック深度分析")
+            st.write("起点URLから内部リンクを何回たどれば各ページに到達できるかを調べます。")
+            
+            reachable_depth = pages_df.get('クリック深度', pd.Series(dtype='Int64')).dropna()
+            
+            if graph is None:
+                st.info(f"ℹ️ {CHUNKED_MODE_NOTE}")
+            elif root_url not in graph.urls:
+                st.warning(f"⚠️ 起点URL {root_url or '（未指定）'} がデータに含まれていません。サイドバーで起点URLを指定してください。")
+            elif not reachable_depth.empty:
+                unreachable_count = len(pages_df) - len(reachable_depth)
+                deep_pages = pages_df[pages_df['クリック深度'].fillna(-1) >= 4]
+                
+                # メトリクス表示
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("🧭 到達可能ページ数", len(reachable_depth))
+                with col2:
+                    st.metric("🚫 到達不可ページ数", unreachable_count)
+                with col3:
+                    st.metric("📏 平均クリック深度", f"{reachable_depth.mean():.2f}")
+                with col4:
+                    st.metric("🕳️ 4クリック以上", len(deep_pages))
+                
+                # 深度分布グラフ
+                depth_dist = reachable_depth.astype(int).value_counts().sort_index()
+                dist_df = pd.DataFrame({
+                    'クリック深度': [str(d) for d in depth_dist.index] + (["到達不可"] if unreachable_count else []),
+                    'ページ数': list(depth_dist.values) + ([unreachable_count] if unreachable_count else [])
+                })
+                fig = px.bar(dist_df, x='クリック深度', y='ページ数', title=f"クリック深度の分布（起点: {root_url}）")
+                fig.update_layout(height=450)
+                st.plotly_chart(fig, use_container_width=True)
+                
+                # 深い階層のページ一覧
+                if not deep_pages.empty:
+                    st.subheader("📋 4クリック以上かかるページ")
+                    display_deep = deep_pages.sort_values(['クリック深度', '被リンク数'], ascending=[False, True])[
+                        ['B_ページタイトル', 'C_URL', 'クリック深度', '被リンク数']].copy()
+                    display_deep.index = range(1, len(display_deep) + 1)
+                    st.dataframe(display_deep, use_container_width=True)
+                else:
+                    st.success("🎉 すべての到達可能ページが3クリック以内です！")
+            else:
+                st.warning("⚠️ 起点URLから到達できるページがありません。")
+        
         # Tab 4: ネットワーク図
         with tab4:
             st.header("📈 ネットワーク図")
@@ -638,9 +888,12 @@ def main():
                 key="network_type"
             )
             
+            # 散布図・中重量の描画件数（インタラクティブは上位N件のまま）
+            plot_top_n = len(pages_df) if network_all_pages else network_top_n
+            
             if network_type == "散布図（軽量）":
                 # 簡易散布図
-                top_pages_network = pages_df.head(network_top_n)
+                top_pages_network = pages_df.head(plot_top_n)
                 
                 if not top_pages_network.empty:
                     fig = px.scatter(
@@ -649,7 +902,8 @@ def main():
                         y='被リンク数',
                         size='被リンク数',
                         hover_data=['B_ページタイトル', 'C_URL'],
-                        title=f"被リンク数分布（上位{network_top_n}件）"
+                        title=f"被リンク数分布（上位{plot_top_n}件）",
+                        render_mode='webgl' if len(top_pages_network) > WEBGL_THRESHOLD else 'svg'
                     )
                     fig.update_layout(
                         xaxis_title="ページ順位",
@@ -660,48 +914,44 @@ def main():
                 else:
                     st.warning("⚠️ 表示できるデータがありません。")
             
+            elif graph is None:
+                st.info(f"ℹ️ {CHUNKED_MODE_NOTE}")
+            
             elif network_type == "ネットワーク図（中重量）":
                 # Plotlyネットワーク図
                 st.info("🔄 ネットワーク図を生成中...")
                 
-                # エッジデータ準備
-                edges_df = df[
-                    (df['E_被リンク元ページURL'].astype(str) != "") &
-                    (df['C_URL'].astype(str) != "")
-                ][['E_被リンク元ページURL', 'C_URL']].copy()
+                # 上位ページへのリンクの部分グラフと配置（配置計算の負荷を抑えるためページ数に上限）
+                layout_top_n = min(plot_top_n, MAX_NETWORK_PAGES)
+                if layout_top_n < plot_top_n:
+                    st.warning(f"⚠️ ページ数が多いため、被リンク数の上位{MAX_NETWORK_PAGES:,}ページへのリンクに限定して表示します。")
+                nodes, edge_src, edge_dst, pos = compute_network_layout(
+                    digest, layout_top_n, graph, pages_df.head(layout_top_n)['C_URL'].tolist())
                 
-                # 上位ページのみ
-                top_urls = set(pages_df.head(network_top_n)['C_URL'])
-                edges_filtered = edges_df[
-                    edges_df['C_URL'].isin(top_urls)
-                ]
-                
-                if not edges_filtered.empty:
-                    # ノード準備
-                    nodes = set(edges_filtered['E_被リンク元ページURL']).union(set(edges_filtered['C_URL']))
-                    node_list = list(nodes)
-                    node_indices = {node: i for i, node in enumerate(node_list)}
+                if len(edge_src):
+                    # エッジ座標（リンク毎に 始点, 終点, 区切り）
+                    edge_x = np.full((len(edge_src), 3), np.nan)
+                    edge_y = np.full((len(edge_src), 3), np.nan)
+                    edge_x[:, 0], edge_x[:, 1] = pos[edge_src, 0], pos[edge_dst, 0]
+                    edge_y[:, 0], edge_y[:, 1] = pos[edge_src, 1], pos[edge_dst, 1]
                     
-                    # エッジ準備
-                    edge_trace = []
-                    for _, row in edges_filtered.iterrows():
-                        x0, y0 = divmod(node_indices[row['E_被リンク元ページURL']], 10)
-                        x1, y1 = divmod(node_indices[row['C_URL']], 10)
-                        edge_trace.extend([x0, x1, None])
-                        edge_trace.extend([y0, y1, None])
+                    # ノードサイズ
+                    node_inbound = graph.in_degree()[nodes]
+                    node_sizes = np.maximum(10, node_inbound * 2)
                     
-                    # ノード位置とサイズ
-                    node_x = [i // 10 for i in range(len(node_list))]
-                    node_y = [i % 10 for i in range(len(node_list))]
-                    node_sizes = [max(10, inbound_counts.get(node, 0) * 2) for node in node_list]
+                    # 大規模グラフは WebGL で描画
+                    use_webgl = len(nodes) + len(edge_src) > WEBGL_THRESHOLD
+                    scatter_trace = go.Scattergl if use_webgl else go.Scatter
+                    if use_webgl:
+                        st.caption(f"⚡ WebGL描画（{len(nodes):,}ノード / {len(edge_src):,}リンク）")
                     
                     # グラフ作成
                     fig = go.Figure()
                     
                     # エッジ描画
-                    fig.add_trace(go.Scatter(
-                        x=edge_trace[::3],
-                        y=edge_trace[1::3],
+                    fig.add_trace(scatter_trace(
+                        x=edge_x.ravel(),
+                        y=edge_y.ravel(),
                         mode='lines',
                         line=dict(width=0.5, color='#888'),
                         hoverinfo='none',
@@ -709,16 +959,16 @@ def main():
                     ))
                     
                     # ノード描画
-                    fig.add_trace(go.Scatter(
-                        x=node_x,
-                        y=node_y,
+                    fig.add_trace(scatter_trace(
+                        x=pos[:, 0],
+                        y=pos[:, 1],
                         mode='markers',
                         marker=dict(
                             size=node_sizes,
                             color='lightblue',
                             line=dict(width=1, color='darkblue')
                         ),
-                        text=[f"被リンク: {inbound_counts.get(node, 0)}" for node in node_list],
+                        text=[f"{graph.title(node)}<br>被リンク: {count}" for node, count in zip(nodes, node_inbound)],
                         hoverinfo='text',
                         showlegend=False
                     ))
@@ -730,7 +980,7 @@ def main():
                         margin=dict(b=20,l=5,r=5,t=40),
                         annotations=[
                             dict(
-                                text="ノードサイズ = 被リンク数",
+                                text="ノードサイズ = 被リンク数（力学モデル配置）",
                                 showarrow=False,
                                 xref="paper", yref="paper",
                                 x=0.005, y=-0.002,
@@ -754,91 +1004,69 @@ def main():
                     st.info("🔄 インタラクティブネットワーク図を生成中...")
                     
                     try:
-                        edges_df = df[
-                            (df['E_被リンク元ページURL'].astype(str) != "") &
-                            (df['C_URL'].astype(str) != "")
-                        ][['D_被リンク元ページタイトル', 'E_被リンク元ページURL',
-                           'B_ページタイトル', 'C_URL']].copy()
-
-                        def in_site(u: str) -> bool:
-                            try:
-                                d = urlparse(u).netloc.lower()
-                                if d.startswith("www."): d = d[4:]
-                                return (not site_domain) or (d == site_domain) or d.endswith("." + site_domain)
-                            except Exception:
-                                return True
-                        
-                        edges_df = edges_df[edges_df['E_被リンク元ページURL'].apply(in_site) & edges_df['C_URL'].apply(in_site)]
+                        TOP_N = network_top_n  # サイドバーの設定値を使用
                         
-                        if edges_df.empty:
-                            st.warning("⚠️ 描画対象エッジがありません。")
-                            return
+                        if analysis.get('store') is not None:
+                            # 組み込みDBモード：上位ページへのサイト内リンクをクエリで集計
+                            agg, in_counts = analysis['store'].network_edges(TOP_N)
+                            url2title = analysis['store'].url_titles()
+                        else:
+                            edges_df = df[analysis['masks']['has_link']][['D_被リンク元ページタイトル', 'E_被リンク元ページURL',
+                               'B_ページタイトル', 'C_URL']].copy()
 
-                        in_counts = edges_df.groupby('C_URL').size().sort_values(ascending=False)
+                            def in_site(u: str) -> bool:
+                                return same_site(u, site_domain)
+                            
+                            edges_df = edges_df[edges_df['E_被リンク元ページURL'].map(in_site).astype(bool) & edges_df['C_URL'].map(in_site).astype(bool)]
 
-                        TOP_N = network_top_n  # サイドバーの設定値を使用
-                        top_targets = set(in_counts.head(TOP_N).index)
+                            in_counts = edges_df.groupby('C_URL', observed=True).size().sort_values(ascending=False)
+                            top_targets = set(in_counts.head(TOP_N).index)
 
-                        sub = edges_df[edges_df['C_URL'].isin(top_targets)].copy()
-                        agg = sub.groupby(['E_被リンク元ページURL', 'C_URL']).size().reset_index(name='weight')
+                            sub = edges_df[edges_df['C_URL'].isin(top_targets)].copy()
+                            agg = sub.groupby(['E_被リンク元ページURL', 'C_URL'], observed=True).size().reset_index(name='weight')
 
-                        url2title = {}
-                        for _, r in df[['B_ページタイトル','C_URL']].drop_duplicates().iterrows():
-                            if r['C_URL']:
-                                url2title[r['C_URL']] = r['B_ページタイトル']
-                        for _, r in df[['D_被リンク元ページタイトル','E_被リンク元ページURL']].drop_duplicates().iterrows():
-                            if r['E_被リンク元ページURL']:
-                                url2title.setdefault(r['E_被リンク元ページURL'], r['D_被リンク元ページタイトル'])
+                            url2title = url_titles(df)
+                        
+                        if agg.empty:
+                            st.warning("⚠️ 描画対象エッジがありません。")
+                            return
 
                         def short_label(u: str, n=24) -> str:
                             t = str(url2title.get(u, u))
                             return (t[:n] + "…") if len(t) > n else t
 
                         net = Network(height="800px", width="100%", directed=True, bgcolor="#ffffff")
+                        # 配置はサーバー側で計算済みのため、ブラウザでの物理演算・安定化は行わない
                         options = {
-                            "physics": {
-                                "enabled": True,
-                                "solver": "barnesHut",
-                                "barnesHut": {
-                                    "gravitationalConstant": -8000,
-                                    "centralGravity": 0.3,
-                                    "springLength": 160,
-                                    "springConstant": 0.03,
-                                    "damping": 0.12,
-                                    "avoidOverlap": 0.1
-                                },
-                                "stabilization": {"enabled": True, "iterations": 120, "updateInterval": 25},
-                                "minVelocity": 1,
-                                "timestep": 0.6
-                            },
+                            "physics": {"enabled": False},
                             "interaction": {
                                 "hover": True, "zoomView": True, "dragView": True,
                                 "dragNodes": True, "navigationButtons": True, "keyboard": True
                             },
                             "nodes": {"shape": "dot", "font": {"size": 12}},
-                            "edges": {"smooth": {"enabled": True, "type": "dynamic"},
+                            "edges": {"smooth": {"enabled": False},
                                       "scaling": {"min": 1, "max": 8}}
                         }
                         net.set_options(json.dumps(options))
 
-                        nodes = set(agg['E_被リンク元ページURL']).union(set(agg['C_URL']))
+                        # ノード番号付けと力学モデルによる配置
+                        node_codes, nodes = pd.factorize(pd.concat([agg['E_被リンク元ページURL'], agg['C_URL']], ignore_index=True))
+                        node_pos = compute_pyvis_layout(node_codes[:len(agg)], node_codes[len(agg):], len(nodes))
                         
                         def node_size(u: str) -> int:
                             s = int(in_counts.get(u, 0))
                             return max(12, min(48, int(12 + math.log2(s + 1) * 8)))
 
-                        for u in nodes:
+                        for u, (x, y) in zip(nodes, node_pos):
                             net.add_node(
                                 u,
                                 label=short_label(u),
                                 title=f"{url2title.get(u, u)}<br>{u}",
-                                size=node_size(u)
+                                size=node_size(u),
+                                x=float(x), y=float(y), physics=False
                             )
 
-                        for _, r in agg.iterrows():
-                            src = r['E_被リンク元ページURL']
-                            dst = r['C_URL']
-                            w   = int(r['weight'])
+                        for src, dst, w in zip(agg['E_被リンク元ページURL'], agg['C_URL'], agg['weight'].astype(int).tolist()):
                             net.add_edge(src, dst, value=w, arrows="to")
 
                         # 一時ファイルに保存してからStreamlitで表示
@@ -864,12 +1092,12 @@ def main():
                             with col2:
                                 st.metric("エッジ数", len(agg))
                             with col3:
-                                st.metric("上位ターゲット数", len(top_targets))
+                                st.metric("上位ターゲット数", agg['C_URL'].nunique())
                             
-                            # ダウンロードリンク
+                            # ダウンロード
                             filename = f"interactive_network_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html"
-                            download_link = create_download_link(html_content, filename, "📥 ネットワーク図をダウンロード")
-                            st.markdown(download_link, unsafe_allow_html=True)
+                            st.download_button("📥 ネットワーク図をダウンロード", html_content.encode('utf-8'),
+                                               file_name=filename, mime="text/html", key="save_network")
                             
                             # 一時ファイル削除
                             os.unlink(tmp_file.name)
@@ -892,7 +1120,7 @@ def main():
                 st.markdown("### 🎯 基本統計")
                 basic_stats = {
                     "総ページ数": len(pages_df),
-                    "総内部リンク数": has_source.sum(),
+                    "総内部リンク数": source_count,
                     "孤立ページ数": len(pages_df[pages_df['被リンク数'] == 0]),
                     "平均被リンク数": f"{pages_df['被リンク数'].mean():.2f}",
                     "最大被リンク数": int(pages_df['被リンク数'].max()),
@@ -1038,42 +1266,38 @@ def main():
                 st.success("✅ 現在の内部リンク構造は良好です！")
             
             # 全体レポートダウンロード
-            if st.button("📥 総合レポートをダウンロード", key="download_summary"):
+            if st.button("📥 総合レポートを作成", key="download_summary"):
                 # ZIPファイルで全レポートをまとめる
                 zip_buffer = BytesIO()
                 
                 with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
                     # ピラーページレポート
-                    pillar_rows = [[i, safe_str(row['B_ページタイトル']), safe_str(row['C_URL']), int(row['被リンク数'])]
-                                  for i, (_, row) in enumerate(pages_df.iterrows(), 1)]
-                    pillar_html = generate_html_table(
-                        f"{site_name} ピラーページ分析レポート",
-                        ["#", "ページタイトル", "URL", "被リンク数"],
-                        pillar_rows
-                    )
-                    zip_file.writestr("pillar_report.html", pillar_html.encode('utf-8'))
+                    with zip_file.open("pillar_report.html", "w") as f:
+                        write_chunks(f, iter_html_table(
+                            f"{site_name} ピラーページ分析レポート",
+                            ["#", "ページタイトル", "URL", "被リンク数", *rank_columns],
+                            pillar_rows(pages_df)
+                        ))
                     
                     # アンカーレポート
                     if anchor_counts:
-                        anchor_rows = [[i, anchor, count] for i, (anchor, count) in enumerate(anchor_counts.most_common(), 1)]
-                        anchor_html = generate_html_table(
-                            f"{site_name} アンカーテキスト分析レポート",
-                            ["#", "アンカーテキスト", "頻度"],
-                            anchor_rows
-                        )
-                        zip_file.writestr("anchor_report.html", anchor_html.encode('utf-8'))
+                        anchor_rows = ([i, anchor, count] for i, (anchor, count) in enumerate(anchor_counts.most_common(), 1))
+                        with zip_file.open("anchor_report.html", "w") as f:
+                            write_chunks(f, iter_html_table(
+                                f"{site_name} アンカーテキスト分析レポート",
+                                ["#", "アンカーテキスト", "頻度"],
+                                anchor_rows
+                            ))
                     
                     # 孤立記事レポート
                     if isolated_count > 0:
                         isolated_pages = pages_df[pages_df['被リンク数'] == 0]
-                        isolated_rows = [[i, safe_str(row['B_ページタイトル']), safe_str(row['C_URL'])]
-                                        for i, (_, row) in enumerate(isolated_pages.iterrows(), 1)]
-                        isolated_html = generate_html_table(
-                            f"{site_name} 孤立記事分析レポート",
-                            ["#", "ページタイトル", "URL"],
-                            isolated_rows
-                        )
-                        zip_file.writestr("isolated_report.html", isolated_html.encode('utf-8'))
+                        with zip_file.open("isolated_report.html", "w") as f:
+                            write_chunks(f, iter_html_table(
+                                f"{site_name} 孤立記事分析レポート",
+                                ["#", "ページタイトル", "URL", *depth_columns],
+                                isolated_rows(isolated_pages)
+                            ))
                     
                     # サマリーレポート
                     summary_content = f"""
@@ -1096,7 +1320,7 @@ def main():
                     <div class='section'>
                         <h2>📊 基本統計</h2>
                         <div class='metric'>総ページ数: {len(pages_df)}</div>
-                        <div class='metric'>総内部リンク数: {has_source.sum()}</div>
+                        <div class='metric'>総内部リンク数: {source_count}</div>
                         <div class='metric'>孤立ページ数: {isolated_count}</div>
                         <div class='metric'>平均被リンク数: {pages_df['被リンク数'].mean():.2f}</div>
                         <div class='metric'>最大被リンク数: {int(pages_df['被リンク数'].max())}</div>
@@ -1117,11 +1341,10 @@ def main():
                 
                 zip_buffer.seek(0)
                 
-                # ダウンロードリンク作成
-                b64 = base64.b64encode(zip_buffer.getvalue()).decode()
+                # ダウンロード
                 filename = f"link_analysis_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-                href = f'<a href="data:application/zip;base64,{b64}" download="{filename}" style="text-decoration: none; background-color: #1f77b4; color: white; padding: 0.75rem 1.5rem; border-radius: 0.25rem; display: inline-block; font-weight: bold;">📦 総合レポート（ZIP）をダウンロード</a>'
-                st.markdown(href, unsafe_allow_html=True)
+                st.download_button("📦 総合レポート（ZIP）を保存", zip_buffer, file_name=filename,
+                                   mime="application/zip", key="save_summary")
     
     except Exception as e:
         st.error(f"❌ データ処理中にエラーが発生しました: {e}")
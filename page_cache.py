@@ -0,0 +1,93 @@
+# page_cache.py
+"""
+2段階クローラー用のページキャッシュ
+- フェーズ1で取得したページの解析結果（リンク抽出結果など）を保持し、フェーズ2で再取得しない
+- 値は pickle + zlib 圧縮してメモリに保持し、上限を超えた古いものから一時ディレクトリへ退避
+- 退避先は close() またはオブジェクト破棄時に削除
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024  # メモリ上に保持する圧縮後データの上限
+
+
+class PageCache:
+    """URL→値 の容量制限付きキャッシュ（超過分はディスクへ退避）"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, spill=True):
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._spilled = set()
+        self._tmpdir = None
+
+    def _path(self, url):
+        if self._tmpdir is None:
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='page_cache_')
+        return os.path.join(self._tmpdir.name, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def _evict(self):
+        # 古いものから退避（spill=False なら破棄）
+        while self._memory_bytes > self.max_bytes and self._memory:
+            url, blob = self._memory.popitem(last=False)
+            self._memory_bytes -= len(blob)
+            if self.spill:
+                with open(self._path(url), 'wb') as f:
+                    f.write(blob)
+                self._spilled.add(url)
+
+    def __setitem__(self, url, value):
+        self.discard(url)
+        blob = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        self._memory[url] = blob
+        self._memory_bytes += len(blob)
+        self._evict()
+
+    def get(self, url, default=None):
+        if url in self._memory:
+            blob = self._memory[url]
+        elif url in self._spilled:
+            with open(self._path(url), 'rb') as f:
+                blob = f.read()
+        else:
+            return default
+        return pickle.loads(zlib.decompress(blob))
+
+    def __getitem__(self, url):
+        if url not in self:
+            raise KeyError(url)
+        return self.get(url)
+
+    def discard(self, url):
+        if url in self._memory:
+            self._memory_bytes -= len(self._memory.pop(url))
+        elif url in self._spilled:
+            self._spilled.discard(url)
+            os.remove(self._path(url))
+
+    def __contains__(self, url):
+        return url in self._memory or url in self._spilled
+
+    def __len__(self):
+        return len(self._memory) + len(self._spilled)
+
+    def close(self):
+        """保持データと退避ファイルを破棄"""
+        self._memory.clear()
+        self._memory_bytes = 0
+        self._spilled.clear()
+        if self._tmpdir is not None:
+            self._tmpdir.cleanup()
+            self._tmpdir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
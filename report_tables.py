@@ -0,0 +1,223 @@
+# report_tables.py
+"""
+レポート・ネットワーク図用の行データ生成
+- DataFrame を iterrows で1行ずつ Series 化せず、列単位で取り出して zip で行を組み立てる
+- main.py のピラーページ・孤立記事レポート、インタラクティブネットワーク図の URL→タイトル対応で使用
+- HTMLレポートは iter_html_table で文字列チャンクとして逐次生成し、大きな表は REPORT_PAGE_ROWS 行毎のページ送り表示
+
+python report_tables.py で iterrows 版との処理時間・結果の比較を実行
+"""
+
+from io import BytesIO
+
+import pandas as pd
+
+UNREACHABLE = "到達不可"
+REPORT_PAGE_ROWS = 1000  # HTMLレポートの1ページあたりの行数
+
+REPORT_STYLE = """<style>
+            body { font-family: Arial, 'Yu Gothic', Meiryo, sans-serif; padding: 16px; }
+            table { border-collapse: collapse; width: 100%; }
+            th, td { border: 1px solid #ddd; padding: 8px; font-size: 14px; }
+            th { position: sticky; top: 0; background: #f7f7f7; font-weight: bold; }
+            tr:nth-child(even) { background: #fafafa; }
+            a { color: #1565c0; text-decoration: none; }
+            a:hover { text-decoration: underline; }
+            .header { text-align: center; margin-bottom: 2rem; }
+            .pager { margin: 0 0 1rem; text-align: center; }
+            .pager button { padding: 4px 12px; margin: 0 8px; }
+        </style>"""
+
+# 2ページ以上ある表だけページ送りを表示（tbody 1つが1ページ）
+PAGER_SCRIPT = """<script>
+(function () {
+    var pages = document.querySelectorAll('table.report > tbody');
+    var pager = document.querySelector('.pager');
+    if (pages.length < 2) { pager.remove(); return; }
+    var info = pager.querySelector('.page-info'), current = 0;
+    function show(i) {
+        pages[current].hidden = true;
+        current = Math.max(0, Math.min(pages.length - 1, i));
+        pages[current].hidden = false;
+        info.textContent = (current + 1) + ' / ' + pages.length + ' ページ';
+    }
+    pager.querySelector('.prev').onclick = function () { show(current - 1); };
+    pager.querySelector('.next').onclick = function () { show(current + 1); };
+    show(0);
+})();
+</script>"""
+
+
+def _esc(x):
+    return str(x).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def iter_html_table(title, columns, rows, page_rows=REPORT_PAGE_ROWS):
+    """HTML表を文字列チャンクで逐次生成（page_rows 行毎に1チャンク・1ページ）"""
+    yield "".join([
+        "<!doctype html>",
+        "<meta charset='utf-8'>",
+        f"<title>{_esc(title)}</title>",
+        REPORT_STYLE,
+        f"<div class='header'><h1>{_esc(title)}</h1></div>",
+        "<div class='pager'><button class='prev'>◀ 前へ</button><span class='page-info'></span>"
+        "<button class='next'>次へ ▶</button></div>",
+        "<table class='report'><thead><tr>",
+        *(f"<th>{_esc(col)}</th>" for col in columns),
+        "</tr></thead>",
+    ])
+
+    url_columns = {i for i, col in enumerate(columns) if "URL" in col.upper() or col.endswith("URL")}
+    page, opening = [], "<tbody>"  # 2ページ目以降は非表示で出力
+    for row in rows:
+        cells = []
+        for i, cell in enumerate(row):
+            val = _esc(cell)
+            if i in url_columns and (val.startswith("http://") or val.startswith("https://")):
+                val = f"<a href='{val}' target='_blank' rel='noopener'>{val}</a>"
+            cells.append(f"<td>{val}</td>")
+        page.append("<tr>" + "".join(cells) + "</tr>")
+        if len(page) == page_rows:
+            yield opening + "".join(page) + "</tbody>"
+            page, opening = [], "<tbody hidden>"
+    if page:
+        yield opening + "".join(page) + "</tbody>"
+
+    yield "</table>" + PAGER_SCRIPT
+
+
+def write_chunks(fileobj, chunks):
+    """文字列チャンクを UTF-8 でバイナリファイルへ書き出す"""
+    for chunk in chunks:
+        fileobj.write(chunk.encode('utf-8'))
+
+
+def html_file(chunks):
+    """チャンクを書き出した BytesIO（st.download_button にそのまま渡せる）"""
+    buffer = BytesIO()
+    write_chunks(buffer, chunks)
+    buffer.seek(0)
+    return buffer
+
+
+def text_column(series):
+    """文字列以外（欠損値など）を空文字にした値のリスト"""
+    return [value if isinstance(value, str) else "" for value in series.tolist()]
+
+
+def depth_column(series):
+    """クリック深度の表示値のリスト（到達できないページは「到達不可」）"""
+    return [UNREACHABLE if pd.isna(depth) else int(depth) for depth in series.tolist()]
+
+
+def graph_columns(pages_df, columns):
+    """リンクグラフから計算した列（PageRank・クリック深度）の表示値のリスト。分割読み込みモードで無い列は除く"""
+    formats = {'PageRank': lambda s: [f"{rank:.6f}" for rank in s.tolist()], 'クリック深度': depth_column}
+    return [formats[col](pages_df[col]) for col in columns if col in pages_df.columns]
+
+
+def pillar_rows(pages_df):
+    """ピラーページレポートの行 [#, タイトル, URL, 被リンク数, PageRank, クリック深度]"""
+    return [list(row) for row in zip(
+        range(1, len(pages_df) + 1),
+        text_column(pages_df['B_ページタイトル']),
+        text_column(pages_df['C_URL']),
+        pages_df['被リンク数'].astype(int).tolist(),
+        *graph_columns(pages_df, ['PageRank', 'クリック深度']),
+    )]
+
+
+def isolated_rows(isolated_pages):
+    """孤立記事レポートの行 [#, タイトル, URL, クリック深度]"""
+    return [list(row) for row in zip(
+        range(1, len(isolated_pages) + 1),
+        text_column(isolated_pages['B_ページタイトル']),
+        text_column(isolated_pages['C_URL']),
+        *graph_columns(isolated_pages, ['クリック深度']),
+    )]
+
+
+def url_titles(df):
+    """URL→タイトル（リンク先としてのタイトルを優先し、なければ最初に現れたリンク元としてのタイトル）"""
+    sources = df[df['E_被リンク元ページURL'] != ""].drop_duplicates('E_被リンク元ページURL')
+    targets = df[df['C_URL'] != ""]
+    titles = dict(zip(sources['E_被リンク元ページURL'], sources['D_被リンク元ページタイトル']))
+    titles.update(zip(targets['C_URL'], targets['B_ページタイトル']))
+    return titles
+
+
+def _benchmark(sizes=(100_000, 1_000_000)):
+    """合成した内部リンクCSVで、タブ毎の行データ生成を iterrows 版と比較"""
+    import time
+
+    import numpy as np
+
+    def format_depth(depth):
+        return UNREACHABLE if pd.isna(depth) else int(depth)
+
+    def safe_str(s):
+        return s if isinstance(s, str) else ""
+
+    def old_pillar(pages_df):
+        return [[i, safe_str(row['B_ページタイトル']), safe_str(row['C_URL']), int(row['被リンク数']),
+                 f"{row['PageRank']:.6f}", format_depth(row['クリック深度'])]
+                for i, (_, row) in enumerate(pages_df.iterrows(), 1)]
+
+    def old_isolated(isolated_pages):
+        return [[i, safe_str(row['B_ページタイトル']), safe_str(row['C_URL']), format_depth(row['クリック深度'])]
+                for i, (_, row) in enumerate(isolated_pages.iterrows(), 1)]
+
+    def old_titles(df):
+        url2title = {}
+        for _, r in df[['B_ページタイトル', 'C_URL']].drop_duplicates().iterrows():
+            if r['C_URL']:
+                url2title[r['C_URL']] = r['B_ページタイトル']
+        for _, r in df[['D_被リンク元ページタイトル', 'E_被リンク元ページURL']].drop_duplicates().iterrows():
+            if r['E_被リンク元ページURL']:
+                url2title.setdefault(r['E_被リンク元ページURL'], r['D_被リンク元ページタイトル'])
+        return url2title
+
+    def old_edges(agg):
+        return [(r['E_被リンク元ページURL'], r['C_URL'], int(r['weight'])) for _, r in agg.iterrows()]
+
+    def new_edges(agg):
+        return list(zip(agg['E_被リンク元ページURL'], agg['C_URL'], agg['weight'].astype(int).tolist()))
+
+    rng = np.random.default_rng(0)
+    for rows in sizes:
+        n_pages = max(10, rows // 20)
+        target = rng.integers(0, n_pages, rows)
+        source = rng.integers(0, n_pages * 2, rows)  # 半数はリンク先に現れない（孤立・リンク元のみ）
+        urls = np.array([f"https://example.com/article-{i}/" for i in range(n_pages * 2)], dtype=object)
+        titles = np.array([f"記事タイトル {i}" for i in range(n_pages * 2)], dtype=object)
+        df = pd.DataFrame({
+            'B_ページタイトル': titles[target], 'C_URL': urls[target],
+            'D_被リンク元ページタイトル': titles[source], 'E_被リンク元ページURL': urls[source],
+        })
+        pages_df = pd.DataFrame({'B_ページタイトル': titles, 'C_URL': urls})
+        pages_df['被リンク数'] = np.bincount(target, minlength=n_pages * 2)
+        pages_df['PageRank'] = rng.random(len(pages_df))
+        pages_df['クリック深度'] = pd.array(np.where(rng.random(len(pages_df)) < 0.2, None, rng.integers(0, 8, len(pages_df))), dtype='Int64')
+        isolated = pages_df[pages_df['被リンク数'] == 0]
+        agg = df.groupby(['E_被リンク元ページURL', 'C_URL']).size().reset_index(name='weight')
+
+        print(f"{rows:,}行（{len(pages_df):,}ページ / 孤立 {len(isolated):,} / エッジ {len(agg):,}）")
+        cases = [
+            ("ピラーページ", old_pillar, pillar_rows, pages_df),
+            ("孤立記事", old_isolated, isolated_rows, isolated),
+            ("URL→タイトル", old_titles, url_titles, df),
+            ("pyvis エッジ", old_edges, new_edges, agg),
+        ]
+        for name, old, new, data in cases:
+            start = time.perf_counter()
+            expected = old(data)
+            old_s = time.perf_counter() - start
+            start = time.perf_counter()
+            actual = new(data)
+            new_s = time.perf_counter() - start
+            same = expected == actual
+            print(f"  {name:<10} iterrows {old_s:7.2f} s → {new_s:6.2f} s ({old_s / max(new_s, 1e-9):5.1f}倍) {'OK' if same else 'NG'}")
+
+
+if __name__ == "__main__":
+    _benchmark()
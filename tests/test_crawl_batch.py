@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+# 結果の行数は csv_ingest（pandas / numpy）で数える
+pytest.importorskip('numpy')
+pytest.importorskip('pandas')
+
+import crawl_batch
+
+OK_CRAWLER = '''
+from link_export import LinkTableWriter, LINK_COLUMNS
+def analyze(status_callback, output_format='csv'):
+    writer = LinkTableWriter(output_format)
+    writer.writerow(LINK_COLUMNS)
+    writer.writerow([1, 'A', 'https://example.com/a', 'B', 'https://example.com/b', 'a'])
+    return writer.getvalue()
+'''
+
+# 致命的なエラーを捕捉して列名だけを返す analyze 型クローラーと同じ振る舞い
+HEADER_ONLY_CRAWLER = '''
+from link_export import header_only
+def analyze(status_callback, output_format='csv'):
+    status_callback("致命的なエラーが発生しました: timeout")
+    return header_only(output_format)
+'''
+
+
+@pytest.fixture
+def sites(tmp_path, monkeypatch):
+    site_dir = tmp_path / 'sites'
+    site_dir.mkdir()
+    (site_dir / 'auto_batchok.py').write_text(OK_CRAWLER, encoding='utf-8')
+    (site_dir / 'auto_batchheader.py').write_text(HEADER_ONLY_CRAWLER, encoding='utf-8')
+    monkeypatch.setattr(crawl_batch, 'SITE_DIR', str(site_dir))
+    monkeypatch.syspath_prepend(str(site_dir))
+    return tmp_path
+
+
+def test_header_only_output_fails_the_batch(sites):
+    output_dir = sites / 'out'
+    assert crawl_batch.main(['batchok', 'batchheader', '-o', str(output_dir), '-j', '1']) == 1
+
+    summary = json.loads((output_dir / 'summary.json').read_text(encoding='utf-8'))
+    assert summary['failed'] == ['batchheader']
+    statuses = {result['site']: (result['status'], result['rows']) for result in summary['sites']}
+    assert statuses == {'batchok': ('ok', 1), 'batchheader': ('empty', 0)}
+
+
+def test_successful_sites_exit_zero(sites):
+    assert crawl_batch.main(['batchok', '-o', str(sites / 'out'), '-j', '1']) == 0
+    assert (sites / 'out' / 'batchok.csv').read_text(encoding='utf-8').count('\n') == 2
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+import crawl_engine
+
+
+class FakeAdapter(BaseAdapter):
+    """overloaded なら最初の1回だけ 503（Retry-After: 0）を返し、以降は 200 を返すアダプター（通信なし）"""
+
+    def __init__(self, overloaded):
+        super().__init__()
+        self.overloaded = overloaded
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        response = Response()
+        response.status_code = 503 if self.overloaded and not self.sent else 200
+        response.headers['Retry-After'] = '0'
+        response.url = request.url
+        response.request = request
+        self.sent.append(request.url)
+        return response
+
+    def close(self):
+        pass
+
+
+def fake_session(overloaded=False):
+    session = requests.Session()
+    session.mount('https://', FakeAdapter(overloaded))
+    return session
+
+
+def timed_fetch(session, urls):
+    start = time.perf_counter()
+    results = crawl_engine.fetch_many(session, urls, delay=0, respect_robots=False)
+    assert [response.status_code for _, response, _ in results] == [200] * len(urls)
+    return time.perf_counter() - start
+
+
+def test_backoff_carries_over_to_the_next_fetch_many():
+    urls = [f'https://example.com/{i}' for i in range(4)]
+
+    # 減速していない Session では delay=0 なので待たずに取得する
+    assert timed_fetch(fake_session(), urls) < 0.3
+
+    session = fake_session(overloaded=True)
+    timed_fetch(session, ['https://www.example.com/first'])  # 503 → 減速して再試行
+    assert len(session.adapters['https://'].sent) == 2
+    # 次の呼び出しでも同じホストの減速が続く（毎秒約2件）
+    assert timed_fetch(session, urls) > 0.8
+
+
+def test_host_strips_only_a_leading_www():
+    limiter = crawl_engine.HostLimiter()
+    assert limiter._host('https://www.example.com/a') == 'example.com'
+    assert limiter._host('https://awww.example.com/a') == 'awww.example.com'
@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('bs4')
+pytest.importorskip('lxml')
+
+import auto_smart
+import html_parse
+
+BASE = 'https://smart-pay.website'
+
+
+def article(i, related):
+    """本文リンクに加え、ナビ・サイドバー・script 内の疑似タグ・閉じ忘れタグ・実体参照を含む記事ページ"""
+    links = ''.join(
+        f'<p>関連記事&amp;解説 {j}：<a href="/media/article-{j}/">記事{j}を読む</a>'  # </p> なし
+        f'<a href="{BASE}/media/article-{j}/#toc">目次</a>'
+        f'<a href="/media/article-{j}/image.jpg">画像</a>'
+        for j in related)
+    return (
+        '<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8">'
+        f'<title>記事{i} | smart-pay</title><script>var s = "<a href=/media/fake/>x</a>";</script></head><body>'
+        '<header><nav><ul><li><a href="/media/">メディア</a><li><a href="/media/category/a/">カテゴリ</a></ul></nav></header>'
+        f'<main><article><h1>記事{i}の&lt;タイトル&gt;</h1>'
+        f'<div class="entry-content">{links}<ul><li><a href="https://example.com/">外部</a><li><a href="#top"> </a></ul></div>'
+        '</article><aside class="sidebar"><a href="/media/article-0/">人気記事</a></aside></main>'
+        '<footer><a href="/privacy/">プライバシー</a></footer></body></html>')
+
+
+SITE = {f'{BASE}/media': '<html><body><main>' + ''.join(
+    f'<a href="/media/article-{i}/">記事{i}</a>' for i in range(8)) + '<a href="/media/page/2/">次へ</a></main></body></html>'}
+SITE.update({f'{BASE}/media/article-{i}': article(i, [(i + 1) % 8, (i * 3) % 8, (i + 5) % 8]) for i in range(8)})
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.status_code = 200 if text else 404
+
+
+def fake_crawl(session, seeds, process, **kwargs):
+    """固定のHTMLを返す幅優先クロール（通信なし）"""
+    queue, seen = list(seeds), set()
+    while queue:
+        url = queue.pop(0)
+        if url not in seen:
+            seen.add(url)
+            queue.extend(process(url, FakeResponse(SITE.get(url, ''))) or [])
+
+
+def test_crawler_output_is_parser_independent(monkeypatch):
+    """実際のクローラー（auto_smart）の本文リンク抽出の結果が lxml と html.parser で同じ"""
+    monkeypatch.setattr(auto_smart, 'crawl', fake_crawl)
+    monkeypatch.setattr(auto_smart, 'mount_pool', lambda session: session)
+    results = {}
+    for parser in ('html.parser', 'lxml'):
+        monkeypatch.setattr(html_parse, 'HTML_PARSER', parser)
+        results[parser] = auto_smart.analyze(lambda message: None)
+
+    assert results['lxml'] == results['html.parser']
+    rows = results['lxml'].splitlines()
+    assert len(rows) > 8  # 列名 + リンク行
+    assert any(f'{BASE}/media/article-1,' in row and '記事1を読む' in row for row in rows)
+    assert not any('example.com' in row or '/media/fake' in row or '人気記事' in row for row in rows)
@@ -0,0 +1,58 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+
+from requests.models import Response
+
+from http_cache import CachingAdapter
+
+
+def fill(cache_dir, sizes, age=0):
+    """キャッシュのエントリ（SHA-1 名のファイル）を古い順に作る"""
+    now = time.time()
+    paths = []
+    for i, size in enumerate(sizes):
+        path = cache_dir / f'{i:040x}'
+        path.write_bytes(b'x' * size)
+        mtime = now - age - (len(sizes) - i) * 60
+        os.utime(path, (mtime, mtime))
+        paths.append(path)
+    return paths
+
+
+def test_prune_evicts_least_recently_used_over_size_limit(tmp_path):
+    paths = fill(tmp_path, [400] * 5)
+    (tmp_path / 'graphs').mkdir()
+    (tmp_path / 'other.json').write_bytes(b'x' * 10_000)
+
+    adapter = CachingAdapter(str(tmp_path), max_bytes=1000)
+    assert [path.exists() for path in paths] == [False, False, False, True, True]
+    assert adapter.stats['evicted'] == 3
+    assert (tmp_path / 'graphs').is_dir() and (tmp_path / 'other.json').exists()
+
+
+def test_expired_entries_are_removed_and_not_loaded(tmp_path):
+    expired = fill(tmp_path, [100], age=40 * 86400)[0]
+    CachingAdapter(str(tmp_path), max_age=30 * 86400)
+    assert not expired.exists()
+
+    response = Response()
+    response.status_code, response._content, response.encoding = 200, b'body', 'utf-8'
+    adapter = CachingAdapter(str(tmp_path))
+    adapter._store('https://example.com/', response)
+    assert adapter._load('https://example.com/')['content'] == b'body'
+    adapter.max_age = 0
+    assert adapter._load('https://example.com/') is None
+
+
+def test_overwriting_an_entry_does_not_inflate_the_size(tmp_path):
+    adapter = CachingAdapter(str(tmp_path), max_bytes=10_000)
+    for body in (b'a' * 500, b'b' * 50, b'c' * 500):
+        response = Response()
+        response.status_code, response._content, response.encoding = 200, body, 'utf-8'
+        adapter._store('https://example.com/', response)
+    assert adapter._size == sum(path.stat().st_size for path in tmp_path.iterdir())
+    assert adapter.stats['stored'] == 3 and adapter.stats['evicted'] == 0
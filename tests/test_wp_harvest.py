@@ -0,0 +1,87 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('bs4')
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.models import Response
+
+import auto_fuyouhin
+import wp_harvest
+from link_index import LinkIndex
+
+SITE = 'https://fuyohin-kaishu.co.jp'
+
+
+def post(slug, title, body, category='garbage-house'):
+    return {'link': f'{SITE}/{category}/{slug}/', 'title': {'rendered': title}, 'content': {'rendered': body}}
+
+
+# 2ページに分かれた投稿一覧（相対・絶対・外部・ページ内・自分自身・重複・対象外のリンクを含む）
+POSTS = [
+    post('a', 'ゴミ屋敷の片付け &amp; 費用', '<p><a href="/unwanted-items/b/">不用品の回収</a>'
+         '<a href="https://fuyohin-kaishu.co.jp/garbage-house/c">片付けの手順</a><a href="#toc">目次</a>'
+         '<a href="/garbage-house/a/">この記事</a><a href="https://example.com/">外部</a></p>'),
+    post('b', '不用品回収の料金', '<a href="../../garbage-house/a/"><img alt=""></a><a href="/unwanted-items/b/?p=1">同じ記事</a>'
+         '<a href="/contact">問い合わせ</a>', category='unwanted-items'),
+    post('c', '片付けの手順', '<a href="/garbage-house/a/" title="費用">費用</a><a href="/garbage-house/a/">もう一度</a>'),
+    {'link': f'{SITE}/news/', 'title': {'rendered': 'お知らせ'}, 'content': {'rendered': '<a href="/garbage-house/a/">a</a>'}},
+]
+
+
+class FakeWordPress(BaseAdapter):
+    """REST API（1ページ2件）だけを返し、それ以外は404を返すアダプター（通信なし）"""
+
+    def send(self, request, **kwargs):
+        response = Response()
+        response.url, response.request = request.url, request
+        parsed = urlparse(request.url)
+        if parsed.path == '/wp-json/wp/v2/posts':
+            page = int(parse_qs(parsed.query)['page'][0])
+            response.status_code = 200
+            response.headers.update({'X-WP-TotalPages': '2', 'X-WP-Total': str(len(POSTS))})
+            response._content = json.dumps(POSTS[(page - 1) * 2:page * 2]).encode('utf-8')
+        else:
+            response.status_code = 404
+            response._content = b''
+        return response
+
+    def close(self):
+        pass
+
+
+def fake_session(session=None):
+    session = session or requests.Session()
+    session.mount('https://', FakeWordPress())
+    return session
+
+
+def test_harvest_builds_links_from_rendered_content():
+    index = LinkIndex()
+    pages, links = wp_harvest.harvest(
+        fake_session(), SITE, post_types=('posts',), normalize=lambda url: url.split('?')[0].split('#')[0],
+        is_target=lambda url: url.startswith(SITE) and '/news/' not in url and '/contact' not in url, link_index=index)
+
+    a, b, c = (f'{SITE}/garbage-house/a/', f'{SITE}/unwanted-items/b/', f'{SITE}/garbage-house/c')
+    assert list(pages) == [a, b, f'{SITE}/garbage-house/c/']
+    assert pages[a]['title'] == 'ゴミ屋敷の片付け & 費用'
+    assert [(link['source_url'], link['target_url'], link['anchor_text']) for link in links] == [
+        (a, b, '不用品の回収'), (a, c, '片付けの手順'), (b, a, '[リンク]'), (f'{SITE}/garbage-house/c/', a, '費用')]
+    assert pages[a]['inbound_links'] == 2 and pages[b]['inbound_links'] == 1
+    assert len(index) == 4
+
+
+def test_fuyouhin_uses_the_api_without_fetching_article_pages(monkeypatch):
+    monkeypatch.setattr(auto_fuyouhin, 'mount_pool', fake_session)
+    rows = auto_fuyouhin.analyze(lambda message: None).splitlines()
+
+    assert rows[1:] == [
+        f',ゴミ屋敷の片付け & 費用,{SITE}/garbage-house/a/,不用品回収の料金,{SITE}/unwanted-items/b/,[リンク]',
+        f',ゴミ屋敷の片付け & 費用,{SITE}/garbage-house/a/,片付けの手順,{SITE}/garbage-house/c/,費用',
+        f',不用品回収の料金,{SITE}/unwanted-items/b/,ゴミ屋敷の片付け & 費用,{SITE}/garbage-house/a/,不用品の回収',
+        f',片付けの手順,{SITE}/garbage-house/c/,ゴミ屋敷の片付け & 費用,{SITE}/garbage-house/a/,片付けの手順',
+    ]
@@ -0,0 +1,96 @@
+# url_normalize.py
+"""
+分析用のURL正規化
+- normalize_url: 1件のURLを正規化（スキーム補完・www除去・パス既定値"/"・フラグメント除去）
+- normalize_url_series: 列全体を正規化。pd.factorize で重複を除いた値だけを正規化し、コード配列で元の行に戻す
+  （内部リンクCSVは同じURLが何度も現れるため、行数ではなくユニークURL数に比例した処理量になる）
+- same_site: URLがサイト内（サイトのドメインまたはそのサブドメイン）か
+
+python url_normalize.py で1行ずつの apply との処理時間・結果の比較を実行
+"""
+
+from urllib.parse import urlparse, urlunparse
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_url(u, default_scheme="https", base_domain=None):
+    """URL正規化"""
+    if not isinstance(u, str) or not u.strip():
+        return ""
+    u = u.strip()
+
+    try:
+        p = urlparse(u)
+
+        if not p.netloc and base_domain:
+            path = u if u.startswith("/") else f"/{u}"
+            u = f"{default_scheme}://{base_domain}{path}"
+            p = urlparse(u)
+        elif not p.netloc:
+            return u
+
+        scheme = p.scheme or default_scheme
+        netloc = p.netloc.lower()
+        if netloc.startswith("www."):
+            netloc = netloc[4:]
+        path = p.path or "/"
+        return urlunparse((scheme, netloc, path, p.params, p.query, ""))
+    except Exception:
+        return u
+
+
+def normalize_url_series(series, default_scheme="https", base_domain=None):
+    """列全体のURL正規化（ユニーク値のみ正規化して元の行に展開）"""
+    codes, uniques = pd.factorize(series)
+    normalized = [normalize_url(u, default_scheme, base_domain) for u in uniques]
+    # 欠損値のコード -1 は末尾の "" を指す
+    table = np.array(normalized + [""], dtype=object)
+    return pd.Series(table[codes], index=series.index, name=series.name)
+
+
+def same_site(u, site_domain):
+    """URLがサイト内か（site_domain 未指定なら常に True、www. は無視）"""
+    if not site_domain:
+        return True
+    try:
+        d = urlparse(u).netloc.lower()
+    except Exception:
+        return True
+    if d.startswith("www."):
+        d = d[4:]
+    return d == site_domain or d.endswith("." + site_domain)
+
+
+def _benchmark(rows=1_000_000, unique_urls=20_000):
+    """内部リンクCSV相当の列（ユニークURLが繰り返し現れる）で、apply との処理時間と結果の一致を確認"""
+    import time
+
+    rng = np.random.default_rng(0)
+    variants = [
+        "https://www.example.com/article-{i}/",
+        "https://example.com/article-{i}/#section",
+        "/article-{i}/",
+        "HTTPS://WWW.Example.com/article-{i}/?p={i}",
+        "article-{i}",
+    ]
+    pool = np.array([variants[i % len(variants)].format(i=i) for i in range(unique_urls)] + ["", " "], dtype=object)
+    series = pd.Series(pool[rng.integers(0, len(pool), rows)])
+
+    start = time.perf_counter()
+    expected = series.apply(normalize_url, base_domain="example.com")
+    apply_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = normalize_url_series(series, base_domain="example.com")
+    vectorized_s = time.perf_counter() - start
+
+    print(f"{rows:,}行 / ユニーク{len(pool):,}件")
+    print(f"{'apply (1行ずつ)':>20}: {apply_s:.2f} s")
+    print(f"{'normalize_url_series':>20}: {vectorized_s:.2f} s ({apply_s / vectorized_s:.1f}倍)")
+    print(f"結果の一致: {'OK' if expected.equals(actual) else 'NG'}")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,105 @@
+# wp_harvest.py
+"""
+WordPress REST API からの一括取得
+- /wp-json/wp/v2/{posts,pages} を _fields で必要項目に絞り、1ページ目で総ページ数を得て残りを並列取得
+- content.rendered（本文HTML）から直接リンクを抽出し、記事ページのHTMLを1件ずつ取得しない
+- 各クローラーと同じ pages / detailed_links 構造を返す
+"""
+
+import html
+import re
+from urllib.parse import urlencode, urljoin
+
+from crawl_engine import DEFAULT_DELAY, fetch_many
+from html_parse import parse_html
+from link_index import LinkIndex
+
+API_PATH = '/wp-json/wp/v2/'
+DEFAULT_FIELDS = 'link,title,content'
+PER_PAGE = 100  # WordPress の上限
+
+
+def rendered_text(field):
+    """{'rendered': '...'} 形式のフィールドからタグ・実体参照を除いた文字列"""
+    rendered = field.get('rendered', '') if isinstance(field, dict) else (field or '')
+    return html.unescape(re.sub(r'<[^>]+>', '', rendered)).strip()
+
+
+def fetch_items(session, base_url, post_type='posts', fields=DEFAULT_FIELDS, params=None, max_pages=None,
+                delay=DEFAULT_DELAY, timeout=30, log=None):
+    """REST API の一覧を全ページ取得して項目のリストを返す（API が使えなければ空リスト）"""
+    api_url = urljoin(base_url, f"{API_PATH}{post_type}")
+    query = {'per_page': PER_PAGE, '_fields': fields, **(params or {})}
+    try:
+        first = session.get(api_url, params={**query, 'page': 1}, timeout=timeout)
+        if first.status_code != 200:
+            return []
+        items = first.json()
+        total_pages = int(first.headers.get('X-WP-TotalPages', 1))
+    except Exception as e:
+        if log: log(f"WordPress API取得エラー: {api_url} - {e}")
+        return []
+    if max_pages:
+        total_pages = min(total_pages, max_pages)
+    if log: log(f"WordPress API {post_type}: {total_pages}ページ（{first.headers.get('X-WP-Total', '?')}件）")
+
+    page_urls = [f"{api_url}?{urlencode({**query, 'page': page})}" for page in range(2, total_pages + 1)]
+    for url, response, error in fetch_many(session, page_urls, delay=delay, timeout=timeout):
+        try:
+            if error is not None: raise error
+            if response.status_code != 200: continue
+            items.extend(response.json())
+        except Exception as e:
+            if log: log(f"WordPress API取得エラー: {url} - {e}")
+    return items
+
+
+def content_links(content_html, page_url):
+    """本文HTMLのリンクを {'url': 絶対URL, 'anchor_text': ...} のリストで返す"""
+    links = []
+    for a in parse_html(content_html).find_all('a', href=True):
+        href = a['href'].strip()
+        if href and not href.startswith('#'):
+            anchor_text = a.get_text(strip=True) or a.get('title', '') or '[リンク]'
+            links.append({'url': urljoin(page_url, href), 'anchor_text': anchor_text[:100]})
+    return links
+
+
+def harvest(session, base_url, post_types=('posts', 'pages'), normalize=None, is_target=None, params=None,
+            link_index=None, delay=DEFAULT_DELAY, timeout=30, log=None):
+    """
+    REST API だけで内部リンク構造を構築し、(pages, detailed_links) を返す（API が使えなければ空）。
+    normalize はURL正規化、is_target は対象ページの判定（リンク元・リンク先の両方に適用）。
+    link_index を渡すとそこにリンクを登録する（HTMLから取得したページと合わせて被リンク数を集計する場合）。
+    """
+    normalize = normalize or (lambda url: url)
+    items = []
+    for post_type in post_types:
+        items.extend(fetch_items(session, base_url, post_type, params=params, delay=delay, timeout=timeout, log=log))
+
+    pages, sources = {}, []
+    for item in items:
+        url = normalize(item.get('link', ''))
+        if not url or (is_target and not is_target(url)) or url in pages:
+            continue
+        pages[url] = {'title': rendered_text(item.get('title')) or url, 'outbound_links': []}
+        sources.append((url, item.get('content', {}).get('rendered', '')))
+
+    detailed_links = []
+    link_index = LinkIndex() if link_index is None else link_index
+    for url, content_html in sources:
+        for link in content_links(content_html, url):
+            target = normalize(link['url'])
+            if not target or target == url or (is_target and not is_target(target)):
+                continue
+            if link_index.add(url, target):
+                pages[url]['outbound_links'].append(target)
+                detailed_links.append({
+                    'source_url': url, 'source_title': pages[url]['title'],
+                    'target_url': target, 'anchor_text': link['anchor_text']
+                })
+
+    for url in pages:
+        pages[url]['inbound_links'] = link_index.inbound_count(url)
+    if log: log(f"WordPress API: {len(pages)}ページ, {len(detailed_links)}リンク")
+    return pages, detailed_links